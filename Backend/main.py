@@ -1,13 +1,22 @@
 # main.py
 import asyncio
+import queue
 import os
 import sys
 import json
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
 from dotenv import load_dotenv
 from src.workflow.orchestrator import AlertInvestigationOrchestrator
-from typing import Dict, Any, List
+from src.utils.prompt_templates import prompt_registry
+from src.data.bulk_import import BulkImporter, iter_lines
+from src.data.index_advisor import IndexAdvisor
+from src.data.blob_codec import decode_json
+from src.data import outcome_search, stats_counters
+from src.utils.response_cache import ResponseCache
+from src.utils.change_events import ChangeBroadcaster
+from typing import Dict, Any, List, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi import HTTPException
 from pydantic import BaseModel
 
@@ -34,11 +43,45 @@ config = {
     'pattern_confidence_threshold': 0.7,
     'risk_threshold': 0.7,
     'auto_close_threshold': 0.5,
+    'calibrated_thresholds_path': 'data/calibrated_thresholds.json',
+    'calibration_min_cases': 5,
+    'pattern_batch_size': 4,
+    'pattern_batch_window_ms': 250,
+    'llm_repair_retries': 1,
+    'similar_case_enabled': True,
+    'similar_case_max_distance': 0.25,
+    'similar_case_require_same_user': True,
+    'db_read_pool_size': 4,
+    'db_async_workers': 5,
+    'db_write_batch_size': 256,
+    'db_write_flush_ms': 50,
+    'db_busy_timeout_ms': 5000,
+    'db_cache_size_kib': 16384,
+    'db_mmap_size': 268435456,
+    'events_poll_interval_s': 1.0,
+    'archive_enabled': True,
+    'archive_retention_days': 90,
+    'archive_batch_size': 500,
+    'archive_interval_s': 300,
+    'import_batch_size': 5000,
+    'import_commit_rows': 50000,
+    'sql_sandbox_max_rows': 1000,
+    'sql_sandbox_max_bytes': 524288,
+    'sql_sandbox_timeout_ms': 2000,
+    'sql_sandbox_scan_row_limit': 200,
+    'evidence_query_workers': 4,
+    'evidence_snapshot_attempts': 2,
+    'evidence_cache_max_bytes': 67108864,
+    'evidence_cache_max_entries': 10000,
+    'query_plan_library_enabled': True,
+    'ingestion_mode': 'aggregate',
+    'evidence_lookback_days': 180,
+    'evidence_sample_rows': 20,
     
     # Azure OpenAI Configuration loaded from environment
     'AZURE_OPENAI_ENDPOINT': os.getenv('AZURE_OPENAI_ENDPOINT'),
     'AZURE_OPENAI_API_KEY': os.getenv('AZURE_OPENAI_API_KEY'),
-    'AZURE_API_VERSION': os.getenv('OPENAI_API_VERSION', '2024-02-15-preview'),
+    'AZURE_API_VERSION': os.getenv('OPENAI_API_VERSION', '2024-08-01-preview'),
     'AZURE_OPENAI_DEPLOYMENT_NAME': os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4o')
 }
 
@@ -51,6 +94,11 @@ try:
         sys.exit(1)
 
     orchestrator = AlertInvestigationOrchestrator(config)
+    # Conditional-GET cache for the endpoints the dashboard polls.
+    response_cache = ResponseCache(orchestrator.db)
+    # One change-detection loop pushing updates to every open dashboard over SSE.
+    change_broadcaster = ChangeBroadcaster(orchestrator.db, orchestrator.get_investigation_statistics,
+                                           poll_interval_s=config['events_poll_interval_s'])
     print("Orchestrator initialized successfully.")
     
     try:
@@ -66,21 +114,9 @@ except Exception as e:
     sys.exit(1)
 
 # Helper function to save the full investigation payload
-def _save_investigation_result(alert_id: str, result: Dict[str, Any]):
+async def _save_investigation_result(alert_id: str, result: Dict[str, Any]):
     try:
-        with orchestrator.db.get_connection() as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS full_investigation_results (
-                    alert_id TEXT PRIMARY KEY,
-                    result_json TEXT,
-                    timestamp TEXT
-                )
-            """)
-            conn.execute("""
-                INSERT OR REPLACE INTO full_investigation_results (alert_id, result_json, timestamp)
-                VALUES (?, ?, ?)
-            """, (alert_id, json.dumps(result, default=str), datetime.now().isoformat()))
-            conn.commit()
+        await orchestrator.db.aio.save_full_investigation_result(alert_id, result)
     except Exception as e:
         print(f"Error saving full investigation result for alert {alert_id}: {e}")
 
@@ -88,11 +124,13 @@ from datetime import datetime
 
 
 @app.get("/review_status_counts")
-def review_status_counts():
+async def review_status_counts(request: Request):
     if orchestrator is None:
         raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
     try:
-        return orchestrator.db.get_review_status_counts()
+        return await response_cache.respond(
+            request, "review_status_counts", ["alerts"], orchestrator.db.aio.get_review_status_counts
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch counts: {e}")
 
@@ -102,7 +140,7 @@ async def investigate_alert(alert_id: str):
         raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
 
     # quick check before invoking the workflow
-    if not orchestrator.db.alert_exists(alert_id):
+    if not await orchestrator.db.aio.alert_exists(alert_id):
         raise HTTPException(status_code=404, detail="Alert not found")
 
     try:
@@ -121,28 +159,98 @@ async def process_pending_alerts(limit: int = 2) -> Dict[str, Any]:
     for result in results:
         alert_id = result.get('alert_id')
         if alert_id:
-            _save_investigation_result(alert_id, result)
+            await _save_investigation_result(alert_id, result)
     return {'processed_count': len(results), 'results': results}
 
+async def _investigate_imported(alert_ids: List[str]):
+    """Investigate alerts that arrived through a bulk import, one at a time."""
+    for alert_id in alert_ids:
+        try:
+            result = await orchestrator.investigate_alert(alert_id)
+            await _save_investigation_result(alert_id, result)
+        except Exception as e:
+            print(f"Error investigating imported alert {alert_id}: {e}")
+
+@app.post("/import/{table}")
+async def bulk_import(table: str, request: Request, background_tasks: BackgroundTasks,
+                      format: str = "ndjson", on_conflict: str = "ignore",
+                      enqueue: bool = False) -> Dict[str, Any]:
+    """
+    Stream an NDJSON or CSV body into a source table (alerts, transactions, login_attempts, ...).
+    The body is parsed as it arrives; with enqueue=true new alerts are investigated in the background.
+    """
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    if table not in orchestrator.db.schema_info:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+
+    # The importer runs on its own thread, not the shared DB executor: it spends most of
+    # an upload blocked on the body, and only takes the write connection in _write. It
+    # pulls body chunks through a bounded queue, so a large upload is never held in
+    # memory and applies backpressure.
+    chunks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=16)
+    def body_chunks():
+        while (chunk := chunks.get()) is not None:
+            yield chunk
+
+    def feed(chunk: Optional[bytes]) -> None:
+        # Give up once the importer has stopped reading (finished or failed).
+        while not job.done():
+            try:
+                chunks.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    importer = BulkImporter(orchestrator.db, batch_size=config['import_batch_size'],
+                            commit_every=config['import_commit_rows'])
+    job = asyncio.ensure_future(asyncio.to_thread(
+        importer.import_lines, table, iter_lines(body_chunks()), fmt=format, on_conflict=on_conflict,
+        collect_new_alerts=enqueue,
+    ))
+    try:
+        async for chunk in request.stream():
+            if job.done():
+                break
+            if chunk:
+                await asyncio.to_thread(feed, chunk)
+    finally:
+        await asyncio.to_thread(feed, None)
+    try:
+        report = await job
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed: {e}")
+
+    new_alert_ids = report.pop("new_alert_ids", [])
+    if enqueue and new_alert_ids:
+        background_tasks.add_task(_investigate_imported, new_alert_ids)
+    report["enqueued_alerts"] = len(new_alert_ids)
+    return report
+
 @app.get("/investigation_stats")
-async def get_investigation_stats() -> Dict[str, Any]:
+async def get_investigation_stats(request: Request):
     """Get statistics about investigations."""
     if orchestrator:
-        return orchestrator.get_investigation_statistics()
+        return await response_cache.respond(
+            request, "investigation_stats", ["investigation_outcomes"],
+            lambda: orchestrator.db.aio.run(orchestrator.get_investigation_statistics),
+        )
     else:
         return {"error": "Orchestrator not initialized."}
 
 @app.get("/alert/{alert_id}/history")
 async def get_alert_history(alert_id: str) -> Dict[str, Any]:
     """Get investigation history for an alert."""
-    judgements = orchestrator.db.execute_query(
-        "SELECT * FROM agent_judgements WHERE alert_id = ? ORDER BY timestamp",
-        (alert_id,)
-    )
-    outcome = orchestrator.db.execute_query(
+    # Includes judgements already moved to the monthly archive files.
+    judgements = await orchestrator.db.aio.run(orchestrator.db.get_alert_judgements, alert_id)
+    outcome = await orchestrator.db.aio.execute_query(
         "SELECT * FROM investigation_outcomes WHERE alert_id = ?",
         (alert_id,)
     )
+    for row in outcome:
+        row["agent_outputs"] = decode_json(row.get("agent_outputs"), {})
     return {
         'alert_id': alert_id,
         'judgements': judgements,
@@ -150,13 +258,30 @@ async def get_alert_history(alert_id: str) -> Dict[str, Any]:
     }
 
 # NEW: Endpoint to retrieve the full stored investigation result
+@app.get("/alert/{alert_id}/full_result")
+async def get_alert_full_result(alert_id: str) -> Dict[str, Any]:
+    """The complete stored workflow payload of the last investigation of an alert."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    result = await orchestrator.db.aio.run(orchestrator.db.get_full_investigation_result, alert_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Full result not found for this alert_id")
+    return result
+
+@app.get("/search")
+async def search_outcomes(q: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Full-text search over outcome summaries, explanations and risk factors, best match first."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return await orchestrator.db.aio.run(outcome_search.search, orchestrator.db, q, limit, offset)
+
 @app.get("/alert/{alert_id}/result")
 async def get_alert_result(alert_id: str) -> Dict[str, Any]:
     """Retrieve the investigation outcome for a given alert_id (from investigation_outcomes)."""
     if orchestrator is None:
         raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
 
-    rows = orchestrator.db.execute_query(
+    rows = await orchestrator.db.aio.execute_query(
         """
         SELECT outcome_id, alert_id, final_outcome, is_suspicious, confidence_score,
                investigation_summary, human_verified, timestamp, agent_outputs
@@ -170,28 +295,43 @@ async def get_alert_result(alert_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=404, detail="Result not found for this alert_id")
 
     rec = rows[0]
-    # Parse agent_outputs JSON (stored as TEXT)
-    ao = rec.get("agent_outputs")
-    if isinstance(ao, str) and ao.strip():
-        try:
-            rec["agent_outputs"] = json.loads(ao)
-        except Exception:
-            # leave as raw string if parsing fails
-            pass
-    elif ao is None:
-        rec["agent_outputs"] = {}
+    # agent_outputs is stored compressed (or as legacy TEXT); decode only here, on demand.
+    rec["agent_outputs"] = decode_json(rec.get("agent_outputs"), {})
 
     return rec
  
 @app.get("/investigation_outcomes")
-async def get_investigation_outcomes() -> List[Dict[str, Any]]:
-    """Fetches all records from the investigation_outcomes table."""
-    if orchestrator:
-        query = "SELECT * FROM investigation_outcomes ORDER BY timestamp DESC"
-        results = orchestrator.db.execute_query(query)
-        return results
-    else:
+async def get_investigation_outcomes(
+    request: Request,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    outcome: Optional[str] = None,
+    is_suspicious: Optional[bool] = None,
+    human_verified: Optional[bool] = None,
+    alert_type: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One page of investigation outcomes, newest first. Pass `next_cursor` back as `cursor`
+    for the next page. `start`/`end` accept dates (end inclusive) or ISO datetimes;
+    `fields` is a comma-separated projection (agent_outputs only when asked for).
+    """
+    if orchestrator is None:
         raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    try:
+        return await response_cache.respond(
+            request, f"investigation_outcomes?{request.url.query}", ["investigation_outcomes", "alerts"],
+            lambda: orchestrator.db.aio.run(
+                orchestrator.db.list_investigation_outcomes,
+                limit=limit, cursor=cursor, outcome=outcome, is_suspicious=is_suspicious,
+                human_verified=human_verified, alert_type=alert_type, start=start, end=end,
+                fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            ),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
 @app.post("/alerts/{alert_id}/finalize_review")
 def finalize_review(alert_id: str, body: ReviewFinalizeRequest):
@@ -203,6 +343,7 @@ def finalize_review(alert_id: str, body: ReviewFinalizeRequest):
             is_suspicious=body.is_suspicious,
             investigation_summary=body.investigation_summary,
         )
+        orchestrator.case_index.mark_dirty()
         return {
             "alert_id": alert_id,
             "review_status": 2,
@@ -218,6 +359,39 @@ def finalize_review(alert_id: str, body: ReviewFinalizeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to finalize review: {e}")
 
+@app.get("/similar_cases/stats")
+def similar_case_stats() -> Dict[str, Any]:
+    """Hit rate and latency savings of the verified-precedent short-circuit."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return orchestrator.case_index.get_statistics()
+
+@app.post("/feedback/calibrate_thresholds")
+def calibrate_thresholds(publish: bool = True) -> Dict[str, Any]:
+    """Fit per-alert-type thresholds from human-verified outcomes and publish them."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return orchestrator.agents['feedback'].calibrate_thresholds(publish=publish)
+
+@app.get("/feedback/thresholds")
+def get_thresholds() -> Dict[str, Any]:
+    """Thresholds currently used by the agents."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return orchestrator.thresholds.snapshot()
+
+@app.get("/llm_usage")
+def llm_usage() -> Dict[str, Any]:
+    """Token usage per prompt template, including provider-side cached prompt tokens, and structured-output health."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return {
+        "usage": orchestrator.llm_helper.get_usage_statistics(),
+        "templates": prompt_registry.describe(),
+        "structured_output": orchestrator.llm_helper.get_structured_statistics(),
+        "pattern_parse": orchestrator.agents['pattern'].parse_stats,
+    }
+
 @app.get("/__routes")
 def list_routes():
     return [
@@ -226,9 +400,115 @@ def list_routes():
       if hasattr(route, "methods")
     ]
 
+@app.get("/db/pool_stats")
+def db_pool_stats() -> Dict[str, Any]:
+    """Connection pool usage: open/idle connections and time spent waiting for one."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return {**orchestrator.db.get_pool_statistics(), "response_cache": response_cache.get_statistics(),
+            "events": change_broadcaster.get_statistics(),
+            "sql_sandbox": orchestrator.agents['ingestion'].sandbox.get_statistics(),
+            "evidence_snapshots": orchestrator.agents['ingestion'].snapshot_runner.get_statistics(),
+            "evidence_cache": orchestrator.agents['ingestion'].evidence_cache.get_statistics()}
+
+@app.post("/db/stats_counters/rebuild")
+def db_rebuild_stats_counters() -> Dict[str, Any]:
+    """Recompute the trigger-maintained statistics counters from the base tables."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    orchestrator.db.rebuild_stats_counters()
+    return stats_counters.check(orchestrator.db)
+
+@app.get("/db/query_metrics")
+def db_query_metrics() -> Dict[str, Any]:
+    """Evidence query latency and row counts per catalogue template (LLM-generated SQL as ad_hoc)."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return orchestrator.agents['ingestion'].query_metrics.get_statistics()
+
+@app.get("/db/query_plans")
+def db_query_plans() -> Dict[str, Any]:
+    """Stored contextual query plans per (alert type, goal, loop depth) and library hit counts."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    library = orchestrator.agents['ingestion'].plan_library
+    if library is None:
+        raise HTTPException(status_code=404, detail="Query plan library is disabled.")
+    return {"statistics": library.get_statistics(), "plans": library.list_plans()}
+
+@app.delete("/db/query_plans/{plan_key}")
+def db_forget_query_plan(plan_key: str) -> Dict[str, Any]:
+    """Drop a stored plan so the next alert in that situation asks the LLM again."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    library = orchestrator.agents['ingestion'].plan_library
+    if library is None:
+        raise HTTPException(status_code=404, detail="Query plan library is disabled.")
+    removed = library.forget(plan_key)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return {"removed": removed}
+
+@app.get("/db/index_advice")
+def db_index_advice() -> Dict[str, Any]:
+    """Plan problems in the logged investigation queries and the indexes that would fix them."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return IndexAdvisor(orchestrator.db).advise()
+
+@app.post("/db/index_advice/apply")
+def db_apply_index_advice() -> Dict[str, Any]:
+    """Create the proposed indexes as migrations and report per-query latency before and after."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return IndexAdvisor(orchestrator.db).apply()
+
+@app.on_event("shutdown")
+def close_database_pools():
+    if orchestrator is not None:
+        orchestrator.db.close()
+
+@app.get("/events")
+async def events(request: Request):
+    """Server-sent events: outcomes / review_status / stats change notifications."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    queue = await change_broadcaster.subscribe()
+    return StreamingResponse(
+        change_broadcaster.stream(request, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/health")
-async def health_check():
-    return {"status": "healthy", "agents": list(orchestrator.agents.keys())}
+async def health_check(request: Request):
+    async def compute():
+        return {"status": "healthy", "agents": list(orchestrator.agents.keys())}
+    # Static for the life of the process: validated by the cache's per-boot marker alone.
+    return await response_cache.respond(request, "health", [], compute)
+
+async def continuous_archiving():
+    """Move judgements and full results past the retention window into the archive files, batch by batch."""
+    while True:
+        try:
+            moved = await orchestrator.db.aio.run(orchestrator.db.archiver.run_once)
+            # Keep draining while there is a backlog; otherwise wait for the next interval.
+            await asyncio.sleep(1 if any(moved.values()) else config['archive_interval_s'])
+        except Exception as e:
+            print(f"Error in archival: {e}")
+            await asyncio.sleep(config['archive_interval_s'])
+
+@app.on_event("startup")
+async def start_archiver():
+    if orchestrator is not None and config['archive_enabled']:
+        asyncio.create_task(continuous_archiving())
+
+@app.get("/db/archive_stats")
+def db_archive_stats() -> Dict[str, Any]:
+    """Rows moved to the monthly archives, partition file sizes and hot database size."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized.")
+    return orchestrator.db.archiver.get_statistics()
 
 async def continuous_processing():
     """Continuously process pending alerts."""
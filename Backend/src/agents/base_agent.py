@@ -16,9 +16,9 @@ class BaseAgent(ABC):
         """Execute agent logic and return the next state and a flag to continue."""
         pass
 
-    def log_judgement(self, alert_id: str, action: str, confidence: float,
-                      rationale: Dict[str, Any], loop_iteration: int = 0,
-                      queries_executed: Optional[List[str]] = None):
+    async def log_judgement(self, alert_id: str, action: str, confidence: float,
+                            rationale: Dict[str, Any], loop_iteration: int = 0,
+                            queries_executed: Optional[List[str]] = None):
         """Log agent decision to the database for audit trail."""
         judgement = {
             'judgement_id': str(uuid.uuid4()),
@@ -31,19 +31,11 @@ class BaseAgent(ABC):
             'loop_iteration': loop_iteration,
             'queries_executed': json.dumps(queries_executed or [])
         }
-        with self.db.get_connection() as conn:
-            conn.execute("""
-            INSERT INTO agent_judgements
-            (judgement_id, alert_id, agent_name, action, confidence, rationale_json, timestamp, loop_iteration, queries_executed)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (judgement['judgement_id'], judgement['alert_id'], judgement['agent_name'],
-                  judgement['action'], judgement['confidence'], judgement['rationale_json'],
-                  judgement['timestamp'], judgement['loop_iteration'], judgement['queries_executed']))
-            conn.commit()
+        await self.db.aio.insert_judgement(judgement)
     
-    def get_previous_judgements(self, alert_id: str) -> List[Dict[str, Any]]:
+    async def get_previous_judgements(self, alert_id: str) -> List[Dict[str, Any]]:
         """Get previous judgments for a specific alert."""
-        return self.db.execute_query(
+        return await self.db.aio.execute_query(
             "SELECT * FROM agent_judgements WHERE alert_id = ? ORDER BY timestamp",
             (alert_id,)
-        )
\ No newline at end of file
+        )
@@ -1,8 +1,51 @@
 from typing import Dict, Any, List
 from src.agents.base_agent import BaseAgent
+from src.data.evidence_set import EvidenceSet
+from src.data.models import StructuredRationale
+from src.utils.prompt_templates import prompt_registry
 from src.workflow.state import AlertInvestigationState
 import json
 
+prompt_registry.register(
+    "explanation",
+    prefix="""
+You are an expert fraud analyst writing investigation summaries.
+
+Write a concise explanation for a business investigator, making clear the overall verdict and supporting evidence.
+
+- If False Positive: Clearly explain why the observed behavior is normal given historical evidence.
+- If True Positive: Clearly explain why this is a likely fraud/true alert, referencing the evidence or pattern.
+- If Human Review: Clearly explain the ambiguous points and why human review is recommended.
+""",
+    suffix="""
+The pattern analysis verdict for this alert is: {result_context}. Make the verdict (**{result_context}**) clear.
+
+PATTERN ANALYSIS: {patterns}
+ALERT CONTEXT: {context}
+""",
+)
+
+prompt_registry.register(
+    "structured_rationale",
+    prefix="""
+Based on the investigation data below, create a structured rationale in JSON format.
+
+Create a JSON response with the following keys:
+1. key_points: List of main evidence points
+2. risk_level: LOW/MEDIUM/HIGH
+3. recommendation: CLOSE/ESCALATE/INVESTIGATE_FURTHER
+4. confidence_factors: What increases/decreases confidence
+5. investigation_summary: Brief summary of findings
+6. confidence: float (0.0-1.0)
+""",
+    suffix="""
+ALERT CONTEXT: {context}
+PATTERNS DETECTED: {patterns}
+RESULT VERDICT: {result_context}
+EXPLANATION: {explanation}
+""",
+)
+
 class ExplanationAgent(BaseAgent):
     def _get_result_context(self, confidence: float) -> str:
         if confidence >= 0.7:
@@ -28,21 +71,13 @@ class ExplanationAgent(BaseAgent):
         result_context = self._get_result_context(confidence)
 
         # 1. Generate the natural-language explanation, context-aware
-        explanation_prompt = f"""
-You are an expert fraud analyst writing investigation summaries.
-
-PATTERN ANALYSIS: {json.dumps(patterns_output, indent=2)}
-ALERT CONTEXT: {json.dumps(context, indent=2)}
-
-The pattern analysis verdict for this alert is: {result_context}.
-
-Write a concise explanation for a business investigator, making clear the overall verdict (**{result_context}**) and supporting evidence.
-
-- If False Positive: Clearly explain why the observed behavior is normal given historical evidence.
-- If True Positive: Clearly explain why this is a likely fraud/true alert, referencing the evidence or pattern.
-- If Human Review: Clearly explain the ambiguous points and why human review is recommended.
-"""
-        explanation = await self.llm_helper.generate_response(explanation_prompt)
+        explanation_prompt = prompt_registry.render(
+            "explanation",
+            result_context=result_context,
+            patterns=json.dumps(patterns_output, indent=2),
+            context=json.dumps(context, indent=2),
+        )
+        explanation = await self.llm_helper.generate_response(explanation_prompt, usage_key="explanation")
 
         # 2. Generate a structured rationale JSON, also context-aware
         rationale = await self._generate_structured_rationale(context, patterns_output, explanation, result_context)
@@ -52,7 +87,7 @@ Write a concise explanation for a business investigator, making clear the overal
         investigation_trail = self._build_investigation_trail(state, result_context)
         
         # 4. Log the judgement
-        self.log_judgement(
+        await self.log_judgement(
             alert_id=alert_id,
             action="explanation_generated",
             confidence=rationale.get("confidence", 0.0),
@@ -96,35 +131,30 @@ Write a concise explanation for a business investigator, making clear the overal
         result_context: str
     ) -> Dict[str, Any]:
         """Use LLM to generate a structured JSON rationale for decision making."""
-        rationale_prompt = f"""
-Based on this investigation data, create a structured rationale in JSON format:
-ALERT CONTEXT: {json.dumps(context, indent=2)}
-PATTERNS DETECTED: {json.dumps(patterns, indent=2)}
-RESULT VERDICT: {result_context}
-EXPLANATION: {explanation}
-
-Create a JSON response with the following keys:
-1. key_points: List of main evidence points
-2. risk_level: LOW/MEDIUM/HIGH
-3. recommendation: CLOSE/ESCALATE/INVESTIGATE_FURTHER
-4. confidence_factors: What increases/decreases confidence
-5. investigation_summary: Brief summary of findings
-6. confidence: float (0.0-1.0)
-        """ 
-        response = await self.llm_helper.generate_response(rationale_prompt)
-        try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            return {
-                'key_points': ['Analysis generated'],
-                'risk_level': 'MEDIUM',
-                'recommendation': 'INVESTIGATE_FURTHER',
-                'confidence_factors': ['Pattern analysis completed'],
-                'investigation_summary': explanation[:200],
-                'confidence': 0.5,
-            }
+        rationale_prompt = prompt_registry.render(
+            "structured_rationale",
+            context=json.dumps(context, indent=2),
+            patterns=json.dumps(patterns, indent=2),
+            result_context=result_context,
+            explanation=explanation,
+        )
+        rationale = await self.llm_helper.generate_structured(
+            rationale_prompt, StructuredRationale, usage_key="structured_rationale"
+        )
+        if rationale is not None:
+            return rationale.model_dump()
+        return {
+            'key_points': ['Analysis generated'],
+            'risk_level': 'MEDIUM',
+            'recommendation': 'INVESTIGATE_FURTHER',
+            'confidence_factors': ['Pattern analysis completed'],
+            'investigation_summary': explanation[:200],
+            'confidence': 0.5,
+        }
 
     def _summarize_evidence(self, evidence: Dict[str, Any]) -> Dict[str, Any]:
+        if isinstance(evidence, EvidenceSet):
+            return evidence.summarize()
         total_queries_executed = sum(1 for key in evidence if key.endswith("_sql"))
         total_data_points = sum(len(value) if isinstance(value, list) else 1 for key, value in evidence.items() if not key.endswith("_sql"))
         key_findings: List[str] = [f"{key}: {len(value)} records found" for key, value in evidence.items() if isinstance(value, list) and value]
@@ -1,21 +1,215 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
+from datetime import datetime
+import numpy as np
 from src.agents.base_agent import BaseAgent
+from src.utils.thresholds import ThresholdStore
 from src.workflow.state import AlertInvestigationState
 
+# Candidate threshold values searched by the calibration job.
+THRESHOLD_GRID = np.round(np.arange(0.05, 1.0, 0.05), 2)
+
 class FeedbackAgent(BaseAgent):
+    def __init__(self, db_manager, llm_helper, config, thresholds: Optional[ThresholdStore] = None):
+        super().__init__(db_manager, llm_helper, config)
+        self.thresholds = thresholds or ThresholdStore(config)
+        self.max_loops = int(config.get('max_loops', 3))
+        self.min_cases = int(config.get('calibration_min_cases', 5))
+
     async def execute(self, state: AlertInvestigationState) -> Tuple[AlertInvestigationState, bool]:
         """Placeholder for a feedback agent that would handle human input."""
-        # This agent would typically receive human input and store it for retraining.
-        # The logic to update models would live here or be triggered by this agent.
+        # Human input is persisted by the finalize_review endpoint; calibrate_thresholds()
+        # turns the accumulated verdicts into the thresholds the other agents use.
         print(f"Feedback Agent: Received feedback on alert {state.alert_id}. Learning in progress...")
-        
-        # Example of how it might log feedback
-        # self.log_judgement(
-        #     alert_id=state.alert_id,
-        #     action="feedback_received",
-        #     confidence=1.0,
-        #     rationale={'feedback_text': 'This was a false positive.'}
-        # )
-        
-        # For this implementation, it's a pass-through to show where it would fit.
-        return state, True
\ No newline at end of file
+        return state, True
+
+    def calibrate_thresholds(self, publish: bool = True) -> Dict[str, Any]:
+        """
+        Fit pattern/risk/auto-close thresholds per alert type from human-verified outcomes.
+
+        For every candidate (pattern, auto_close, risk) triple the job simulates the workflow
+        on the verified cases. The pattern gate is replayed on the pattern agent's per-loop
+        confidences: an alert stops looping at the first loop whose confidence reaches the
+        threshold and is decided on that loop's confidence, so a lower pattern threshold
+        saves loops but decides on the earlier, possibly different, verdict. Confidence
+        inside the (auto_close, risk) band costs max_loops loop-backs. The cheapest triple
+        whose escalation precision and auto-close precision are no worse than the current
+        thresholds' is kept. Types with too few verified cases use a global fit.
+        """
+        rows = self.db.execute_query(
+            """
+            SELECT io.alert_id, a.alert_type, io.confidence_score, io.is_suspicious,
+                   (SELECT MAX(j.loop_iteration) FROM agent_judgements j WHERE j.alert_id = io.alert_id) AS loops
+            FROM investigation_outcomes io
+            JOIN alerts a ON a.alert_id = io.alert_id
+            WHERE io.human_verified = 1
+            """
+        )
+        pattern_confidences = self._pattern_confidences()
+        for r in rows:
+            r['pattern_confidences'] = pattern_confidences.get(r['alert_id'], [])
+        groups: Dict[str, list] = {}
+        for r in rows:
+            groups.setdefault(r['alert_type'], []).append(r)
+
+        report: Dict[str, Any] = {'verified_cases': len(rows), 'alert_types': {}, 'skipped': {}}
+        calibration: Dict[str, Any] = {'generated_at': datetime.now().isoformat(), 'global': {}, 'alert_types': {}}
+
+        global_fit = self._fit(rows, None) if len(rows) >= self.min_cases else None
+        if global_fit:
+            calibration['global'] = global_fit['thresholds']
+            report['global'] = global_fit['report']
+
+        for alert_type, cases in groups.items():
+            if len(cases) < self.min_cases:
+                report['skipped'][alert_type] = f"{len(cases)} verified cases (< {self.min_cases})"
+                continue
+            fit = self._fit(cases, alert_type)
+            if fit:
+                calibration['alert_types'][alert_type] = fit['thresholds']
+                report['alert_types'][alert_type] = fit['report']
+            else:
+                report['skipped'][alert_type] = "no thresholds keep precision at current levels"
+
+        report['simulated_loops_saved'] = sum(f['loops_saved'] for f in report['alert_types'].values())
+        if global_fit:
+            calibrated_types = set(report['alert_types'])
+            uncovered = [r for r in rows if r['alert_type'] not in calibrated_types]
+            report['simulated_loops_saved'] += self._loops_saved_for(uncovered, global_fit['thresholds'])
+        calibration['report'] = report
+
+        if publish:
+            self.thresholds.publish(calibration)
+            print(f"[{self.agent_name}] Published calibrated thresholds to {self.thresholds.path}.")
+        return calibration
+
+    def _pattern_confidences(self) -> Dict[str, list]:
+        """Per verified alert, the pattern agent's confidence at each loop (the last judgement of a loop wins)."""
+        judgements = self.db.execute_query(
+            """
+            SELECT j.alert_id, j.loop_iteration, j.confidence
+            FROM agent_judgements j
+            JOIN investigation_outcomes io ON io.alert_id = j.alert_id AND io.human_verified = 1
+            WHERE j.agent_name = 'PatternRecognitionAgent' AND j.action = 'pattern_analysis_complete'
+            ORDER BY j.alert_id, j.loop_iteration, j.timestamp
+            """
+        )
+        per_loop: Dict[str, Dict[int, float]] = {}
+        for j in judgements:
+            per_loop.setdefault(j['alert_id'], {})[int(j['loop_iteration'] or 0)] = float(j['confidence'] or 0.0)
+        return {alert_id: [loops[i] for i in sorted(loops)] for alert_id, loops in per_loop.items()}
+
+    def _case_arrays(self, cases: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (pattern confidence per case and loop, final confidence, label). Loops the case never
+        ran are NaN. Cases without pattern judgements (precedent matches, archived history)
+        get +inf at loop 0, so every pattern threshold passes them with no loop and no change.
+        """
+        width = max([len(c['pattern_confidences']) for c in cases] + [1])
+        seqs = np.full((len(cases), width), np.nan)
+        for i, c in enumerate(cases):
+            seqs[i, :len(c['pattern_confidences']) or 1] = c['pattern_confidences'] or [np.inf]
+        final = np.array([float(c['confidence_score'] or 0.0) for c in cases])
+        label = np.array([bool(c['is_suspicious']) for c in cases])
+        return seqs, final, label
+
+    def _fit(self, cases: list, alert_type: Optional[str]) -> Optional[Dict[str, Any]]:
+        seqs, final, label = self._case_arrays(cases)
+        observed_loops = int(sum(int(c['loops'] or 0) for c in cases))
+
+        current = tuple(self.thresholds.get(k, alert_type) for k in
+                        ('pattern_confidence_threshold', 'auto_close_threshold', 'risk_threshold'))
+        base = self._simulate(seqs, final, label, *(np.array([v]) for v in current))
+        base_precision = base['precision'][0]
+        base_npv = base['npv'][0]
+
+        # Broadcast the full (pattern, auto_close, risk) grid: shapes (g,1,1), (1,g,1), (1,1,g).
+        g = THRESHOLD_GRID
+        sim = self._simulate(seqs, final, label, g[:, None, None], g[None, :, None], g[None, None, :])
+        feasible = (
+            (g[None, :, None] < g[None, None, :])
+            & (g[:, None, None] <= g[None, None, :])
+            & (sim['precision'] >= base_precision - 1e-9)
+            & (sim['npv'] >= base_npv - 1e-9)
+        )
+        if not feasible.any():
+            return None
+
+        # Fewest loops first, then fewest human reviews, then closest to the current thresholds.
+        drift = (np.abs(g[:, None, None] - current[0]) + np.abs(g[None, :, None] - current[1])
+                 + np.abs(g[None, None, :] - current[2]))
+        score = np.where(feasible, sim['loops'] * 1e6 + sim['reviews'] * 1e3 + drift, np.inf)
+        p_i, a_i, r_i = np.unravel_index(int(np.argmin(score)), score.shape)
+
+        thresholds = {
+            'pattern_confidence_threshold': float(g[p_i]),
+            'auto_close_threshold': float(g[a_i]),
+            'risk_threshold': float(g[r_i]),
+        }
+        loops_calibrated = int(sim['loops'][p_i, a_i, r_i])
+        return {
+            'thresholds': thresholds,
+            'report': {
+                'cases': len(cases),
+                'thresholds': thresholds,
+                'observed_loops': observed_loops,
+                'simulated_loops_current': int(base['loops'][0]),
+                'simulated_loops_calibrated': loops_calibrated,
+                'loops_saved': int(base['loops'][0]) - loops_calibrated,
+                'human_reviews_current': int(base['reviews'][0]),
+                'human_reviews_calibrated': int(sim['reviews'][p_i, a_i, r_i]),
+                'escalation_precision_current': self._rounded(base_precision),
+                'escalation_precision_calibrated': self._rounded(sim['precision'][p_i, a_i, r_i]),
+                'auto_close_precision_current': self._rounded(base_npv),
+                'auto_close_precision_calibrated': self._rounded(sim['npv'][p_i, a_i, r_i]),
+            },
+        }
+
+    def _simulate(self, seqs, final, label, pattern, auto_close, risk) -> Dict[str, np.ndarray]:
+        """Vectorized replay of the workflow decisions; threshold arrays broadcast against each other."""
+        lead = (1,) * np.ndim(pattern)
+        # Pattern gate: first observed loop whose confidence reaches the threshold.
+        with np.errstate(invalid="ignore"):
+            reached = seqs.reshape(lead + seqs.shape) >= np.asarray(pattern)[..., None, None]
+        passed = reached.any(-1)
+        stop = reached.argmax(-1)
+        last = (np.sum(~np.isnan(seqs), -1) - 1).reshape(lead + (-1,))
+        f = final.reshape(lead + (-1,))
+        # Stopping at the last observed loop (or never passing) is what was actually decided;
+        # stopping earlier decides on that loop's pattern confidence.
+        early = np.take_along_axis(seqs.reshape(lead + seqs.shape), np.minimum(stop, last)[..., None], -1)[..., 0]
+        c = np.where(passed & (stop < last), early, f)
+        pattern_loops = np.where(passed, stop, self.max_loops)
+
+        y = label.reshape(lead + (-1,))
+        escalate = c >= np.asarray(risk)[..., None]
+        close = (c <= np.asarray(auto_close)[..., None]) & ~escalate
+        review = ~escalate & ~close
+        # Both gates share one loop budget per alert.
+        loops = np.maximum(pattern_loops, np.where(review, self.max_loops, 0)).sum(-1)
+
+        escalated = escalate.sum(-1)
+        closed = close.sum(-1)
+        # With no escalations (or closures) there is nothing to be imprecise about.
+        precision = np.where(escalated > 0, (escalate & y).sum(-1) / np.maximum(escalated, 1), 1.0)
+        npv = np.where(closed > 0, (close & ~y).sum(-1) / np.maximum(closed, 1), 1.0)
+        shape = np.broadcast_shapes(np.shape(pattern), np.shape(auto_close), np.shape(risk))
+        return {name: np.broadcast_to(value, shape) for name, value in
+                (('loops', loops), ('reviews', review.sum(-1)), ('precision', precision), ('npv', npv))}
+
+    def _loops_saved_for(self, cases: list, thresholds: Dict[str, float]) -> int:
+        if not cases:
+            return 0
+        seqs, final, label = self._case_arrays(cases)
+        keys = ('pattern_confidence_threshold', 'auto_close_threshold', 'risk_threshold')
+        saved = 0
+        for alert_type in {c['alert_type'] for c in cases}:
+            mask = np.array([c['alert_type'] == alert_type for c in cases])
+            current = [np.array([self.thresholds.get(k, alert_type)]) for k in keys]
+            fitted = [np.array([thresholds[k]]) for k in keys]
+            saved += int(self._simulate(seqs[mask], final[mask], label[mask], *current)['loops'][0]
+                         - self._simulate(seqs[mask], final[mask], label[mask], *fitted)['loops'][0])
+        return saved
+
+    @staticmethod
+    def _rounded(value) -> float:
+        return round(float(value), 4)
@@ -1,8 +1,15 @@
 # src/agents/ingestion_agent.py
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, Union
 from src.agents.base_agent import BaseAgent
+from src.data.aggregate_evidence import aggregate_queries
 from src.data.query_generator import IntelligentQueryGenerator
+from src.data.evidence_cache import EvidenceCache, get_user_version
+from src.data.evidence_set import EvidenceSet
+from src.data.evidence_snapshot import SnapshotQueryRunner
+from src.data.query_plans import QueryPlanLibrary
+from src.data.query_sandbox import QuerySandbox
+from src.data.query_templates import BoundQuery, TemplateMetrics, bind
 from src.workflow.state import AlertInvestigationState
 import asyncio
 import json
@@ -14,15 +21,39 @@ NEW_PAYEE_TRANSACTION_THRESHOLD = 50_000
 class IngestionAgent(BaseAgent):
     def __init__(self, db_manager, llm_helper, config):
         super().__init__(db_manager, llm_helper, config)
-        self.query_generator = IntelligentQueryGenerator(db_manager.schema_info, llm_helper)
         self.output_dir = "ingestion_outputs" # Define output directory
+        # LLM-generated SQL runs read-only with plan, time and size guards.
+        self.sandbox = QuerySandbox(
+            db_manager,
+            max_rows=config.get('sql_sandbox_max_rows'),
+            max_bytes=config.get('sql_sandbox_max_bytes'),
+            timeout_ms=config.get('sql_sandbox_timeout_ms'),
+            scan_row_limit=config.get('sql_sandbox_scan_row_limit'),
+        )
+        self.query_metrics = TemplateMetrics()
+        # Contextual queries come from stored per-situation plans; the LLM is asked only for new situations.
+        self.plan_library = QueryPlanLibrary(db_manager, self.sandbox) if config.get('query_plan_library_enabled', True) else None
+        self.query_generator = IntelligentQueryGenerator(db_manager.schema_info, llm_helper, self.plan_library)
+        self.evidence_cache = EvidenceCache(
+            max_bytes=config.get('evidence_cache_max_bytes', 64 * 1024 * 1024),
+            max_entries=config.get('evidence_cache_max_entries', 10000),
+        )
+        self.snapshot_runner = SnapshotQueryRunner(
+            db_manager, self.sandbox,
+            workers=config.get('evidence_query_workers'),
+            attempts=config.get('evidence_snapshot_attempts', 2),
+        )
+        # "aggregate": counts and sums over a lookback window plus capped samples; "full": whole-history rows.
+        self.ingestion_mode = config.get('ingestion_mode', 'aggregate')
+        self.lookback_days = int(config.get('evidence_lookback_days', 180))
+        self.sample_rows = int(config.get('evidence_sample_rows', 20))
 
     async def execute(self, state: AlertInvestigationState) -> Dict[str, Any]:
         alert_id = state.alert_id
         loop_iteration = state.loop_count
         print(f"[{self.agent_name}] Starting for alert {alert_id}. Loop iteration: {loop_iteration}")
 
-        alert_basic = self._get_alert_basic_info(alert_id)
+        alert_basic = await self._get_alert_basic_info(alert_id)
         if not alert_basic:
             print(f"[{self.agent_name}] Error: Alert {alert_id} not found.")
             return {"agent_outputs": {self.agent_name: {"error": "Alert not found"}}, "success": False}
@@ -31,59 +62,52 @@ class IngestionAgent(BaseAgent):
         print(f"[{self.agent_name}] Investigation goal: '{investigation_goal}'")
 
         contextual = await self.query_generator.generate_contextual_queries(
-            alert_basic, investigation_goal, state.context_data
-        )
-        specific = self.query_generator.generate_specific_queries(
-            alert_basic.get("alert_type", ""),
-            alert_basic.get("user_id", ""),
-            alert_basic.get("transaction_id"),
-            alert_basic.get("account_id")
+            alert_basic, investigation_goal, state.context_data, loop_depth=loop_iteration
         )
-
         user_id = alert_basic["user_id"]
         account_id = alert_basic["account_id"]
+        aggregate = self.ingestion_mode == "aggregate"
+
+        if aggregate:
+            # The alert-type aggregates replace the 'now'-relative specific queries.
+            specific = aggregate_queries(alert_basic, self.lookback_days, self.sample_rows)
+        else:
+            specific = self.query_generator.generate_specific_queries(
+                alert_basic.get("alert_type", ""),
+                alert_basic.get("user_id", ""),
+                alert_basic.get("transaction_id"),
+                alert_basic.get("account_id")
+            )
         
-        all_queries: List[str] = contextual + specific
+        all_queries: List[Union[str, BoundQuery]] = contextual + specific
         
-        if alert_basic.get("alert_type") == "NewPayee":
-             all_queries.append(f"""
-                SELECT
-                    t.transaction_id,
-                    t.timestamp,
-                    t.amount,
-                    t.payee_id,
-                    up.date_added_by_user
-                FROM transactions AS t
-                JOIN user_payees AS up
-                    ON t.user_id = up.user_id AND t.payee_id = up.payee_id
-                WHERE
-                    t.user_id = '{user_id}'
-                    AND t.amount >= {NEW_PAYEE_TRANSACTION_THRESHOLD}
-                    AND (
-                        (
-                            julianday(t.timestamp) - julianday(up.date_added_by_user)
-                        ) BETWEEN 0 AND {NEW_PAYEE_WINDOW_DAYS}
-                    )
-                ORDER BY
-                    t.timestamp DESC;
-            """)
-        else:
+        # Full mode reads the user's whole history; aggregate mode already has its windowed equivalents.
+        if not aggregate and alert_basic.get("alert_type") == "NewPayee":
+            all_queries.append(bind("new_payee_history", user_id, NEW_PAYEE_TRANSACTION_THRESHOLD, NEW_PAYEE_WINDOW_DAYS))
+        elif not aggregate:
             all_queries.extend([
-                f"SELECT * FROM user_payees WHERE user_id = '{user_id}';",
-                f"SELECT * FROM transactions WHERE user_id = '{user_id}' ORDER BY timestamp DESC;",
-                f"""SELECT * FROM login_attempts WHERE user_id = '{user_id}' ORDER BY timestamp DESC;""",
-                f"SELECT * FROM accounts WHERE account_id = '{account_id}';",
-                f"""SELECT d.* FROM devices d JOIN user_devices ud ON d.device_id = ud.device_id WHERE ud.user_id = '{user_id}';""",
+                bind("user_payees", user_id),
+                bind("user_transactions", user_id),
+                bind("user_logins", user_id),
+                bind("account", account_id),
+                bind("user_devices", user_id),
             ])
         
         print(f"[{self.agent_name}] Generated {len(all_queries)} total queries.")
 
         # Execute all queries
-        full_evidence = await self._execute_intelligent_queries(all_queries)
+        full_evidence, snapshot = await self._execute_intelligent_queries(all_queries, user_id)
         print(f"[{self.agent_name}] Collected {len(full_evidence)} pieces of evidence.")
 
         # --- NEW LOGIC: FILTER EVIDENCE FOR NEWPAYEE ALERTS ---
-        if alert_basic.get("alert_type") == "NewPayee":
+        if alert_basic.get("alert_type") == "NewPayee" and aggregate:
+            events = self._find_results_for_template(full_evidence, all_queries, "new_payee_events_window")
+            evidence_to_pass = {
+                "historical_new_payee_events_count": events[0]["new_payee_events"] if events else 0,
+                "historical_new_payee_events_sample": self._find_results_for_template(
+                    full_evidence, all_queries, "new_payee_sample_window"),
+            }
+        elif alert_basic.get("alert_type") == "NewPayee":
             # Find the specific query output for new payee events
             new_payee_query_results_list = self._find_results_for_query_part(full_evidence, "JOIN user_payees AS up")
             
@@ -107,24 +131,25 @@ class IngestionAgent(BaseAgent):
         except Exception as e:
             print(f"[{self.agent_name}] Error saving evidence to JSON file: {e}")
 
-        self.log_judgement(
+        await self.log_judgement(
             alert_id=alert_id,
             action="data_ingestion_complete",
             confidence=1.0,
-            rationale={"dynamic_queries": len(contextual) + len(specific), "total_queries": len(all_queries), "total_evidence": len(full_evidence)},
+            rationale={"dynamic_queries": len(contextual) + len(specific), "total_queries": len(all_queries), "total_evidence": len(full_evidence), "snapshot": snapshot,
+                       "ingestion_mode": self.ingestion_mode, "lookback_days": self.lookback_days if aggregate else None},
             loop_iteration=loop_iteration,
-            queries_executed=all_queries
+            queries_executed=[str(q) for q in all_queries]
         )
         print(f"[{self.agent_name}] Finished ingestion for alert {alert_id}.")
 
         return {
             "context_data": {"alert_basic": alert_basic, "investigation_goal": investigation_goal, "loop_iteration": loop_iteration},
-            "queries_executed": all_queries,
+            "queries_executed": [str(q) for q in all_queries],
             "evidence_collected": evidence_to_pass, # Pass the filtered evidence
             "success": True
         }
 
-    def _get_alert_basic_info(self, alert_id: str) -> Dict[str, Any]:
+    async def _get_alert_basic_info(self, alert_id: str) -> Dict[str, Any]:
         """Get basic alert and transaction information via a join query.""" 
         query = """
         SELECT
@@ -138,7 +163,7 @@ class IngestionAgent(BaseAgent):
         JOIN accounts acc ON a.account_id = acc.account_id
         WHERE a.alert_id = ?
         """
-        results = self.db.execute_query(query, (alert_id,))
+        results = await self.db.aio.execute_query(query, (alert_id,))
         return results[0] if results else {}
 
     def _determine_investigation_goal(self, alert_basic: Dict[str, Any], previous_context: Dict[str, Any]) -> str:
@@ -162,20 +187,47 @@ class IngestionAgent(BaseAgent):
             base_goal += ' focusing on pattern clarification.'
         return base_goal
 
-    async def _execute_intelligent_queries(self, queries: List[str]) -> Dict[str, Any]:
-        """Execute a list of queries and organize the results intelligently.""" 
-        evidence = {}
-        for i, query in enumerate(queries):
-            try:
-                results = self.db.execute_query(query)
-                evidence[f'query_{i+1}_results'] = results
-                evidence[f'query_{i+1}_sql'] = query
-                evidence[f'query_{i+1}_count'] = len(results)
-            except Exception as e:
-                evidence[f'query_{i+1}_error'] = str(e)
-                evidence[f'query_{i+1}_sql'] = query
-        return evidence
+    async def _execute_intelligent_queries(self, queries: List[Union[str, BoundQuery]],
+                                           user_id: Optional[str] = None) -> Tuple[EvidenceSet, Dict[str, Any]]:
+        """Execute the queries in parallel under one consistent snapshot and organize the results.""" 
+        # Catalogue results for this user are reused while the user's rows are unchanged.
+        version = await self.db.aio.run(self._get_user_version, user_id) if user_id else None
+        reports: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        if version is not None:
+            for i, q in enumerate(queries):
+                if isinstance(q, BoundQuery) and self.evidence_cache.cacheable(q.template):
+                    reports[i] = self.evidence_cache.get(user_id, q.template, q.params, version)
+        pending = [i for i, report in enumerate(reports) if report is None]
+        fresh, snapshot = await self.snapshot_runner.run(
+            [(queries[i].sql, queries[i].params) if isinstance(queries[i], BoundQuery) else (queries[i], ())
+             for i in pending]
+        )
+        for i, report in zip(pending, fresh):
+            reports[i] = report
+            q = queries[i]
+            if version is not None and isinstance(q, BoundQuery) and self.evidence_cache.cacheable(q.template):
+                self.evidence_cache.put(user_id, q.template, q.params, version, report)
+        snapshot["cached_queries"] = len(queries) - len(pending)
+
+        evidence = EvidenceSet(self.db.schema_info)
+        for i, (query, report) in enumerate(zip(queries, reports)):
+            template = query.template if isinstance(query, BoundQuery) else None
+            if i in pending:
+                self.query_metrics.record(template, report["elapsed_ms"], report["row_count"], report["status"])
+            if report["status"] in ("rejected", "timeout", "error"):
+                evidence.add_error(i + 1, str(query), f"{report['status']}: {report['reason']}")
+                continue
+            # Partial results are flagged so later agents do not read them as the full history.
+            sandbox = None
+            if report["status"] == "truncated" or report.get("rewritten"):
+                sandbox = {key: report[key] for key in ("status", "reason", "limit_applied", "plan") if key in report}
+            evidence.add_result(i + 1, str(query), report["rows"], sandbox)
+        return evidence, snapshot
     
+    def _get_user_version(self, user_id: str) -> int:
+        with self.db.get_read_connection() as conn:
+            return get_user_version(conn, user_id)
+
     def _find_results_for_query_part(self, evidence: Dict[str, Any], query_part: str) -> List[Dict[str, Any]]:
         """
         Finds the results list for a query that contains a specific text part.
@@ -186,3 +238,11 @@ class IngestionAgent(BaseAgent):
                 results_key = key.replace('_sql', '_results')
                 return evidence.get(results_key, [])
         return []
+
+    def _find_results_for_template(self, evidence: EvidenceSet, queries: List[Union[str, BoundQuery]],
+                                   template: str) -> List[Dict[str, Any]]:
+        """Result rows of the first query bound from `template` (empty if it failed or did not run)."""
+        for i, query in enumerate(queries):
+            if isinstance(query, BoundQuery) and query.template == template:
+                return evidence.get(f"query_{i + 1}_results", [])
+        return []
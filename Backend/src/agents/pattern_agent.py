@@ -2,11 +2,15 @@
 
 import json
 import os
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple
 
 from src.agents.base_agent import BaseAgent
-from src.data.models import AlertType
+from src.data.epoch_columns import to_epoch
+from src.data.evidence_set import EvidenceSet, prompt_view
+from src.data.models import AlertType, PatternAnalysis, BatchPatternAnalysis
+from src.utils.batching import MicroBatcher
+from src.utils.prompt_templates import prompt_registry
+from src.utils.thresholds import ThresholdStore
 from src.workflow.state import AlertInvestigationState
 
 # — Fraud‐pattern thresholds (from your data generator) —
@@ -76,12 +80,135 @@ DECISION_RULES = {
 
 
 
+ANALYSIS_RULES = """1.  **HighValue, GeoMismatch**:
+    -   Search the EVIDENCE for a pattern of similar historical transactions.
+    -   If the pattern is **anomalous** (count <= 1), treat it as a **True Positive** and set confidence > 0.7.
+    -   If the pattern is **normal behavior** (count >= 5), treat it as a **False Positive** and set confidence <= 0.5.
+    -   If the pattern is in between (count > 1 and < 5), set confidence between 0.5 and 0.7.
+
+2.  **Velocity**:
+    -   A "velocity event" is defined as a cluster of 5 or more transactions within a 5-minute window.
+    -   Analyze the EVIDENCE to count the number of historical velocity events, not individual transactions.
+    -   Use the same confidence thresholds as rule 1 based on the count of these velocity events.
+
+3.  **NewPayee**:
+    -   A "new payee event" is defined as a transaction of over **$50,000** to a payee who was added within **7 days** of the transaction timestamp.
+    -   You must carefully analyze the EVIDENCE to count the total number of these distinct historical "new payee events" for this user.
+    -   Once you have the count, strictly apply these confidence rules:
+        -   If the count of historical new payee events is **less than 2** (i.e., 0 or 1), this is an **anomalous** behavior. Set confidence **> 0.7**.
+        -   If the count is **less than 5 but more than 1** (i.e., 2, 3, or 4), this is somewhat frequent behavior. Set confidence **between 0.5 and 0.7**.
+        -   If the count is **5 or more**, this is a **normal behavior**. Set confidence **<= 0.5**.
+    
+4.  **FailedLoginTransfer**:
+    -   Fetch the transaction amount from CONTEXT and the current balance from the EVIDENCE (account details).
+    -   Calculate the percentage of the transaction amount relative to the sum of the transaction amount and current balance: `(amount / (amount + current_balance)) * 100`.
+    -   If the percentage is >= 70%, treat as a **True Positive** (confidence > 0.7).
+    -   If the percentage is <= 50%, treat as a **False Positive** (confidence <= 0.5).
+    -   If the percentage is between 50-70%, set confidence between 0.5 and 0.7 for human review.
+    -   Make sure to follow the percentage rules. % <= 50 false positive and make confidence value <= 0.5 and % >= 70 true positive and make confidence value >= 0.7 and % > 50 and < 70 human review and make confidence value between 0.5 and 0.7.
+    -   For example if "percentage" >= 70 then confidence value should be > 0.7, if "percentage" <= 50 then confidence value should be <= 0.5, if "percentage" between 50 and 70 then confidence value should be between 0.5 and 0.7.
+    -   For example If % = 68 then consider confidence also as 0.68 and if % = 72 then consider confidence as 0.72.   
+    
+5.  **HighRiskLocation**:
+    -   If the transaction location is one of the high-risk locations in the RULES, it is automatically a **True Positive**.
+    -   Do not perform historical checks. Set confidence > 0.7.
+"""
+
+EVIDENCE_FORMAT = """
+EVIDENCE lists the executed queries; each result gives its column names once ("columns") and then one array of values per row ("rows").
+Counts, sums and percentages in the EVIDENCE are computed over the user's whole lookback window; raw transaction and login rows are only a capped sample of the most recent ones, so take historical counts from the aggregates rather than by counting sample rows.
+"""
+
+OUTPUT_FORMAT = """Return a valid JSON object with the following keys:
+• **patterns**: (list of rule-names triggered)
+• **risk_indicators**: (list of high-level risk factors)
+• **confidence**: (float 0.0–1.0, adjusted based on the above rules)
+• **evidence**: (list of supporting details as name/value pairs, including historical counts or percentages)
+
+make sure to give just one complete json response and return a valid JSON object, like this:
+
+{
+    "patterns": ["HighValue"],
+    "risk_indicators": ["Transaction amount above threshold for a non-frequent user."],
+    "confidence": 0.85,
+    "evidence": [
+        {"name": "historical_high_value_transactions_count", "value": 0}
+    ]
+}
+"""
+
+BATCH_OUTPUT_FORMAT = """Analyze EACH alert in ALERTS independently, using only that alert's own CONTEXT and EVIDENCE.
+Return one valid JSON object with a single key **verdicts**: a list with exactly one entry per alert.
+Each entry must contain **alert_id** (copied from the alert) plus the keys patterns, risk_indicators, confidence and evidence, like this:
+
+{
+    "verdicts": [
+        {
+            "alert_id": "<alert_id>",
+            "patterns": ["HighValue"],
+            "risk_indicators": ["Transaction amount above threshold for a non-frequent user."],
+            "confidence": 0.85,
+            "evidence": [{"name": "historical_high_value_transactions_count", "value": 0}]
+        }
+    ]
+}
+"""
+
+PATTERN_RULES_PREFIX = f"""You are a fraud-detection assistant.
+Your task is to identify fraud patterns by strictly following the provided rules and user behavior analysis instructions.
+
+**RULES**:
+{json.dumps(RULE_DEFINITIONS, indent=2)}
+
+**ANALYSIS_RULES**:
+{ANALYSIS_RULES}
+"""
+
+# Static rules and output format lead both prompts so the shared prefix can be cached.
+prompt_registry.register(
+    "pattern_analysis",
+    prefix=PATTERN_RULES_PREFIX + EVIDENCE_FORMAT + OUTPUT_FORMAT + "\nApply the rules above to the following alert.\n",
+    suffix="""
+**ALERT_TYPE**: {alert_type}
+
+**CONTEXT**:
+{context}
+
+**EVIDENCE**:
+{evidence}
+""",
+)
+prompt_registry.register(
+    "pattern_analysis_batch",
+    prefix=PATTERN_RULES_PREFIX + EVIDENCE_FORMAT + BATCH_OUTPUT_FORMAT + "\nApply the rules above to each of the following alerts.\n",
+    suffix="""
+**ALERT_TYPE**: {alert_type}
+
+**ALERTS**:
+{alerts}
+""",
+)
+
+EMPTY_ANALYSIS = {"patterns": [], "risk_indicators": [], "confidence": 0.0, "evidence": {}, "parse_error": True}
+
+
 class PatternRecognitionAgent(BaseAgent):
-    def __init__(self, db_manager, llm_helper, config: Dict[str, Any]):
+    def __init__(self, db_manager, llm_helper, config: Dict[str, Any], thresholds: ThresholdStore = None):
         super().__init__(db_manager, llm_helper, config)
-        self.confidence_threshold = float(config.get('pattern_confidence_threshold', 0.7))
+        self.thresholds = thresholds or ThresholdStore(config)
         self.default_max_loops = int(config.get('max_loops', 3))
         self.prompt_dir = "llm_prompts"
+        self.batch_size = int(config.get('pattern_batch_size', 1))
+        self.batcher = MicroBatcher(
+            self._analyze_batch,
+            max_batch_size=self.batch_size,
+            max_wait_ms=int(config.get('pattern_batch_window_ms', 250)),
+        ) if self.batch_size > 1 else None
+        self.batch_stats = {"batched_requests": 0, "batched_alerts": 0, "single_requests": 0, "fallbacks": 0}
+        # Investigations running right now (kept by the orchestrator). A lone investigation
+        # has nothing to batch with, so it skips the batch window.
+        self.active_investigations = 0
+        self.parse_stats = {"parse_failures": 0, "parse_induced_loops": 0}
 
     async def execute(self, state: AlertInvestigationState) -> Dict[str, Any]:
         alert_id = state.alert_id
@@ -160,99 +287,8 @@ class PatternRecognitionAgent(BaseAgent):
         #     print(f"[{self.agent_name}]     NewPayee alert handled with custom logic. Historical count: {historical_payee_count}")
             
         else:
-            # Handle all other alerts with the LLM
-             # 2) Build the new, highly prescriptive prompt
-            prompt = f"""You are a fraud-detection assistant.
-Your task is to identify fraud patterns by strictly following the provided rules and user behavior analysis instructions.
-
-**RULES**:
-{json.dumps(RULE_DEFINITIONS, indent=2)}
-
-**ALERT_TYPE**: {context.get("alert_type", "Unknown")}
-
-**CONTEXT**:
-{json.dumps(context, indent=2)}
-
-**EVIDENCE**:
-{json.dumps(evidence, indent=2, default=str)}
-
-**ANALYSIS_RULES**:
-1.  **HighValue, GeoMismatch**:
-    -   Search the EVIDENCE for a pattern of similar historical transactions.
-    -   If the pattern is **anomalous** (count <= 1), treat it as a **True Positive** and set confidence > 0.7.
-    -   If the pattern is **normal behavior** (count >= 5), treat it as a **False Positive** and set confidence <= 0.5.
-    -   If the pattern is in between (count > 1 and < 5), set confidence between 0.5 and 0.7.
-
-2.  **Velocity**:
-    -   A "velocity event" is defined as a cluster of 5 or more transactions within a 5-minute window.
-    -   Analyze the EVIDENCE to count the number of historical velocity events, not individual transactions.
-    -   Use the same confidence thresholds as rule 1 based on the count of these velocity events.
-
-3.  **NewPayee**:
-    -   A "new payee event" is defined as a transaction of over **$50,000** to a payee who was added within **7 days** of the transaction timestamp.
-    -   You must carefully analyze the EVIDENCE to count the total number of these distinct historical "new payee events" for this user.
-    -   Once you have the count, strictly apply these confidence rules:
-        -   If the count of historical new payee events is **less than 2** (i.e., 0 or 1), this is an **anomalous** behavior. Set confidence **> 0.7**.
-        -   If the count is **less than 5 but more than 1** (i.e., 2, 3, or 4), this is somewhat frequent behavior. Set confidence **between 0.5 and 0.7**.
-        -   If the count is **5 or more**, this is a **normal behavior**. Set confidence **<= 0.5**.
-    
-4.  **FailedLoginTransfer**:
-    -   Fetch the transaction amount from CONTEXT and the current balance from the EVIDENCE (account details).
-    -   Calculate the percentage of the transaction amount relative to the sum of the transaction amount and current balance: `(amount / (amount + current_balance)) * 100`.
-    -   If the percentage is >= 70%, treat as a **True Positive** (confidence > 0.7).
-    -   If the percentage is <= 50%, treat as a **False Positive** (confidence <= 0.5).
-    -   If the percentage is between 50-70%, set confidence between 0.5 and 0.7 for human review.
-    -   Make sure to follow the percentage rules. % <= 50 false positive and make confidence value <= 0.5 and % >= 70 true positive and make confidence value >= 0.7 and % > 50 and < 70 human review and make confidence value between 0.5 and 0.7.
-    -   For example if "percentage" >= 70 then confidence value should be > 0.7, if "percentage" <= 50 then confidence value should be <= 0.5, if "percentage" between 50 and 70 then confidence value should be between 0.5 and 0.7.
-    -   For example If % = 68 then consider confidence also as 0.68 and if % = 72 then consider confidence as 0.72.   
-    
-5.  **HighRiskLocation**:
-    -   If the transaction location is one of the high-risk locations in the RULES, it is automatically a **True Positive**.
-    -   Do not perform historical checks. Set confidence > 0.7.
-
-Return a valid JSON object with the following keys:
-• **patterns**: (list of rule-names triggered)
-• **risk_indicators**: (list of high-level risk factors)
-• **confidence**: (float 0.0–1.0, adjusted based on the above rules)
-• **evidence**: (optional supporting details, including historical counts or percentages)
-
-make sure to give just one complete json response and return a valid JSON object, like this:
-
-{{
-    "patterns": ["HighValue"],
-    "risk_indicators": ["Transaction amount above threshold for a non-frequent user."],
-    "confidence": 0.85,
-    "evidence": {{
-        "historical_high_value_transactions_count": 0
-    }}
-}}
-"""
-            # Call the LLM
-            raw_llm = await self.llm_helper.generate_response(prompt)
-            print(f"[{self.agent_name}] 📥 RAW LLM RESPONSE:\n{raw_llm}\n")
-            
-            # Strip ``` fences & parse JSON
-            if isinstance(raw_llm, str):
-                text = raw_llm.strip()
-                if text.startswith("```"):
-                    lines = text.splitlines()
-                    if lines[0].startswith("```"): lines = lines[1:]
-                    if lines and lines[-1].startswith("```"): lines = lines[:-1]
-                    text = "\n".join(lines).strip()
-                try:
-                    start_index = text.find('{')
-                    end_index = text.rfind('}')
-                    if start_index != -1 and end_index != -1:
-                        json_text = text[start_index : end_index + 1]
-                        llm_analysis = json.loads(json_text)
-                    else:
-                        print(f"[{self.agent_name}] ❗️ No JSON object found in LLM response, defaulting empty")
-                        llm_analysis = {"patterns": [], "risk_indicators": [], "confidence": 0.0, "evidence": {}}
-                except json.JSONDecodeError:
-                    print(f"[{self.agent_name}] ❗️ Failed to parse LLM JSON from extracted text, defaulting empty")
-                    llm_analysis = {"patterns": [], "risk_indicators": [], "confidence": 0.0, "evidence": {}}
-            else:
-                llm_analysis = raw_llm
+            # Handle all other alerts with the LLM (batched with concurrent alerts of the same type when enabled)
+            llm_analysis = await self._analyze_with_llm(alert_id, alert_type, context, evidence)
 
             conf_val = float(llm_analysis.get("confidence", 0.0))
             base_rule = f"{alert_type}: {RULE_DEFINITIONS.get(alert_type)}"
@@ -285,10 +321,12 @@ make sure to give just one complete json response and return a valid JSON object
             # }
         
         # --- Common logic for both paths ---
+        confidence_threshold = self.thresholds.get('pattern_confidence_threshold', alert_type)
+        enhanced["confidence_threshold"] = confidence_threshold
         print(f"[{self.agent_name}]     overall_confidence: {enhanced['overall_confidence']:.2f}")
 
         # Persist this step’s judgment
-        self.log_judgement(
+        await self.log_judgement(
             alert_id=alert_id,
             action="pattern_analysis_complete",
             confidence=enhanced["overall_confidence"],
@@ -311,8 +349,11 @@ make sure to give just one complete json response and return a valid JSON object
         }
 
         # Loop back if confidence too low
-        if enhanced["overall_confidence"] < self.confidence_threshold and loop_count < max_loops:
-            print(f"[{self.agent_name}] 🔄 looping ingestion (confidence {enhanced['overall_confidence']:.2f} < {self.confidence_threshold})")
+        if enhanced["overall_confidence"] < confidence_threshold and loop_count < max_loops:
+            if enhanced.get("llm_analysis", {}).get("parse_error"):
+                # The low confidence is the fallback for unusable LLM output, not a finding.
+                self.parse_stats["parse_induced_loops"] += 1
+            print(f"[{self.agent_name}] 🔄 looping ingestion (confidence {enhanced['overall_confidence']:.2f} < {confidence_threshold})")
             result["context_data"] = {
                 "need_deeper_analysis": True,
                 "ambiguous_patterns": enhanced.get("llm_analysis", {}) # Pass LLM analysis if it exists
@@ -325,6 +366,84 @@ make sure to give just one complete json response and return a valid JSON object
         result["success"] = True
         return result
     
+    async def _analyze_with_llm(self, alert_id: str, alert_type: str,
+                                context: Dict[str, Any], evidence: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the LLM verdict for one alert, through the batcher when batching is enabled."""
+        if self.batcher and self.active_investigations > 1:
+            analysis = await self.batcher.submit(alert_type or "Unknown", alert_id, (context, evidence))
+            if analysis is not None:
+                return analysis
+            # _analyze_batch has counted the fallback.
+        return await self._analyze_single(context, evidence)
+
+    async def _analyze_single(self, context: Dict[str, Any], evidence: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = prompt_registry.render(
+            "pattern_analysis",
+            alert_type=context.get("alert_type", "Unknown"),
+            context=json.dumps(context, indent=2),
+            evidence=json.dumps(prompt_view(evidence), indent=2, default=str),
+        )
+        self.batch_stats["single_requests"] += 1
+        analysis = await self.llm_helper.generate_structured(prompt, PatternAnalysis, usage_key="pattern_analysis")
+        if analysis is None:
+            print(f"[{self.agent_name}] ❗️ No schema-valid LLM analysis after repair, defaulting empty")
+            self.parse_stats["parse_failures"] += 1
+            return dict(EMPTY_ANALYSIS)
+        llm_analysis = analysis.to_analysis()
+        print(f"[{self.agent_name}] 📥 LLM ANALYSIS:\n{json.dumps(llm_analysis, default=str)}\n")
+        return llm_analysis
+
+    async def _analyze_batch(self, alert_type: str, items: List[Tuple[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze several alerts of the same type in one request. Returns verdicts keyed by
+        alert_id; alerts without a verdict (or every alert, if the response fails schema
+        validation) are left out, and counted as fallbacks, so the caller falls back to a
+        single-alert call. A batch of one is sent as a single-alert call.
+        """
+        if len(items) == 1:
+            alert_id, (context, evidence) = items[0]
+            return {alert_id: await self._analyze_single(context, evidence)}
+        alerts = [
+            {"alert_id": alert_id, "context": context, "evidence": self._compact_evidence(evidence)}
+            for alert_id, (context, evidence) in items
+        ]
+        prompt = prompt_registry.render(
+            "pattern_analysis_batch",
+            alert_type=alert_type,
+            alerts=json.dumps(alerts, separators=(",", ":"), default=str),
+        )
+        self.batch_stats["batched_requests"] += 1
+        self.batch_stats["batched_alerts"] += len(items)
+        try:
+            batch = await self.llm_helper.generate_structured(
+                prompt, BatchPatternAnalysis, max_tokens=min(4000, 600 * len(items)), usage_key="pattern_analysis_batch"
+            )
+        except Exception:
+            self.batch_stats["fallbacks"] += len(items)
+            raise
+        if batch is None:
+            self.batch_stats["fallbacks"] += len(items)
+            return {}
+
+        expected = {alert_id for alert_id, _ in items}
+        results: Dict[str, Dict[str, Any]] = {}
+        for verdict in batch.verdicts:
+            if verdict.alert_id in expected:
+                analysis = verdict.to_analysis()
+                results[analysis.pop("alert_id")] = analysis
+        self.batch_stats["fallbacks"] += len(items) - len(results)
+        print(f"[{self.agent_name}] Batch resolved {len(results)}/{len(items)} {alert_type} alerts.")
+        return results
+
+    def _compact_evidence(self, evidence: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop empty query results and bookkeeping counts to keep batched prompts small."""
+        if isinstance(evidence, EvidenceSet):
+            return evidence.to_prompt()
+        return {
+            key: value for key, value in evidence.items()
+            if not key.endswith("_count") and value not in ([], {}, None, "")
+        }
+
     # def _count_new_payee_events(self, context: Dict[str, Any], evidence: Dict[str, Any]) -> int:
     #     txns_list = self._find_evidence_list(evidence, "transaction_id", 'transactions')
     #     payee_list = context.get('payee_relationships', [])
@@ -351,22 +470,30 @@ make sure to give just one complete json response and return a valid JSON object
         """
         Counts the number of distinct velocity events in a user's transaction history.
         A velocity event is a cluster of 5 or more transactions within a 5-minute window.
+        Uses the count computed in SQL when ingestion ran in aggregate mode.
         """
+        aggregated = self._find_evidence_list(evidence, "velocity_events")
+        if aggregated:
+            return int(aggregated[0]["velocity_events"] or 0)
         txns_list = self._find_evidence_list(evidence, "transaction_id")
         if not txns_list:
             return 0
         
-        sorted_txns = sorted(txns_list, key=lambda x: datetime.fromisoformat(x["timestamp"]))
+        # Rows carry the integer timestamp_epoch; only rows without it are parsed.
+        times = sorted(
+            tx["timestamp_epoch"] if tx.get("timestamp_epoch") is not None
+            else to_epoch(tx["timestamp"])
+            for tx in txns_list
+        )
         
         velocity_events_count = 0
         i = 0
-        while i < len(sorted_txns):
-            current_tx = sorted_txns[i]
-            window_end_time = datetime.fromisoformat(current_tx["timestamp"]) + timedelta(minutes=VELOCITY_WINDOW_MINUTES)
+        while i < len(times):
+            window_end_time = times[i] + VELOCITY_WINDOW_MINUTES * 60
             
             transactions_in_window = 0
             j = i
-            while j < len(sorted_txns) and datetime.fromisoformat(sorted_txns[j]["timestamp"]) <= window_end_time:
+            while j < len(times) and times[j] <= window_end_time:
                 transactions_in_window += 1
                 j += 1
             
@@ -390,6 +517,8 @@ make sure to give just one complete json response and return a valid JSON object
 
     
     def _find_evidence_list(self, evidence: Dict[str, Any], key_field: str, preferred_key_name: str = '') -> List[Dict[str, Any]]:
+        if isinstance(evidence, EvidenceSet) and not preferred_key_name:
+            return evidence.find_rows(key_field)
         if preferred_key_name:
             for key, value in evidence.items():
                 if preferred_key_name in key and isinstance(value, list) and value and key_field in value[0]:
@@ -0,0 +1,95 @@
+# src/agents/precedent_agent.py
+
+from typing import Dict, Any
+from src.agents.base_agent import BaseAgent
+from src.data.models import OutcomeType
+from src.workflow.state import AlertInvestigationState
+import json
+import uuid
+from datetime import datetime
+
+class PrecedentAgent(BaseAgent):
+    """Short-circuits the pipeline when an alert closely matches a human-verified case."""
+
+    def __init__(self, db_manager, llm_helper, config, case_index):
+        super().__init__(db_manager, llm_helper, config)
+        self.case_index = case_index
+        self.enabled = bool(config.get('similar_case_enabled', True))
+
+    async def execute(self, state: AlertInvestigationState) -> Dict[str, Any]:
+        alert_id = state.alert_id
+        if not self.enabled or state.loop_count > 0:
+            return {"current_agent": "ingestion"}
+
+        # An analyst label is never replaced by a copy of another case's label.
+        if await self._is_human_verified(alert_id):
+            print(f"[{self.agent_name}] Alert {alert_id} is already human-verified; running full pipeline.")
+            return {"current_agent": "ingestion"}
+
+        precedent = await self.db.aio.run(self.case_index.find_precedent, alert_id)
+        if not precedent:
+            print(f"[{self.agent_name}] No verified precedent for alert {alert_id}; running full pipeline.")
+            return {"current_agent": "ingestion"}
+
+        is_suspicious = precedent["is_suspicious"]
+        action = 'ESCALATE' if is_suspicious else 'AUTO_CLOSE'
+        outcome_type = OutcomeType.TRUE_POSITIVE if is_suspicious else OutcomeType.FALSE_POSITIVE
+        confidence = precedent["confidence_score"]
+        summary = (
+            f"PRECEDENT: Matches human-verified alert {precedent['precedent_alert_id']} "
+            f"(distance {precedent['distance']:.3f}), verified as "
+            f"{'suspicious' if is_suspicious else 'not suspicious'}. {precedent['investigation_summary'] or ''}"
+        ).strip()
+        risk_factors = list(precedent["pattern_evidence"].get("risk_factors") or [])
+
+        output = {
+            "matched": True,
+            "precedent": precedent,
+            "overall_confidence": confidence,
+            "risk_factors": risk_factors,
+            "result_context": "True Positive" if is_suspicious else "False Positive",
+        }
+        updated_agent_outputs = state.agent_outputs.copy()
+        updated_agent_outputs[self.agent_name] = output
+
+        await self.log_judgement(
+            alert_id=alert_id,
+            action="precedent_match",
+            confidence=confidence,
+            rationale=output,
+            loop_iteration=state.loop_count
+        )
+        await self.db.aio.upsert_investigation_outcome({
+            "outcome_id": str(uuid.uuid4()),
+            "alert_id": alert_id,
+            "final_outcome": action,
+            "is_suspicious": is_suspicious,
+            "confidence_score": confidence,
+            "investigation_summary": summary,
+            "human_verified": False,
+            "timestamp": datetime.now().isoformat(),
+            "agent_outputs": json.dumps(updated_agent_outputs, ensure_ascii=False, default=str),
+        })
+        try:
+            await self.db.aio.set_review_status(alert_id, 1)
+        except Exception as e:
+            print(f"[{self.agent_name}] Warning: failed to set review_status=1 for {alert_id}: {e}")
+
+        print(f"[{self.agent_name}] Alert {alert_id} matched precedent {precedent['precedent_alert_id']} → {action}.")
+        return {
+            "agent_outputs": updated_agent_outputs,
+            "final_decision": action,
+            "outcome_type": outcome_type,
+            "is_suspicious": is_suspicious,
+            "investigation_summary": summary,
+            "confidence_score": confidence,
+            "risk_factors": risk_factors,
+            "current_agent": self.agent_name,
+        }
+
+    async def _is_human_verified(self, alert_id: str) -> bool:
+        rows = await self.db.aio.execute_query(
+            "SELECT 1 AS one FROM investigation_outcomes WHERE alert_id = ? AND human_verified = 1 LIMIT 1",
+            (alert_id,),
+        )
+        return bool(rows)
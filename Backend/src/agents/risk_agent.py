@@ -3,16 +3,16 @@
 from typing import Dict, Any, Tuple, List
 from src.agents.base_agent import BaseAgent
 from src.data.models import OutcomeType
+from src.utils.thresholds import ThresholdStore
 from src.workflow.state import AlertInvestigationState
 import json
 import uuid
 from datetime import datetime
 
 class RiskAssessmentAgent(BaseAgent):
-    def __init__(self, db_manager, llm_helper, config):
+    def __init__(self, db_manager, llm_helper, config, thresholds: ThresholdStore = None):
         super().__init__(db_manager, llm_helper, config)
-        self.risk_threshold = config.get('risk_threshold', 0.7)
-        self.auto_close_threshold = config.get('auto_close_threshold', 0.3)
+        self.thresholds = thresholds or ThresholdStore(config)
     
     async def execute(self, state: AlertInvestigationState) -> Dict[str, Any]:
         alert_id = state.alert_id
@@ -30,7 +30,7 @@ class RiskAssessmentAgent(BaseAgent):
         )
         final_decision = self._make_final_decision(risk_assessment, state)
 
-        self.log_judgement(
+        await self.log_judgement(
             alert_id=alert_id,
             action=final_decision["action"],
             confidence=risk_assessment["final_confidence"],
@@ -67,9 +67,9 @@ class RiskAssessmentAgent(BaseAgent):
 
         if result["is_suspicious"] is None:
             result["is_suspicious"] = False
-        self._save_investigation_outcome(alert_id, final_decision, risk_assessment, updated_agent_outputs)
+        await self._save_investigation_outcome(alert_id, final_decision, risk_assessment, updated_agent_outputs)
         try:
-            self.db.set_review_status(alert_id, 1)
+            await self.db.aio.set_review_status(alert_id, 1)
         except Exception as e:
 
             print(f"[{self.agent_name}] Warning: failed to set review_status=1 for {alert_id}: {e}")
@@ -111,15 +111,18 @@ class RiskAssessmentAgent(BaseAgent):
         """Make a final action decision based on risk assessment.""" 
         confidence = risk_assessment['final_confidence']
         risk_level = risk_assessment['risk_level']
+        alert_type = state.context_data.get("alert_basic", {}).get("alert_type")
+        risk_threshold = self.thresholds.get('risk_threshold', alert_type)
+        auto_close_threshold = self.thresholds.get('auto_close_threshold', alert_type)
         
         action, outcome_type, is_suspicious, summary = None, None, None, None
 
-        if confidence >= self.risk_threshold:
+        if confidence >= risk_threshold:
             action = 'ESCALATE'
             outcome_type = OutcomeType.TRUE_POSITIVE
             is_suspicious = True
             summary = f"HIGH RISK: Confidence {confidence:.2f}. Multiple risk factors detected."
-        elif confidence <= self.auto_close_threshold:
+        elif confidence <= auto_close_threshold:
             action = 'AUTO_CLOSE'
             outcome_type = OutcomeType.FALSE_POSITIVE
             is_suspicious = False
@@ -155,7 +158,7 @@ class RiskAssessmentAgent(BaseAgent):
         unique_indicators = list(dict.fromkeys(indicators))
         return unique_indicators[:5]
 
-    def _save_investigation_outcome(
+    async def _save_investigation_outcome(
         self,
         alert_id: str,
         decision: Dict[str, Any],
@@ -174,58 +177,4 @@ class RiskAssessmentAgent(BaseAgent):
             "timestamp": datetime.now().isoformat(),
             "agent_outputs": json.dumps(agent_outputs, ensure_ascii=False),
         }
-
-        with self.db.get_connection() as conn:
-            existing = conn.execute(
-                "SELECT outcome_id, human_verified FROM investigation_outcomes WHERE alert_id = ? LIMIT 1",
-                (alert_id,),
-            ).fetchone()
-
-            if existing:
-                prior_hv = existing["human_verified"]
-                human_verified = prior_hv if prior_hv is not None else outcome["human_verified"]
-
-                conn.execute(
-                    """
-                    UPDATE investigation_outcomes
-                    SET final_outcome = ?,
-                        is_suspicious = ?,
-                        confidence_score = ?,
-                        investigation_summary = ?,
-                        human_verified = ?,
-                        timestamp = ?,
-                        agent_outputs = ?
-                    WHERE alert_id = ?
-                    """,
-                    (
-                        outcome["final_outcome"],
-                        int(bool(outcome["is_suspicious"])),
-                        float(outcome["confidence_score"]),
-                        outcome["investigation_summary"],
-                        int(False),
-                        outcome["timestamp"],
-                        outcome["agent_outputs"],
-                        alert_id
-                    ),
-                )
-            else:
-                conn.execute(
-                    """
-                    INSERT INTO investigation_outcomes
-                    (outcome_id, alert_id, final_outcome, is_suspicious, confidence_score,
-                    investigation_summary, human_verified, timestamp, agent_outputs)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        outcome["outcome_id"],
-                        outcome["alert_id"],
-                        outcome["final_outcome"],
-                        int(bool(outcome["is_suspicious"])),
-                        float(outcome["confidence_score"]),
-                        outcome["investigation_summary"],
-                        int(bool(outcome["human_verified"])),
-                        outcome["timestamp"],
-                        outcome["agent_outputs"],
-                    ),
-                )
-            conn.commit()
\ No newline at end of file
+        await self.db.aio.upsert_investigation_outcome(outcome)
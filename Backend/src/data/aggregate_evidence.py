@@ -0,0 +1,75 @@
+# src/data/aggregate_evidence.py
+
+from typing import Dict, Any, List
+
+from src.data.epoch_columns import to_epoch
+from src.data.query_templates import BoundQuery, bind
+
+# The windowed evidence templates seek on (user_id, timestamp), so their cost follows
+# the rows inside the lookback window, not the user's whole history. (Replaced by the
+# (user_id, timestamp_epoch) indexes of epoch_columns_v1.)
+MIGRATION = ("evidence_window_indexes_v1", [
+    "CREATE INDEX IF NOT EXISTS idx_transactions_user_ts ON transactions (user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_login_attempts_user_ts ON login_attempts (user_id, timestamp)",
+])
+
+# Same thresholds as the pattern rules.
+HIGH_VALUE_THRESHOLD = 100_000
+VELOCITY_THRESHOLD = 5
+VELOCITY_WINDOW_MINUTES = 5
+NEW_PAYEE_WINDOW_DAYS = 7
+NEW_PAYEE_TRANSACTION_THRESHOLD = 50_000
+STRUCTURING_WINDOW_DAYS = 7
+CROSS_CHANNEL_WINDOW_MINUTES = 60
+
+GENERIC_TEMPLATES = ["txn_summary_window", "txn_sample_window", "login_summary_window", "login_sample_window"]
+ALERT_TYPE_TEMPLATES = {
+    "HighValue": ["high_value_window"],
+    "GeoMismatch": ["geo_mismatch_window", "location_breakdown_window"],
+    "HighRiskLocation": ["location_breakdown_window"],
+    "Velocity": ["velocity_events_window"],
+    "FailedLoginTransfer": ["failed_login_transfer"],
+    "Structuring": ["structuring_window"],
+    "CrossChannel": ["channel_breakdown_window"],
+    "NewPayee": ["new_payee_events_window", "new_payee_sample_window"],
+}
+# Per-template values beyond the alert's own (user, account, window, sample size).
+TEMPLATE_PARAMETERS = {
+    "high_value_window": {"threshold": HIGH_VALUE_THRESHOLD},
+    "velocity_events_window": {"window_seconds": VELOCITY_WINDOW_MINUTES * 60, "min_txns": VELOCITY_THRESHOLD},
+    "new_payee_events_window": {"threshold": NEW_PAYEE_TRANSACTION_THRESHOLD,
+                                "window_seconds": NEW_PAYEE_WINDOW_DAYS * 86400},
+    "new_payee_sample_window": {"threshold": NEW_PAYEE_TRANSACTION_THRESHOLD,
+                                "window_seconds": NEW_PAYEE_WINDOW_DAYS * 86400},
+    "structuring_window": {"window_seconds": STRUCTURING_WINDOW_DAYS * 86400},
+    "channel_breakdown_window": {"window_seconds": CROSS_CHANNEL_WINDOW_MINUTES * 60},
+}
+
+
+def lookback_window(alert_timestamp: str, lookback_days: int) -> Dict[str, int]:
+    """{since, until} in unix seconds (the timestamp_epoch columns), ending at the alert."""
+    until = to_epoch(alert_timestamp)
+    return {"since": until - int(lookback_days) * 86400, "until": until}
+
+def aggregate_queries(alert_basic: Dict[str, Any], lookback_days: int, sample_rows: int) -> List[BoundQuery]:
+    """
+    The fixed evidence for one alert: counts, sums, distinct values and percentages its
+    alert type needs, computed in SQL over the lookback window, plus capped samples of
+    recent raw rows. NewPayee alerts get only their own event count and sample.
+    """
+    alert_type = alert_basic.get("alert_type", "")
+    values = {
+        "user_id": alert_basic.get("user_id"),
+        "account_id": alert_basic.get("account_id"),
+        "amount": alert_basic.get("amount"),
+        "location": alert_basic.get("location"),
+        "sample_rows": int(sample_rows),
+        **lookback_window(alert_basic["timestamp"], lookback_days),
+    }
+    names = [] if alert_type == "NewPayee" else list(GENERIC_TEMPLATES)
+    names += ALERT_TYPE_TEMPLATES.get(alert_type, [])
+    queries = [bind(name, **values, **TEMPLATE_PARAMETERS.get(name, {})) for name in names]
+    if alert_type != "NewPayee":
+        queries += [bind("user_payees", values["user_id"]), bind("account", values["account_id"]),
+                    bind("user_devices", values["user_id"])]
+    return queries
@@ -0,0 +1,255 @@
+# src/data/archive.py
+
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from src.data.epoch_columns import to_epoch
+
+# Which monthly partitions hold rows of an alert, so reads attach only those files.
+CREATE_ARCHIVED_ALERTS = """
+CREATE TABLE IF NOT EXISTS archived_alerts (
+    alert_id TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    archived_at TEXT NOT NULL,
+    PRIMARY KEY (alert_id, partition)
+) WITHOUT ROWID
+"""
+MIGRATION = ("archived_alerts_v1", [CREATE_ARCHIVED_ALERTS])
+
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS arch.agent_judgements (
+        judgement_id TEXT PRIMARY KEY,
+        alert_id TEXT NOT NULL,
+        agent_name TEXT NOT NULL,
+        action TEXT NOT NULL,
+        confidence REAL NOT NULL,
+        rationale_json TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        loop_iteration INTEGER DEFAULT 0,
+        queries_executed TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS arch.idx_judgements_alert ON agent_judgements (alert_id)",
+    """
+    CREATE TABLE IF NOT EXISTS arch.full_investigation_results (
+        alert_id TEXT PRIMARY KEY,
+        result_json TEXT,
+        timestamp TEXT
+    )
+    """,
+]
+JUDGEMENT_COLUMNS = ("judgement_id, alert_id, agent_name, action, confidence, rationale_json, "
+                     "timestamp, loop_iteration, queries_executed")
+
+class JudgementArchiver:
+    """
+    Moves old agent_judgements and full_investigation_results rows out of the hot
+    database into monthly archive files (archive_YYYY_MM.db), ATTACHed only while a
+    batch is copied or an archived alert is read.
+
+    A batch is copied and committed into the archive first, then deleted from the hot
+    file in a second transaction. WAL transactions are not atomic across attached
+    files, so this order means a crash can at worst leave a row in both places (the
+    copy is INSERT OR IGNORE and reads de-duplicate); it can never lose one. Freed
+    pages are returned with PRAGMA incremental_vacuum after each batch.
+    """
+
+    def __init__(self, db_manager, archive_dir: Optional[str] = None, retention_days: int = 90,
+                 batch_size: int = 500, vacuum_pages: int = 2000):
+        self.db = db_manager
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(db_manager.db_path) or ".", "archive")
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.stats = {"batches": 0, "judgements_archived": 0, "results_archived": 0, "pages_freed": 0}
+        self.db.apply_migration(*MIGRATION)
+        self._ensure_incremental_vacuum()
+
+    def partition_path(self, partition: str) -> str:
+        return os.path.join(self.archive_dir, f"archive_{partition}.db")
+
+    @staticmethod
+    def partition_for(timestamp: str) -> str:
+        return timestamp[:7].replace("-", "_")
+
+    def cutoff(self) -> int:
+        """Unix seconds of the retention boundary, compared with the indexed timestamp_epoch columns."""
+        return to_epoch(datetime.now() - timedelta(days=self.retention_days))
+
+    def run_once(self) -> Dict[str, int]:
+        """Archive one batch of rows older than the retention window. Returns rows moved."""
+        cutoff = self.cutoff()
+        judgements = self.db.execute_query(
+            "SELECT judgement_id, alert_id, timestamp FROM agent_judgements "
+            "WHERE timestamp_epoch < ? ORDER BY timestamp_epoch LIMIT ?",
+            (cutoff, self.batch_size),
+        )
+        results = self.db.execute_query(
+            "SELECT alert_id, timestamp FROM full_investigation_results "
+            "WHERE timestamp_epoch < ? ORDER BY timestamp_epoch LIMIT ?",
+            (cutoff, self.batch_size),
+        )
+        partitions: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for row in judgements:
+            partitions.setdefault(self.partition_for(row["timestamp"]), {"j": [], "r": []})["j"].append(row)
+        for row in results:
+            partitions.setdefault(self.partition_for(row["timestamp"]), {"j": [], "r": []})["r"].append(row)
+
+        moved = {"judgements": 0, "results": 0}
+        for partition, rows in sorted(partitions.items()):
+            self._move(partition, rows["j"], rows["r"])
+            moved["judgements"] += len(rows["j"])
+            moved["results"] += len(rows["r"])
+        if partitions:
+            self.stats["batches"] += 1
+            self.stats["judgements_archived"] += moved["judgements"]
+            self.stats["results_archived"] += moved["results"]
+            self._reclaim()
+        return moved
+
+    def run_until_done(self) -> Dict[str, int]:
+        total = {"judgements": 0, "results": 0}
+        while True:
+            moved = self.run_once()
+            if not any(moved.values()):
+                return total
+            for key in total:
+                total[key] += moved[key]
+
+    def get_judgements(self, alert_id: str) -> List[Dict[str, Any]]:
+        """Archived judgements of an alert, oldest first (empty if it has none)."""
+        rows: List[Dict[str, Any]] = []
+        for partition in self._partitions_of(alert_id):
+            with self._attached_read(partition) as conn:
+                rows += [dict(r) for r in conn.execute(
+                    f"SELECT {JUDGEMENT_COLUMNS} FROM arch.agent_judgements WHERE alert_id = ?", (alert_id,)
+                )]
+        return rows
+
+    def get_full_result_row(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        for partition in reversed(self._partitions_of(alert_id)):
+            with self._attached_read(partition) as conn:
+                row = conn.execute(
+                    "SELECT result_json, timestamp FROM arch.full_investigation_results WHERE alert_id = ?",
+                    (alert_id,),
+                ).fetchone()
+            if row:
+                return dict(row)
+        return None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        files = sorted(f for f in os.listdir(self.archive_dir) if f.endswith(".db")) if os.path.isdir(self.archive_dir) else []
+        return {
+            **self.stats,
+            "retention_days": self.retention_days,
+            "partitions": {f: os.path.getsize(os.path.join(self.archive_dir, f)) for f in files},
+            "hot_db_bytes": os.path.getsize(self.db.db_path),
+        }
+
+    def _partitions_of(self, alert_id: str) -> List[str]:
+        return [r["partition"] for r in self.db.execute_query(
+            "SELECT partition FROM archived_alerts WHERE alert_id = ? ORDER BY partition", (alert_id,)
+        )]
+
+    def _move(self, partition: str, judgements: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        judgement_ids = [(r["judgement_id"],) for r in judgements]
+        result_ids = [(r["alert_id"],) for r in results]
+        alert_ids = {r["alert_id"] for r in judgements} | {r["alert_id"] for r in results}
+        now = datetime.now().isoformat()
+        with self.db.get_connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS arch", (self.partition_path(partition),))
+            try:
+                # 1) copy into the archive (and record where it went) and commit
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement in ARCHIVE_SCHEMA:
+                        conn.execute(statement)
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO arch.agent_judgements ({JUDGEMENT_COLUMNS}) "
+                        f"SELECT {JUDGEMENT_COLUMNS} FROM main.agent_judgements WHERE judgement_id = ?",
+                        judgement_ids,
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO arch.full_investigation_results (alert_id, result_json, timestamp) "
+                        "SELECT alert_id, result_json, timestamp FROM main.full_investigation_results WHERE alert_id = ?",
+                        result_ids,
+                    )
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO main.archived_alerts (alert_id, partition, archived_at) VALUES (?, ?, ?)",
+                        [(alert_id, partition, now) for alert_id in alert_ids],
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                # 2) only then remove the hot copies
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany("DELETE FROM main.agent_judgements WHERE judgement_id = ?", judgement_ids)
+                    conn.executemany("DELETE FROM main.full_investigation_results WHERE alert_id = ?", result_ids)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE arch")
+        print(f"[JudgementArchiver] Archived {len(judgements)} judgements and {len(results)} results to {partition}.")
+
+    @contextmanager
+    def _attached_read(self, partition: str):
+        path = self.partition_path(partition)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Archive partition missing: {path}")
+        with self.db.get_read_connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS arch", (path,))
+            try:
+                yield conn
+            finally:
+                conn.execute("DETACH DATABASE arch")
+
+    def _ensure_incremental_vacuum(self) -> None:
+        """auto_vacuum=INCREMENTAL only takes effect after one full VACUUM; do that once."""
+        with self.db.get_connection() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print("[JudgementArchiver] Enabled incremental vacuum on the hot database.")
+
+    def _reclaim(self) -> None:
+        with self.db.get_connection() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript steps the pragma to completion; a plain execute() frees one page.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)});")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # Truncation only reaches the main file at checkpoint time in WAL mode.
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self.stats["pages_freed"] += max(0, before - after)
+
+
+def merge_judgements(hot: List[Dict[str, Any]], archived: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Hot and archived judgements of one alert, de-duplicated by judgement_id, oldest first."""
+    merged = {r["judgement_id"]: r for r in archived}
+    merged.update({r["judgement_id"]: r for r in hot})
+    return sorted(merged.values(), key=lambda r: r["timestamp"])
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from src.data.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Move old judgements and full results into monthly archive files.")
+    parser.add_argument("--db", default="data/alerts.db")
+    parser.add_argument("--retention-days", type=int, default=90)
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    archiver = JudgementArchiver(db, retention_days=args.retention_days)
+    print(json.dumps({"moved": archiver.run_until_done(), **archiver.get_statistics()}, indent=2))
+    db.close()
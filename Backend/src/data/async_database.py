@@ -0,0 +1,57 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, TypeVar
+
+T = TypeVar("T")
+
+class AsyncDatabase:
+    """
+    Awaitable facade over DatabaseManager.
+
+    Every call runs on a dedicated thread pool (separate from the event loop and from
+    FastAPI's threadpool) using the manager's pooled connections, so a slow query on a
+    large user history only occupies a DB worker while other investigations keep
+    awaiting their LLM calls.
+    """
+
+    def __init__(self, db_manager, max_workers: int = 5):
+        self._db = db_manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run any blocking callable on the DB executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def execute_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return await self.run(self._db.execute_query, query, params)
+
+    async def alert_exists(self, alert_id: str) -> bool:
+        return await self.run(self._db.alert_exists, alert_id)
+
+    async def get_pending_alerts(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return await self.run(self._db.get_pending_alerts, limit)
+
+    async def get_review_status_counts(self) -> List[Dict[str, Any]]:
+        return await self.run(self._db.get_review_status_counts)
+
+    # Writes go to the write-behind writer directly; awaiting its future does not tie up a DB worker.
+    async def insert_judgement(self, judgement: Dict[str, Any]) -> None:
+        self._db.writer.submit_judgement(judgement)
+
+    async def upsert_investigation_outcome(self, outcome: Dict[str, Any]) -> None:
+        await asyncio.wrap_future(self._db.writer.submit_outcome(outcome))
+
+    async def set_review_status(self, alert_id: str, status: int) -> None:
+        await asyncio.wrap_future(self._db.writer.submit_review_status(alert_id, status))
+
+    async def set_review_and_update_outcome(self, alert_id: str, is_suspicious: bool, investigation_summary: str) -> None:
+        await self.run(self._db.set_review_and_update_outcome, alert_id, is_suspicious, investigation_summary)
+
+    async def save_full_investigation_result(self, alert_id: str, result: Dict[str, Any]) -> None:
+        await self.run(self._db.save_full_investigation_result, alert_id, result)
+
+    def shutdown(self) -> None:
+        """Wait for in-flight calls, then stop the workers."""
+        self._executor.shutdown(wait=True)
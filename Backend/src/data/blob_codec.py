@@ -0,0 +1,41 @@
+import json
+import zlib
+from typing import Any, Optional, Union
+
+# Stored blobs start with a format marker so the encoding can evolve; values without
+# a marker are legacy plain-text JSON and are returned unchanged.
+ZLIB_JSON_V1 = b"ZJ1\x00"
+COMPRESSION_LEVEL = 6
+
+def encode_blob(value: Union[str, bytes, None]) -> Optional[bytes]:
+    """Compress a JSON text for storage. None and already-encoded values pass through."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value.startswith(ZLIB_JSON_V1):
+            return value
+        value = value.decode("utf-8")
+    return ZLIB_JSON_V1 + zlib.compress(value.encode("utf-8"), COMPRESSION_LEVEL)
+
+def decode_blob(value: Union[str, bytes, None]) -> Optional[str]:
+    """JSON text of a stored value, whether compressed or legacy TEXT."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value.startswith(ZLIB_JSON_V1):
+        return zlib.decompress(value[len(ZLIB_JSON_V1):]).decode("utf-8")
+    return value.decode("utf-8")
+
+def decode_json(value: Union[str, bytes, None], default: Any = None) -> Any:
+    """Parsed JSON of a stored value; `default` for NULL/empty, the raw text if it is not valid JSON."""
+    text = decode_blob(value)
+    if text is None or not text.strip():
+        return default
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, (bytes, memoryview)) and bytes(value).startswith(ZLIB_JSON_V1)
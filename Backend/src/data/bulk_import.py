@@ -0,0 +1,269 @@
+# src/data/bulk_import.py
+
+import codecs
+import csv
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+
+# Source tables store event times as 'YYYY-MM-DD HH:MM:SS'; the agents' SQL compares
+# them as text, so every imported timestamp is normalized to exactly that form.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# "replace" is an upsert of the imported columns (see _insert_sql), not INSERT OR REPLACE:
+# that deletes the old row, resetting columns the feed does not carry (alerts.review_status)
+# and skipping the DELETE triggers, since recursive_triggers is off.
+CONFLICT_CLAUSES = {"ignore": "INSERT OR IGNORE", "replace": "INSERT", "abort": "INSERT"}
+MAX_REPORTED_ERRORS = 50
+
+# Index DDL dropped by defer_indexes, recorded in the same transaction as the drop and
+# deleted once the index is rebuilt. Rows left behind by an import that died mid-load are
+# rebuilt at startup (restore_deferred_indexes): the indexes' own migrations are already
+# recorded and would never run again.
+MIGRATION = ("deferred_indexes_v1", [
+    "CREATE TABLE IF NOT EXISTS deferred_indexes ("
+    "name TEXT PRIMARY KEY, tbl_name TEXT NOT NULL, sql TEXT NOT NULL, dropped_at TEXT NOT NULL)",
+])
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Decode a stream of byte chunks into lines without buffering more than one chunk."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be an incomplete line; keep it for the next chunk.
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def restore_deferred_indexes(db_manager) -> List[str]:
+    """Rebuild indexes a deferred-index import dropped and never restored."""
+    with db_manager.get_connection() as conn:
+        pending = [(r[0], r[1]) for r in conn.execute("SELECT name, sql FROM deferred_indexes ORDER BY dropped_at")]
+    if pending:
+        _create_indexes(db_manager, pending)
+        print(f"[BulkImporter] Restored indexes left dropped by an interrupted import: {', '.join(n for n, _ in pending)}.")
+    return [name for name, _ in pending]
+
+def _create_indexes(db_manager, indexes: List[Tuple[str, str]]) -> None:
+    with db_manager.get_connection() as conn:
+        for name, sql in indexes:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone():
+                conn.execute(sql)
+            conn.execute("DELETE FROM deferred_indexes WHERE name = ?", (name,))
+        conn.execute("ANALYZE")
+        conn.commit()
+
+class RowError(ValueError):
+    pass
+
+class BulkImporter:
+    """
+    Streaming NDJSON/CSV loader for the source tables (alerts, transactions, logins, ...).
+
+    Rows are parsed one at a time from a line iterator, validated and coerced against
+    DatabaseManager.schema_info, and written with executemany in batches of batch_size,
+    one transaction per commit_every rows, so a daily feed costs a handful of large
+    transactions. Invalid rows are skipped and reported. With defer_indexes the table's
+    secondary indexes are dropped for the load and rebuilt once at the end; concurrent
+    queries would run without them meanwhile, so only the offline CLI offers it.
+    """
+
+    def __init__(self, db_manager, batch_size: int = 5000, commit_every: int = 50000):
+        self.db = db_manager
+        self.batch_size = max(1, int(batch_size))
+        self.commit_every = max(self.batch_size, int(commit_every))
+
+    def import_lines(self, table: str, lines: Iterable[str], fmt: str = "ndjson",
+                     on_conflict: str = "ignore", defer_indexes: bool = False,
+                     collect_new_alerts: bool = False) -> Dict[str, Any]:
+        schema = self.db.schema_info.get(table)
+        if schema is None:
+            raise ValueError(f"Unknown table: {table}")
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        if on_conflict not in CONFLICT_CLAUSES:
+            raise ValueError(f"on_conflict must be one of {', '.join(CONFLICT_CLAUSES)}")
+
+        # Generated columns (the epoch twins of the timestamps) are computed by SQLite.
+        columns = [c for c, t in schema.items() if "GENERATED" not in t.upper()]
+        primary_key = next((c for c, t in schema.items() if "PRIMARY KEY" in t.upper()), None)
+        insert_sql = self._insert_sql(table, columns, primary_key, on_conflict)
+        report: Dict[str, Any] = {
+            "table": table, "format": fmt, "rows_read": 0, "rows_inserted": 0,
+            "rows_unchanged": 0, "rows_invalid": 0, "errors": [], "indexes_deferred": [],
+        }
+        new_alert_ids: List[str] = []
+        started = time.perf_counter()
+
+        dropped = self._drop_indexes(table) if defer_indexes else []
+        report["indexes_deferred"] = [name for name, _ in dropped]
+        collect = new_alert_ids if collect_new_alerts and table == "alerts" else None
+        try:
+            pending: List[Tuple[Any, ...]] = []
+            for line_no, record in self._records(lines, fmt):
+                report["rows_read"] += 1
+                try:
+                    pending.append(self._coerce(record, schema, columns, primary_key))
+                except RowError as e:
+                    report["rows_invalid"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append({"line": line_no, "error": str(e)})
+                    continue
+                if len(pending) >= self.commit_every:
+                    self._write(insert_sql, pending, report, collect)
+                    pending = []
+            if pending:
+                self._write(insert_sql, pending, report, collect)
+        finally:
+            if dropped:
+                self._restore_indexes(dropped)
+
+        seconds = time.perf_counter() - started
+        report["seconds"] = round(seconds, 3)
+        report["rows_per_second"] = round(report["rows_read"] / seconds, 1) if seconds > 0 else 0.0
+        if collect_new_alerts:
+            report["new_alert_ids"] = new_alert_ids
+        print(f"[BulkImporter] {table}: {report['rows_inserted']} inserted, {report['rows_invalid']} invalid, "
+              f"{report['rows_per_second']} rows/s.")
+        return report
+
+    def _records(self, lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        if fmt == "csv":
+            reader = csv.DictReader(lines)
+            for record in reader:
+                # Empty CSV cells mean NULL.
+                yield reader.line_num, {k: (v if v != "" else None) for k, v in record.items() if k is not None}
+            return
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = RowError(f"invalid JSON: {e}")
+            if not isinstance(record, (dict, RowError)):
+                record = RowError("each line must be a JSON object")
+            yield line_no, record
+
+    @staticmethod
+    def _coerce(record: Any, schema: Dict[str, str], columns: List[str], primary_key: Optional[str]) -> Tuple[Any, ...]:
+        if isinstance(record, RowError):
+            raise record
+        unknown = [k for k in record if k not in schema]
+        if unknown:
+            raise RowError(f"unknown columns: {', '.join(unknown)}")
+        values = []
+        for column in columns:
+            value = record.get(column)
+            declared = schema[column].upper()
+            if value is None:
+                if column == primary_key:
+                    raise RowError(f"missing primary key {column}")
+                values.append(None)
+                continue
+            try:
+                if declared.startswith("REAL"):
+                    value = float(value)
+                elif declared.startswith("INTEGER"):
+                    value = int(value)
+                elif declared.startswith("BOOLEAN"):
+                    if isinstance(value, str):
+                        if value.strip().lower() not in ("1", "0", "true", "false", "yes", "no"):
+                            raise ValueError(value)
+                        value = value.strip().lower() in ("1", "true", "yes")
+                    value = int(bool(value))
+                elif column == "timestamp":
+                    moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+                    # Stored text is naive UTC (see epoch_columns); convert, don't drop, an offset.
+                    if moment.tzinfo is not None:
+                        moment = moment.astimezone(timezone.utc)
+                    value = moment.strftime(TIMESTAMP_FORMAT)
+                else:
+                    value = str(value)
+            except (TypeError, ValueError):
+                raise RowError(f"{column}: expected {schema[column].split()[0]}, got {value!r}")
+            values.append(value)
+        return tuple(values)
+
+    @staticmethod
+    def _insert_sql(table: str, columns: List[str], primary_key: Optional[str], on_conflict: str) -> str:
+        sql = (f"{CONFLICT_CLAUSES[on_conflict]} INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        # Tables without a primary key (link tables) have nothing to conflict on.
+        if on_conflict == "replace" and primary_key:
+            updates = [c for c in columns if c != primary_key]
+            sql += (f" ON CONFLICT ({primary_key}) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in updates)}"
+                    if updates else f" ON CONFLICT ({primary_key}) DO NOTHING")
+        return sql
+
+    def _write(self, insert_sql: str, rows: List[Tuple[Any, ...]], report: Dict[str, Any],
+               new_alert_ids: Optional[List[str]]) -> None:
+        """
+        One transaction for up to commit_every rows, executemany'd in batch_size chunks.
+        Rows are buffered before the write connection is taken, so a slow upload never
+        holds the (single) writer while waiting on the network.
+        """
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for i in range(0, len(rows), self.batch_size):
+                    batch = rows[i:i + self.batch_size]
+                    if new_alert_ids is not None:
+                        ids = [row[0] for row in batch]
+                        existing = {r[0] for r in conn.execute(
+                            f"SELECT alert_id FROM alerts WHERE alert_id IN ({', '.join('?' for _ in ids)})", ids
+                        )}
+                        new_alert_ids.extend(i for i in dict.fromkeys(ids) if i not in existing)
+                    # rowcount counts the statement's own rows, not trigger-side writes.
+                    inserted = conn.executemany(insert_sql, batch).rowcount
+                    report["rows_inserted"] += inserted
+                    report["rows_unchanged"] += len(batch) - inserted
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _drop_indexes(self, table: str) -> List[Tuple[str, str]]:
+        with self.db.get_connection() as conn:
+            indexes = [(r[0], r[1]) for r in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table,),
+            )]
+            dropped_at = datetime.now().isoformat()
+            for name, sql in indexes:
+                conn.execute("INSERT OR REPLACE INTO deferred_indexes (name, tbl_name, sql, dropped_at) VALUES (?, ?, ?, ?)",
+                             (name, table, sql, dropped_at))
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+            conn.commit()
+        return indexes
+
+    def _restore_indexes(self, indexes: List[Tuple[str, str]]) -> None:
+        _create_indexes(self.db, indexes)
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.data.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Stream an NDJSON or CSV file into one of the source tables.")
+    parser.add_argument("table")
+    parser.add_argument("path")
+    parser.add_argument("--db", default="data/alerts.db")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="default: from the file extension")
+    parser.add_argument("--on-conflict", choices=list(CONFLICT_CLAUSES), default="ignore")
+    parser.add_argument("--defer-indexes", action="store_true", help="drop secondary indexes during the load")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    db = DatabaseManager(args.db)
+    with open(args.path, encoding="utf-8-sig", newline="") as f:
+        result = BulkImporter(db, batch_size=args.batch_size).import_lines(
+            args.table, f, fmt=fmt, on_conflict=args.on_conflict, defer_indexes=args.defer_indexes
+        )
+    print(json.dumps(result, indent=2))
+    db.close()
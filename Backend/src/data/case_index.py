@@ -0,0 +1,223 @@
+# src/data/case_index.py
+
+import json
+import math
+import time
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+
+from src.data.blob_codec import decode_json
+
+FEATURE_NAMES = [
+    "amount_magnitude",
+    "balance_share",
+    "prior_same_type_alerts",
+    "similar_amount_transactions",
+    "same_location_transactions",
+    "failed_logins_24h",
+    "location_mismatch",
+]
+
+# Relative importance of each feature in the distance metric (same order as FEATURE_NAMES).
+FEATURE_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0, 0.5, 1.0, 1.0])
+
+
+class SimilarCaseIndex:
+    """
+    Nearest-neighbour index over human-verified investigations.
+
+    Each case is reduced to a numeric feature vector built from the alert context
+    (amount, balance, location) and the historical counts the pattern stage bases its
+    verdict on. Vectors are kept in one matrix per alert type so a lookup is a single
+    vectorized distance computation.
+    """
+
+    def __init__(self, db_manager, max_distance: float = 0.25, require_same_user: bool = True):
+        self.db = db_manager
+        self.max_distance = float(max_distance)
+        self.require_same_user = require_same_user
+        self._partitions: Dict[str, Dict[str, Any]] = {}
+        self._dirty = True
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "lookup_time_total_ms": 0.0,
+            "hit_investigations": 0,
+            "hit_time_total_ms": 0.0,
+            "full_investigations": 0,
+            "full_time_total_ms": 0.0,
+        }
+
+    def mark_dirty(self) -> None:
+        """Rebuild the index on the next lookup (e.g. after an analyst verifies a case)."""
+        self._dirty = True
+
+    def build(self) -> int:
+        """(Re)build the per-alert-type matrices from human-verified outcomes. Returns the case count."""
+        cases = self.db.execute_query(
+            """
+            SELECT io.alert_id, io.final_outcome, io.is_suspicious, io.confidence_score,
+                   io.investigation_summary, io.agent_outputs
+            FROM investigation_outcomes io
+            WHERE io.human_verified = 1
+            """
+        )
+        features = self.compute_features([c["alert_id"] for c in cases])
+
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for case in cases:
+            feat = features.get(case["alert_id"])
+            if not feat:
+                continue
+            case.update({
+                "user_id": feat["user_id"],
+                "alert_type": feat["alert_type"],
+                "features": feat["features"],
+                "pattern_evidence": self._pattern_evidence(case.pop("agent_outputs", None)),
+            })
+            grouped.setdefault(feat["alert_type"], []).append(case)
+
+        self._partitions = {
+            alert_type: {
+                "matrix": np.vstack([self._vector(c["features"]) for c in group]),
+                "user_ids": np.array([c["user_id"] for c in group]),
+                "cases": group,
+            }
+            for alert_type, group in grouped.items()
+        }
+        self._dirty = False
+        total = sum(len(g) for g in grouped.values())
+        print(f"[SimilarCaseIndex] Indexed {total} verified cases across {len(grouped)} alert types.")
+        return total
+
+    def compute_features(self, alert_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Compute raw feature values for the given alerts, relative to each alert's own timestamp."""
+        if not alert_ids:
+            return {}
+        placeholders = ",".join("?" for _ in alert_ids)
+        query = f"""
+        SELECT
+            a.alert_id, a.user_id, a.alert_type, a.timestamp,
+            t.amount, t.location,
+            u.registered_location AS user_location,
+            acc.current_balance,
+            (SELECT COUNT(*) FROM alerts pa
+              WHERE pa.user_id = a.user_id AND pa.alert_type = a.alert_type
+                AND pa.timestamp_epoch < a.timestamp_epoch) AS prior_same_type_alerts,
+            (SELECT COUNT(*) FROM transactions pt
+              WHERE pt.user_id = a.user_id AND pt.timestamp_epoch < a.timestamp_epoch
+                AND pt.amount >= t.amount * 0.5) AS similar_amount_transactions,
+            (SELECT COUNT(*) FROM transactions pt
+              WHERE pt.user_id = a.user_id AND pt.timestamp_epoch < a.timestamp_epoch
+                AND pt.location = t.location) AS same_location_transactions,
+            (SELECT COUNT(*) FROM login_attempts la
+              WHERE la.user_id = a.user_id AND la.status != 'success'
+                AND la.timestamp_epoch BETWEEN a.timestamp_epoch - 86400 AND a.timestamp_epoch) AS failed_logins_24h
+        FROM alerts a
+        JOIN transactions t ON a.transaction_id = t.transaction_id
+        LEFT JOIN users u ON a.user_id = u.user_id
+        LEFT JOIN accounts acc ON a.account_id = acc.account_id
+        WHERE a.alert_id IN ({placeholders})
+        """
+        rows = self.db.execute_query(query, tuple(alert_ids))
+
+        features = {}
+        for row in rows:
+            amount = float(row.get("amount") or 0.0)
+            balance = float(row.get("current_balance") or 0.0)
+            features[row["alert_id"]] = {
+                "user_id": row["user_id"],
+                "alert_type": row["alert_type"],
+                "features": {
+                    "amount_magnitude": math.log10(1.0 + max(amount, 0.0)),
+                    "balance_share": amount / (amount + balance) if amount + balance > 0 else 0.0,
+                    "prior_same_type_alerts": math.log1p(row["prior_same_type_alerts"]),
+                    "similar_amount_transactions": math.log1p(row["similar_amount_transactions"]),
+                    "same_location_transactions": math.log1p(row["same_location_transactions"]),
+                    "failed_logins_24h": math.log1p(row["failed_logins_24h"]),
+                    "location_mismatch": float(
+                        bool(row.get("location")) and row.get("location") != row.get("user_location")
+                    ),
+                },
+            }
+        return features
+
+    def find_precedent(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """Return the closest verified case within max_distance, or None."""
+        start = time.perf_counter()
+        try:
+            if self._dirty:
+                self.build()
+
+            feat = self.compute_features([alert_id]).get(alert_id)
+            if not feat or feat["alert_type"] not in self._partitions:
+                return None
+
+            partition = self._partitions[feat["alert_type"]]
+            diffs = (partition["matrix"] - self._vector(feat["features"])) * FEATURE_WEIGHTS
+            distances = np.sqrt(np.einsum("ij,ij->i", diffs, diffs))
+            if self.require_same_user:
+                distances = np.where(partition["user_ids"] == feat["user_id"], distances, np.inf)
+            for i, case in enumerate(partition["cases"]):
+                if case["alert_id"] == alert_id:
+                    distances[i] = np.inf
+
+            best = int(np.argmin(distances))
+            distance = float(distances[best])
+            if not math.isfinite(distance) or distance > self.max_distance:
+                return None
+
+            case = partition["cases"][best]
+            self.stats["hits"] += 1
+            return {
+                "precedent_alert_id": case["alert_id"],
+                "distance": round(distance, 4),
+                "is_suspicious": bool(case["is_suspicious"]),
+                "final_outcome": case["final_outcome"],
+                "confidence_score": float(case["confidence_score"]),
+                "investigation_summary": case["investigation_summary"],
+                "pattern_evidence": case["pattern_evidence"],
+                "features": feat["features"],
+            }
+        finally:
+            self.stats["lookups"] += 1
+            self.stats["lookup_time_total_ms"] += (time.perf_counter() - start) * 1000
+
+    def record_investigation(self, elapsed_seconds: float, short_circuited: bool) -> None:
+        """Record the wall time of a finished investigation for latency-savings reporting."""
+        prefix = "hit" if short_circuited else "full"
+        self.stats[f"{prefix}_investigations"] += 1
+        self.stats[f"{prefix}_time_total_ms"] += elapsed_seconds * 1000
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Hit rate and estimated latency saved by reusing verified verdicts."""
+        s = self.stats
+        avg_full = s["full_time_total_ms"] / s["full_investigations"] if s["full_investigations"] else None
+        avg_hit = s["hit_time_total_ms"] / s["hit_investigations"] if s["hit_investigations"] else None
+        saved = (avg_full - avg_hit) * s["hit_investigations"] if avg_full is not None and avg_hit is not None else None
+        return {
+            "indexed_cases": sum(len(p["cases"]) for p in self._partitions.values()),
+            "lookups": s["lookups"],
+            "hits": s["hits"],
+            "hit_rate": s["hits"] / s["lookups"] if s["lookups"] else 0.0,
+            "avg_lookup_ms": s["lookup_time_total_ms"] / s["lookups"] if s["lookups"] else 0.0,
+            "avg_short_circuit_investigation_ms": avg_hit,
+            "avg_full_investigation_ms": avg_full,
+            "estimated_time_saved_ms": saved,
+        }
+
+    def _vector(self, features: Dict[str, float]) -> np.ndarray:
+        return np.array([features[name] for name in FEATURE_NAMES], dtype=float)
+
+    def _pattern_evidence(self, agent_outputs: Union[str, bytes, None]) -> Dict[str, Any]:
+        """Keep the pattern stage's verdict of the precedent so it can be cited."""
+        outputs = decode_json(agent_outputs, {})
+        if not isinstance(outputs, dict):
+            return {}
+        patterns = outputs.get("PatternRecognitionAgent", {})
+        return {
+            "overall_confidence": patterns.get("overall_confidence"),
+            "risk_factors": patterns.get("risk_factors", []),
+            "evidence": patterns.get("evidence") or patterns.get("llm_analysis", {}).get("evidence", {}),
+        }
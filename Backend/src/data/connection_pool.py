@@ -0,0 +1,115 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+# Per-connection tuning applied to every pooled connection.
+DEFAULT_POOL_SETTINGS = {
+    'busy_timeout_ms': 5000,
+    'cache_size_kib': 16384,        # page cache per connection
+    'mmap_size': 256 * 1024 * 1024, # memory-mapped reads
+    'cached_statements': 256,       # prepared statements kept per connection
+    'acquire_timeout_s': 30.0,
+}
+
+class SQLiteConnectionPool:
+    """
+    A fixed-size pool of tuned SQLite connections.
+
+    Connections are created lazily up to `size`, shared across threads
+    (check_same_thread=False) and handed out one caller at a time. A thread that
+    already holds a connection from this pool gets the same one back, so nested
+    `with pool.connection()` blocks cannot deadlock a size-1 pool. Read-only pools
+    set query_only so a stray write fails instead of contending with the writer.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, read_only: bool = False, **settings: Any):
+        self.db_path = db_path
+        self.size = max(1, int(size))
+        self.read_only = read_only
+        self.settings = {**DEFAULT_POOL_SETTINGS, **{k: v for k, v in settings.items() if v is not None}}
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._held = threading.local()
+        self.stats = {'created': 0, 'acquired': 0, 'waited': 0, 'wait_ms': 0.0}
+
+    def _connect(self) -> sqlite3.Connection:
+        s = self.settings
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=s['busy_timeout_ms'] / 1000,
+            check_same_thread=False,
+            cached_statements=int(s['cached_statements']),
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(s['busy_timeout_ms'])}")
+        conn.execute(f"PRAGMA cache_size = -{int(s['cache_size_kib'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(s['mmap_size'])}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                self.stats['created'] += 1
+                return conn
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.settings['acquire_timeout_s'])
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out waiting for a {'read' if self.read_only else 'write'} connection to {self.db_path}"
+            )
+        self.stats['waited'] += 1
+        self.stats['wait_ms'] += (time.perf_counter() - started) * 1000
+        return conn
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._held, 'conn', None)
+        if held is not None:
+            self._held.depth += 1
+            try:
+                yield held
+            finally:
+                self._held.depth -= 1
+            return
+
+        conn = self._acquire()
+        self.stats['acquired'] += 1
+        self._held.conn, self._held.depth = conn, 0
+        try:
+            yield conn
+        finally:
+            self._held.conn = None
+            if conn.in_transaction:
+                # Never hand the next caller a half-finished transaction.
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+        self._idle = queue.LifoQueue()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'size': self.size,
+            'open': len(self._all),
+            'idle': self._idle.qsize(),
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.stats.items()},
+        }
@@ -3,14 +3,56 @@ from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
 import json
 from datetime import datetime
+from src.data.archive import JUDGEMENT_COLUMNS, JudgementArchiver, merge_judgements
+from src.data.async_database import AsyncDatabase
+from src.data.blob_codec import encode_blob, decode_json
+from src.data.connection_pool import SQLiteConnectionPool
+from src.data.outcome_listing import LIST_INDEX_MIGRATION, list_investigation_outcomes
+from src.data import aggregate_evidence, bulk_import, epoch_columns, evidence_cache, outcome_search, query_plans, stats_counters, table_versions
+from src.data.write_behind import WriteBehindWriter
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "data/alerts.db"):
+    def __init__(self, db_path: str = "data/alerts.db", config: Optional[Dict[str, Any]] = None):
         self.db_path = db_path
+        config = config or {}
+        pool_settings = {
+            'busy_timeout_ms': config.get('db_busy_timeout_ms'),
+            'cache_size_kib': config.get('db_cache_size_kib'),
+            'mmap_size': config.get('db_mmap_size'),
+            'cached_statements': config.get('db_cached_statements'),
+        }
+        # SQLite allows one writer at a time; a single pooled write connection serializes
+        # writes in-process while WAL lets the read pool keep working alongside it.
+        self.write_pool = SQLiteConnectionPool(db_path, size=1, **pool_settings)
+        self.read_pool = SQLiteConnectionPool(db_path, size=int(config.get('db_read_pool_size', 4)),
+                                              read_only=True, **pool_settings)
+        self._enable_wal()
+        # Awaitable API for coroutines: DatabaseManager calls run on a dedicated executor.
+        self.aio = AsyncDatabase(self, max_workers=int(config.get('db_async_workers', self.read_pool.size + 1)))
         self.schema_info = self._get_schema_info()
         self.init_agent_tables()
         self.ensure_review_status_column()
         self.ensure_agent_outputs_column()
+        self.compress_stored_blobs()
+        self.apply_migration(*LIST_INDEX_MIGRATION)
+        self.apply_migration(*stats_counters.MIGRATION)
+        self.apply_migration(*table_versions.MIGRATION)
+        self.apply_migration(*table_versions.EVIDENCE_MIGRATION)
+        self.apply_migration(*evidence_cache.MIGRATION)
+        self.apply_migration(*query_plans.MIGRATION)
+        self.apply_migration(*aggregate_evidence.MIGRATION)
+        self.apply_migration(*epoch_columns.MIGRATION)
+        if self.apply_migration(*outcome_search.MIGRATION):
+            outcome_search.rebuild(self)
+        self.apply_migration(*bulk_import.MIGRATION)
+        bulk_import.restore_deferred_indexes(self)
+        # Old judgements / full results live in monthly archive files, read on demand.
+        self.archiver = JudgementArchiver(self, archive_dir=config.get('archive_dir'),
+                                          retention_days=int(config.get('archive_retention_days', 90)),
+                                          batch_size=int(config.get('archive_batch_size', 500)))
+        # One writer thread batches judgement/outcome/review-status writes into group commits.
+        self.writer = WriteBehindWriter(self, max_batch=int(config.get('db_write_batch_size', 256)),
+                                        flush_interval_ms=int(config.get('db_write_flush_ms', 50)))
 
 
     def set_review_and_update_outcome(self, alert_id: str, is_suspicious: bool, investigation_summary: str) -> None:
@@ -49,6 +91,7 @@ class DatabaseManager:
                 "UPDATE alerts SET review_status = 2 WHERE alert_id = ?",
                 (alert_id,)
             )
+            outcome_search.index_outcomes(conn, [alert_id])
 
             conn.commit()    
 
@@ -73,85 +116,116 @@ class DatabaseManager:
                 conn.execute("UPDATE alerts SET review_status = 0 WHERE review_status IS NULL;")
                 conn.commit()
 
-    def set_review_status(self, alert_id: str, status: int) -> None:
-        """Update review_status for one alert."""
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE alerts SET review_status = ? WHERE alert_id = ?",
-                (int(status), alert_id)
+    def insert_judgement(self, judgement: Dict[str, Any]) -> None:
+        """Queue one agent judgement for the audit trail; the writer commits it within its flush interval."""
+        self.writer.submit_judgement(judgement)
+
+    def save_full_investigation_result(self, alert_id: str, result: Dict[str, Any]) -> None:
+        """
+        Store the complete workflow result payload for an alert, compressed.
+        agent_outputs is left out when it is identical to the copy already stored on the
+        alert's outcome row; get_full_investigation_result() puts it back.
+        """
+        payload = json.loads(json.dumps(result, default=str))
+        if "agent_outputs" in payload:
+            stored = self.execute_query(
+                "SELECT agent_outputs FROM investigation_outcomes WHERE alert_id = ? LIMIT 1", (alert_id,)
             )
+            if stored and decode_json(stored[0]["agent_outputs"]) == payload["agent_outputs"]:
+                del payload["agent_outputs"]
+                payload["agent_outputs_ref"] = "investigation_outcomes"
+        with self.get_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO full_investigation_results (alert_id, result_json, timestamp)
+                VALUES (?, ?, ?)
+            """, (alert_id, encode_blob(json.dumps(payload, ensure_ascii=False)), datetime.now().isoformat()))
             conn.commit()
 
-    def get_review_status_counts(self) -> list[dict]:
-        """Return counts per distinct review_status value."""
-        query = """
-        SELECT COALESCE(review_status, 0) AS review_status, COUNT(*) AS count
-        FROM alerts
-        GROUP BY COALESCE(review_status, 0)
-        ORDER BY review_status
-        """
-        return self.execute_query(query)            
+    def get_full_investigation_result(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.execute_query(
+            """
+            SELECT r.result_json, io.agent_outputs
+            FROM full_investigation_results r
+            LEFT JOIN investigation_outcomes io ON io.alert_id = r.alert_id
+            WHERE r.alert_id = ?
+            LIMIT 1
+            """,
+            (alert_id,),
+        )
+        if not rows:
+            archived = self.archiver.get_full_result_row(alert_id)
+            if archived is None:
+                return None
+            outcome = self.execute_query(
+                "SELECT agent_outputs FROM investigation_outcomes WHERE alert_id = ? LIMIT 1", (alert_id,)
+            )
+            rows = [{"result_json": archived["result_json"], "agent_outputs": outcome[0]["agent_outputs"] if outcome else None}]
+        result = decode_json(rows[0]["result_json"], {})
+        if isinstance(result, dict) and result.pop("agent_outputs_ref", None):
+            result["agent_outputs"] = decode_json(rows[0]["agent_outputs"], {})
+        return result
 
-    def upsert_investigation_outcome(self, outcome: Dict[str, Any]) -> None:
+    def get_alert_judgements(self, alert_id: str) -> List[Dict[str, Any]]:
+        """All judgements of an alert, hot and archived, oldest first."""
+        # The archive's columns, so both sources yield rows of one shape (no generated timestamp_epoch).
+        hot = self.execute_query(
+            f"SELECT {JUDGEMENT_COLUMNS} FROM agent_judgements WHERE alert_id = ? ORDER BY timestamp", (alert_id,)
+        )
+        return merge_judgements(hot, self.archiver.get_judgements(alert_id))
+
+    def list_investigation_outcomes(self, **filters: Any) -> Dict[str, Any]:
+        """Keyset-paginated, projected outcome listing (see outcome_listing)."""
+        return list_investigation_outcomes(self, **filters)
+
+    def compress_stored_blobs(self) -> None:
         """
-        Update the existing investigation_outcomes row for this alert_id, or insert a new row if none exists.
-        Preserves human_verified if it was already set (so a re-run won't reset it to False).
+        One-time migration: re-encode plain-text agent_outputs / result_json rows in the
+        compressed blob format, then VACUUM so the freed pages are returned to the OS.
         """
+        statements = [
+            "UPDATE investigation_outcomes SET agent_outputs = blob_encode(agent_outputs) WHERE typeof(agent_outputs) = 'text'",
+            "UPDATE full_investigation_results SET result_json = blob_encode(result_json) WHERE typeof(result_json) = 'text'",
+        ]
         with self.get_connection() as conn:
-            existing = conn.execute(
-                "SELECT outcome_id, human_verified FROM investigation_outcomes WHERE alert_id = ? LIMIT 1",
-                (outcome["alert_id"],)
-            ).fetchone()
+            conn.create_function("blob_encode", 1, encode_blob, deterministic=True)
+            if not self.apply_migration("compress_json_blobs_v1", statements):
+                return
+            conn.execute("VACUUM")
+            # In WAL mode the rewritten pages land in the -wal file until checkpointed.
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
-            if existing:
-                # preserve prior human_verified if True (or not null)
-                prior_hv = existing["human_verified"]
-                human_verified = prior_hv if prior_hv is not None else outcome.get("human_verified", False)
+    def set_review_status(self, alert_id: str, status: int) -> None:
+        """Update review_status for one alert (group-committed by the writer)."""
+        self.writer.submit_review_status(alert_id, status).result()
 
-                conn.execute(
-                    """
-                    UPDATE investigation_outcomes
-                    SET final_outcome = ?,
-                        is_suspicious = ?,
-                        confidence_score = ?,
-                        investigation_summary = ?,
-                        human_verified = ?,
-                        timestamp = ?
-                    WHERE alert_id = ?
-                    """,
-                    (
-                        outcome["final_outcome"],
-                        int(bool(outcome["is_suspicious"])),
-                        float(outcome["confidence_score"]),
-                        outcome.get("investigation_summary"),
-                        int(bool(human_verified)),
-                        outcome["timestamp"],
-                        outcome["alert_id"],
-                    ),
-                )
-            else:
-                conn.execute(
-                    """
-                    INSERT INTO investigation_outcomes
-                    (outcome_id, alert_id, final_outcome, is_suspicious, confidence_score,
-                     investigation_summary, human_verified, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        outcome["outcome_id"],
-                        outcome["alert_id"],
-                        outcome["final_outcome"],
-                        int(bool(outcome["is_suspicious"])),
-                        float(outcome["confidence_score"]),
-                        outcome.get("investigation_summary"),
-                        int(bool(outcome.get("human_verified", False))),
-                        outcome["timestamp"],
-                    ),
-                )
-            conn.commit()
+    def get_review_status_counts(self) -> list[dict]:
+        """Return counts per distinct review_status value (trigger-maintained counters)."""
+        return stats_counters.review_status_counts(self)
+
+    def get_outcome_counts(self) -> List[Dict[str, Any]]:
+        """Count and average confidence per (final_outcome, is_suspicious) (trigger-maintained counters)."""
+        return stats_counters.outcome_counts(self)
+
+    def get_table_versions(self, tables: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Trigger-maintained write sequence per table (change marker for caches)."""
+        return table_versions.get_versions(self, tables)
+
+    def rebuild_stats_counters(self) -> None:
+        stats_counters.rebuild(self)
+
+    def upsert_investigation_outcome(self, outcome: Dict[str, Any]) -> None:
+        """
+        Update the existing investigation_outcomes row for this alert_id, or insert a new row if none exists.
+        Preserves human_verified if it was already set (so a re-run won't reset it to False),
+        and on verified rows the analyst's is_suspicious and investigation_summary as well.
+        agent_outputs (JSON text) is only written when present in the outcome.
+        Committed by the write-behind writer; returns once the batch holding it is committed.
+        """
+        self.writer.submit_outcome(outcome).result()
 
     def _get_schema_info(self) -> Dict[str, Dict[str, str]]:
         """Get complete database schema information for intelligent query generation.""" 
+        GENERATED = epoch_columns.GENERATED_DECLARATION
         return {
             "users": {
                 "user_id": "TEXT PRIMARY KEY",
@@ -166,12 +240,12 @@ class DatabaseManager:
                 "transaction_id": "TEXT PRIMARY KEY", "user_id": "TEXT", "account_id": "TEXT",
                 "timestamp": "TEXT", "amount": "REAL", "currency": "TEXT", "merchant": "TEXT",
                 "transaction_type": "TEXT", "location": "TEXT", "device_id": "TEXT",
-                "ip_address": "TEXT", "payee_id": "TEXT"
+                "ip_address": "TEXT", "payee_id": "TEXT", "timestamp_epoch": GENERATED
             },
             "alerts": {
                 "alert_id": "TEXT PRIMARY KEY", "user_id": "TEXT", "account_id": "TEXT",
                 "transaction_id": "TEXT", "alert_type": "TEXT", "timestamp": "TEXT",
-                "description": "TEXT"
+                "description": "TEXT", "timestamp_epoch": GENERATED
             },
             "devices": {
                 "device_id": "TEXT PRIMARY KEY", "device_type": "TEXT", "os": "TEXT",
@@ -179,14 +253,15 @@ class DatabaseManager:
             },
             "login_attempts": {
                 "login_id": "TEXT PRIMARY KEY", "user_id": "TEXT", "timestamp": "TEXT",
-                "status": "TEXT", "ip_address": "TEXT", "device_id": "TEXT"
+                "status": "TEXT", "ip_address": "TEXT", "device_id": "TEXT", "timestamp_epoch": GENERATED
             },
             "payees": {
                 "payee_id": "TEXT PRIMARY KEY", "payee_name": "TEXT", "email": "TEXT",
                 "phone_number": "TEXT", "registered_location": "TEXT", "account_creation_date": "TEXT"
             },
             "user_devices": { "user_id": "TEXT", "device_id": "TEXT" },
-            "user_payees": { "user_id": "TEXT", "payee_id": "TEXT", "date_added_by_user": "TEXT" }
+            "user_payees": { "user_id": "TEXT", "payee_id": "TEXT", "date_added_by_user": "TEXT",
+                             "date_added_epoch": GENERATED }
         }
     
     def alert_exists(self, alert_id: str) -> bool:
@@ -199,7 +274,7 @@ class DatabaseManager:
 
     def init_agent_tables(self):
         """Initialize tables for agent operations and audit trail.""" 
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             conn.executescript("""
             CREATE TABLE IF NOT EXISTS agent_judgements (
                 judgement_id TEXT PRIMARY KEY,
@@ -229,20 +304,80 @@ class DatabaseManager:
             );
             CREATE INDEX IF NOT EXISTS idx_judgements_alert ON agent_judgements (alert_id);
             CREATE INDEX IF NOT EXISTS idx_outcomes_alert ON investigation_outcomes (alert_id);
+            CREATE TABLE IF NOT EXISTS full_investigation_results (
+                alert_id TEXT PRIMARY KEY,
+                result_json TEXT,
+                timestamp TEXT
+            );
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                statements TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            );
             """)
 
+    def apply_migration(self, name: str, statements: List[str]) -> bool:
+        """
+        Run a named migration once, in a single transaction, and record it in schema_migrations.
+        Returns False if a migration with this name was already applied.
+        """
+        with self.get_connection() as conn:
+            if conn.execute("SELECT 1 FROM schema_migrations WHERE name = ?", (name,)).fetchone():
+                return False
+            try:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_migrations (name, statements, applied_at) VALUES (?, ?, ?)",
+                    (name, json.dumps(statements), datetime.now().isoformat())
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        print(f"[DatabaseManager] Applied migration {name}.")
+        return True
+
+    def get_applied_migrations(self) -> List[Dict[str, Any]]:
+        return self.execute_query("SELECT name, statements, applied_at FROM schema_migrations ORDER BY applied_at")
+
+    def _enable_wal(self) -> None:
+        """Switch the database to WAL so readers no longer block (or wait on) the writer. Persistent per file."""
+        with self.get_connection() as conn:
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                print(f"[DatabaseManager] WAL not available for {self.db_path}; using journal_mode={mode}.")
+
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+        """Pooled read-write connection. Callers must commit their writes."""
+        with self.write_pool.connection() as conn:
             yield conn
-        finally:
-            conn.close()
+
+    @contextmanager
+    def get_read_connection(self):
+        """Pooled read-only (query_only) connection."""
+        with self.read_pool.connection() as conn:
+            yield conn
+
+    def get_pool_statistics(self) -> Dict[str, Any]:
+        return {
+            'read': self.read_pool.get_statistics(),
+            'write': self.write_pool.get_statistics(),
+            'writer': self.writer.get_statistics(),
+        }
+
+    def close(self) -> None:
+        """Finish in-flight calls, commit queued writes, then close every connection."""
+        self.aio.shutdown()
+        self.writer.close()
+        self.read_pool.close_all()
+        self.write_pool.close_all()
 
     def execute_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
-        """Execute a query and return results as list of dictionaries.""" 
-        with self.get_connection() as conn:
+        """Execute a read-only query and return results as list of dictionaries.""" 
+        with self.get_read_connection() as conn:
             results = conn.execute(query, params).fetchall()
             return [dict(row) for row in results]
 
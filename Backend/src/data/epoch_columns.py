@@ -0,0 +1,52 @@
+# src/data/epoch_columns.py
+
+import calendar
+from datetime import datetime
+from typing import Any, List, Optional
+
+# Timestamps are TEXT in more than one format ('2025-08-01 17:55:10' from the generator
+# and bulk import, isoformat with 'T' and microseconds from the app), so they neither
+# compare correctly as strings nor support arithmetic without julianday() per row.
+# Each time column gets an INTEGER unix-seconds twin, a virtual generated column: SQLite
+# computes it from the text on every write path (app, bulk import, CLI tools), so it
+# cannot drift, and the indexes below store it, which is the backfill. Naive text
+# timestamps read as UTC, as strftime('%s') does; unparsable text gives NULL.
+EPOCH_COLUMNS = {
+    # table: (text column, epoch column, index columns)
+    "transactions": ("timestamp", "timestamp_epoch", ("user_id", "timestamp_epoch")),
+    "login_attempts": ("timestamp", "timestamp_epoch", ("user_id", "timestamp_epoch")),
+    "alerts": ("timestamp", "timestamp_epoch", ("user_id", "timestamp_epoch")),
+    "user_payees": ("date_added_by_user", "date_added_epoch", ("user_id", "payee_id", "date_added_epoch")),
+    # The outcome tables have no user_id; they are ranged by time alone (archiving).
+    "investigation_outcomes": ("timestamp", "timestamp_epoch", ("timestamp_epoch",)),
+    "agent_judgements": ("timestamp", "timestamp_epoch", ("timestamp_epoch",)),
+    "full_investigation_results": ("timestamp", "timestamp_epoch", ("timestamp_epoch",)),
+}
+# Declared type recorded in DatabaseManager.schema_info; bulk import skips these columns.
+GENERATED_DECLARATION = "INTEGER GENERATED (unix seconds, indexed)"
+
+
+def epoch_statements(table: str) -> List[str]:
+    text_column, epoch_column, index_columns = EPOCH_COLUMNS[table]
+    return [
+        f"ALTER TABLE {table} ADD COLUMN {epoch_column} INTEGER "
+        f"GENERATED ALWAYS AS (CAST(strftime('%s', {text_column}) AS INTEGER)) VIRTUAL",
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(index_columns)} ON {table} ({', '.join(index_columns)})",
+    ]
+
+MIGRATION = ("epoch_columns_v1", [
+    *[s for table in EPOCH_COLUMNS for s in epoch_statements(table)],
+    # Superseded by the (user_id, timestamp_epoch) indexes.
+    "DROP INDEX IF EXISTS idx_transactions_user_ts",
+    "DROP INDEX IF EXISTS idx_login_attempts_user_ts",
+])
+
+
+def to_epoch(value: Any) -> Optional[int]:
+    """Unix seconds for a datetime or timestamp text, with the same rules as the generated columns."""
+    if value is None:
+        return None
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        return int(moment.timestamp())
+    return calendar.timegm(moment.timetuple())
@@ -0,0 +1,122 @@
+# src/data/evidence_cache.py
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.data.query_templates import QUERY_TEMPLATES
+
+# A per-user write sequence, bumped by triggers on every table the evidence templates
+# read for that user, so a cached evidence result is valid exactly as long as the
+# user's version is unchanged. Devices carry no user_id; a device change bumps every
+# user linked to it through user_devices.
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+USER_TABLES = ["transactions", "login_attempts", "user_payees", "user_devices", "accounts", "users"]
+
+def _bump(user_expr: str) -> str:
+    return (f"INSERT INTO user_versions (user_id, version) SELECT {user_expr}, 1 WHERE {user_expr} IS NOT NULL "
+            f"ON CONFLICT (user_id) DO UPDATE SET version = version + 1;")
+
+def user_version_triggers(table: str) -> List[str]:
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_user_version_{table}_insert AFTER INSERT ON {table} "
+        f"BEGIN {_bump('NEW.user_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_user_version_{table}_delete AFTER DELETE ON {table} "
+        f"BEGIN {_bump('OLD.user_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_user_version_{table}_update AFTER UPDATE ON {table} "
+        f"BEGIN {_bump('NEW.user_id')} "
+        f"UPDATE user_versions SET version = version + 1 WHERE user_id = OLD.user_id AND OLD.user_id IS NOT NEW.user_id; END",
+    ]
+
+DEVICE_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_user_version_devices_{event.lower()} AFTER {event} ON devices BEGIN "
+    f"INSERT INTO user_versions (user_id, version) "
+    f"SELECT user_id, 1 FROM user_devices WHERE device_id = {row}.device_id "
+    f"ON CONFLICT (user_id) DO UPDATE SET version = version + 1; END"
+    for event, row in (("UPDATE", "NEW"), ("DELETE", "OLD"))
+]
+MIGRATION = ("user_versions_v1",
+             [CREATE_TABLE, *[t for table in USER_TABLES for t in user_version_triggers(table)], *DEVICE_TRIGGERS])
+
+
+def get_user_version(conn, user_id: str) -> int:
+    row = conn.execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+def _params_key(params) -> tuple:
+    """Hashable form of ? (tuple) or :name (dict) parameters."""
+    return tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params)
+
+class EvidenceCache:
+    """
+    In-memory LRU of sandboxed evidence results, keyed by (user, template, params) and
+    tagged with the user's version when the result was read. A lookup only hits if the
+    user's current version is the same, so any write to that user's rows invalidates
+    all of their entries. Bounded by total result bytes and entry count.
+
+    Only catalogue templates whose result depends on the data alone are cached; queries
+    relative to 'now' and LLM-generated SQL always run.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self._entries: "OrderedDict[Tuple[str, str, tuple], Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    @staticmethod
+    def cacheable(template: str) -> bool:
+        return "'now'" not in QUERY_TEMPLATES.get(template, "'now'")
+
+    def get(self, user_id: str, template: str, params, version: int) -> Optional[Dict[str, Any]]:
+        key = (user_id, template, _params_key(params))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry[0] != version:
+                self.stats["stale"] += 1
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, user_id: str, template: str, params, version: int, report: Dict[str, Any]) -> None:
+        if report.get("status") not in ("ok", "truncated"):
+            return
+        size = int(report.get("bytes", 0))
+        if size > self.max_bytes:
+            return
+        key = (user_id, template, _params_key(params))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, report)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["stale"]
+            return {
+                **self.stats,
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: Tuple[str, str, tuple]) -> None:
+        _, report = self._entries.pop(key)
+        self._bytes -= int(report.get("bytes", 0))
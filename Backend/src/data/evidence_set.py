@@ -0,0 +1,229 @@
+# src/data/evidence_set.py
+
+import re
+from collections.abc import Mapping, Sequence
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+EVIDENCE_KEY = re.compile(r"^query_(\d+)_(results|sql|count|error|sandbox)$")
+
+class EntityTable:
+    """Column arrays of rows from one source table, de-duplicated by primary key."""
+
+    def __init__(self, name: str, key: str):
+        self.name = name
+        self.key = key
+        self.columns: Dict[str, List[Any]] = {key: []}
+        self.positions: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns[self.key])
+
+    def conflicts(self, columns: Tuple[str, ...], rows: List[Dict[str, Any]]) -> bool:
+        """True if a row disagrees with a stored value of the same key (e.g. an aliased aggregate)."""
+        for row in rows:
+            pos = self.positions.get(row[self.key])
+            if pos is None:
+                continue
+            for column in columns:
+                stored = self.columns.get(column)
+                if stored is not None and stored[pos] is not None and stored[pos] != row[column]:
+                    return True
+        return False
+
+    def add(self, columns: Tuple[str, ...], rows: List[Dict[str, Any]]) -> List[int]:
+        """Store the rows (new keys appended, known keys filled in) and return their positions."""
+        size = len(self)
+        for column in columns:
+            if column not in self.columns:
+                self.columns[column] = [None] * size
+        refs = []
+        for row in rows:
+            pos = self.positions.get(row[self.key])
+            if pos is None:
+                pos = len(self)
+                self.positions[row[self.key]] = pos
+                for column, values in self.columns.items():
+                    values.append(row.get(column))
+            else:
+                for column in columns:
+                    if self.columns[column][pos] is None:
+                        self.columns[column][pos] = row[column]
+            refs.append(pos)
+        return refs
+
+class ColumnView(Sequence):
+    """One column of a query result, read through the shared entity arrays without copying."""
+
+    def __init__(self, values: List[Any], refs: Optional[List[int]] = None):
+        self._values = values
+        self._refs = refs
+
+    def __len__(self) -> int:
+        return len(self._refs) if self._refs is not None else len(self._values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._values[self._refs[i]] if self._refs is not None else self._values[i]
+
+class QueryResult:
+    """
+    One evidence query: its SQL and result columns, stored either as references into a
+    shared EntityTable or, for aggregates and joins, as its own column arrays.
+    """
+
+    def __init__(self, sql: str, columns: Tuple[str, ...], row_count: int,
+                 entity: Optional[EntityTable] = None, refs: Optional[List[int]] = None,
+                 data: Optional[Dict[str, List[Any]]] = None, error: Optional[str] = None,
+                 sandbox: Optional[Dict[str, Any]] = None):
+        self.sql = sql
+        self.columns = columns
+        self.row_count = row_count
+        self.entity = entity
+        self.refs = refs
+        self.data = data
+        self.error = error
+        self.sandbox = sandbox
+
+    def column(self, name: str) -> ColumnView:
+        if self.entity is not None:
+            return ColumnView(self.entity.columns[name], self.refs)
+        return ColumnView(self.data[name])
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Materialize dict rows (built on each call; nothing is cached)."""
+        views = [(name, self.column(name)) for name in self.columns]
+        return [{name: view[i] for name, view in views} for i in range(self.row_count)]
+
+    def row_lists(self) -> List[List[Any]]:
+        views = [self.column(name) for name in self.columns]
+        return [[view[i] for view in views] for i in range(self.row_count)]
+
+class EvidenceSet(Mapping):
+    """
+    Columnar container for the evidence of one ingestion step.
+
+    Result rows of plain table reads (every column belongs to one table and its primary
+    key is selected) are stored once per key in shared EntityTables, so a transaction
+    returned by three queries is held once; other results keep their own column arrays.
+    Column names are stored once per result instead of once per row.
+
+    It is a read-only Mapping with the same keys as the former flat evidence dict
+    (query_N_sql / _results / _count / _error / _sandbox); `query_N_results` materializes
+    dict rows on access. Agents that only need a column or a count use result()/column()
+    and to_prompt(), which never build per-row dicts.
+    """
+
+    def __init__(self, schema_info: Dict[str, Dict[str, str]]):
+        self._table_columns = {table: set(columns) for table, columns in schema_info.items()}
+        self._table_keys = {}
+        for table, columns in schema_info.items():
+            keys = [c for c, declared in columns.items() if "PRIMARY KEY" in declared.upper()]
+            if len(keys) == 1:
+                self._table_keys[table] = keys[0]
+        self.entities: Dict[str, EntityTable] = {}
+        self.results: Dict[int, QueryResult] = {}
+
+    def add_result(self, number: int, sql: str, rows: List[Dict[str, Any]],
+                   sandbox: Optional[Dict[str, Any]] = None) -> QueryResult:
+        columns = tuple(rows[0].keys()) if rows else ()
+        table = self._entity_table_for(columns)
+        entity = self.entities.get(table) if table else None
+        if table and entity is None:
+            entity = self.entities[table] = EntityTable(table, self._table_keys[table])
+        if entity is not None and not entity.conflicts(columns, rows):
+            result = QueryResult(sql, columns, len(rows), entity=entity, refs=entity.add(columns, rows), sandbox=sandbox)
+        else:
+            data = {name: [row[name] for row in rows] for name in columns}
+            result = QueryResult(sql, columns, len(rows), data=data, sandbox=sandbox)
+        self.results[number] = result
+        return result
+
+    def add_error(self, number: int, sql: str, error: str) -> None:
+        self.results[number] = QueryResult(sql, (), 0, data={}, error=error)
+
+    def result(self, number: int) -> QueryResult:
+        return self.results[number]
+
+    def find_rows(self, column: str) -> List[Dict[str, Any]]:
+        """Dict rows of the largest result that has `column` (only that result is materialized)."""
+        candidates = [r for r in self.results.values() if r.error is None and r.row_count and column in r.columns]
+        return max(candidates, key=lambda r: r.row_count).rows() if candidates else []
+
+    def to_prompt(self) -> Dict[str, Any]:
+        """Compact JSON-ready form for LLM prompts: column names once, rows as arrays, no empty results."""
+        queries = []
+        for number, result in sorted(self.results.items()):
+            if result.error is not None:
+                queries.append({"query": number, "sql": result.sql, "error": result.error})
+                continue
+            if not result.row_count:
+                continue
+            entry = {"query": number, "sql": result.sql, "columns": list(result.columns), "rows": result.row_lists()}
+            if result.sandbox:
+                entry["sandbox"] = result.sandbox
+            queries.append(entry)
+        return {"queries": queries}
+
+    def summarize(self) -> Dict[str, Any]:
+        """Query / data-point counts and per-result findings, without materializing rows."""
+        total_data_points = 0
+        key_findings: List[str] = []
+        for number, result in sorted(self.results.items()):
+            if result.error is not None:
+                total_data_points += 1
+                continue
+            total_data_points += result.row_count + 1 + (1 if result.sandbox else 0)
+            if result.row_count:
+                key_findings.append(f"query_{number}_results: {result.row_count} records found")
+        return {"total_queries_executed": len(self.results), "total_data_points": total_data_points,
+                "key_findings": key_findings}
+
+    def _entity_table_for(self, columns: Tuple[str, ...]) -> Optional[str]:
+        if not columns:
+            return None
+        names = set(columns)
+        for table, key in self._table_keys.items():
+            if key in names and names <= self._table_columns[table]:
+                return table
+        return None
+
+    # Mapping interface, compatible with the flat evidence dict.
+    def __getitem__(self, key: str) -> Any:
+        match = EVIDENCE_KEY.match(key) if isinstance(key, str) else None
+        result = self.results.get(int(match.group(1))) if match else None
+        if result is None:
+            raise KeyError(key)
+        kind = match.group(2)
+        if kind == "sql":
+            return result.sql
+        if result.error is not None:
+            if kind == "error":
+                return result.error
+            raise KeyError(key)
+        if kind == "results":
+            return result.rows()
+        if kind == "count":
+            return result.row_count
+        if kind == "sandbox" and result.sandbox:
+            return result.sandbox
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for number, result in sorted(self.results.items()):
+            yield f"query_{number}_sql"
+            if result.error is not None:
+                yield f"query_{number}_error"
+                continue
+            yield f"query_{number}_results"
+            yield f"query_{number}_count"
+            if result.sandbox:
+                yield f"query_{number}_sandbox"
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def prompt_view(evidence: Any) -> Any:
+    """What to serialize into a prompt for this evidence (EvidenceSet or a plain dict)."""
+    return evidence.to_prompt() if isinstance(evidence, EvidenceSet) else evidence
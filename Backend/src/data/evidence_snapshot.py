@@ -0,0 +1,92 @@
+# src/data/evidence_snapshot.py
+
+import asyncio
+import queue
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.data.table_versions import EVIDENCE_TABLES, read_fence
+
+class SnapshotQueryRunner:
+    """
+    Runs one investigation's evidence queries in parallel on the read pool and checks
+    that they all saw the same database state.
+
+    Each worker holds one pooled read connection inside a single read transaction (a
+    WAL snapshot) and pulls queries from a shared queue, so ingestion takes about as
+    long as its slowest query rather than the sum. SQLite cannot share one snapshot
+    between connections, so the first thing each worker reads in its transaction is
+    table_versions for the evidence tables: if every worker saw the same versions, no
+    write to those tables committed between their snapshots and the evidence is
+    consistent. Otherwise the batch is retried, and after `attempts` tries it runs
+    sequentially inside one transaction on one connection.
+    """
+
+    def __init__(self, db_manager, sandbox, workers: Optional[int] = None, attempts: int = 2,
+                 fence_tables: List[str] = EVIDENCE_TABLES):
+        self.db = db_manager
+        self.sandbox = sandbox
+        self.workers = max(1, int(workers or db_manager.read_pool.size))
+        self.attempts = max(1, int(attempts))
+        self.fence_tables = list(fence_tables)
+        self.stats = {"batches": 0, "consistent_first_try": 0, "retried": 0, "sequential_fallbacks": 0}
+
+    async def run(self, queries: List[Tuple[str, tuple]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Sandbox reports in query order, plus how the snapshot was obtained."""
+        if not queries:
+            return [], {"mode": "none", "attempts": 0}
+        self.stats["batches"] += 1
+        workers = min(self.workers, len(queries))
+        if workers <= 1:
+            reports, fence = await self.db.aio.run(self._run_sequential, queries)
+            return reports, {"mode": "sequential", "attempts": 1, "fence": fence}
+
+        for attempt in range(1, self.attempts + 1):
+            reports, fences = await self._run_parallel(queries, workers)
+            if len({tuple(sorted(f.items())) for f in fences}) <= 1:
+                self.stats["consistent_first_try" if attempt == 1 else "retried"] += 1
+                return reports, {"mode": "parallel", "workers": workers, "attempts": attempt,
+                                 "fence": fences[0] if fences else {}}
+            print(f"[SnapshotQueryRunner] Evidence tables changed during attempt {attempt}; snapshots differ.")
+
+        self.stats["sequential_fallbacks"] += 1
+        reports, fence = await self.db.aio.run(self._run_sequential, queries)
+        return reports, {"mode": "sequential", "attempts": self.attempts + 1, "fence": fence}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.stats, "workers": self.workers}
+
+    async def _run_parallel(self, queries: List[Tuple[str, tuple]],
+                            workers: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, int]]]:
+        work: "queue.SimpleQueue[Tuple[int, str, tuple]]" = queue.SimpleQueue()
+        for index, (sql, params) in enumerate(queries):
+            work.put((index, sql, params))
+        reports: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        fences = await asyncio.gather(*(self.db.aio.run(self._worker, work, reports) for _ in range(workers)))
+        # A worker that started after the queue drained ran nothing; its snapshot does not matter.
+        return reports, [f for f in fences if f is not None]
+
+    def _worker(self, work: "queue.SimpleQueue", reports: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, int]]:
+        fence = None
+        with self.db.get_read_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                while True:
+                    try:
+                        index, sql, params = work.get_nowait()
+                    except queue.Empty:
+                        return fence
+                    if fence is None:
+                        # The first read fixes this connection's snapshot.
+                        fence = read_fence(conn, self.fence_tables)
+                    reports[index] = self.sandbox.run(sql, params, conn=conn)
+            finally:
+                conn.commit()
+
+    def _run_sequential(self, queries: List[Tuple[str, tuple]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        with self.db.get_read_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                fence = read_fence(conn, self.fence_tables)
+                return [self.sandbox.run(sql, params, conn=conn) for sql, params in queries], fence
+            finally:
+                conn.commit()
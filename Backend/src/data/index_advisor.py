@@ -0,0 +1,370 @@
+# src/data/index_advisor.py
+
+import json
+import re
+import statistics
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+# Access paths every investigation uses, proposed even before the query log has data.
+BASELINE_INDEXES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("transactions", ("user_id", "timestamp_epoch")),
+    ("login_attempts", ("user_id", "timestamp_epoch")),
+    ("user_payees", ("user_id", "payee_id")),
+    ("user_devices", ("user_id",)),
+    ("alerts", ("timestamp",)),
+]
+
+# Indexes wider than this are not worth their write cost for covering purposes.
+MAX_COVERING_COLUMNS = 6
+# Each extra index slows every insert into its table; cap how many the advisor adds per table.
+MAX_INDEXES_PER_TABLE = 3
+
+SQL_KEYWORDS = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "on", "group", "order",
+    "limit", "union", "having", "as", "natural", "using",
+}
+RANGE_OPERATORS = {">", ">=", "<", "<=", "BETWEEN", "LIKE"}
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+JOIN_PREDICATE = re.compile(r"\b(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)")
+COLUMN_PREDICATE = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\s*(>=|<=|!=|<>|=|>|<|\bBETWEEN\b|\bLIKE\b|\bIN\b)", re.IGNORECASE)
+ORDER_BY = re.compile(r"\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|;|$)", re.IGNORECASE | re.DOTALL)
+
+
+class IndexAdvisor:
+    """
+    Proposes indexes from the SQL the agents actually ran.
+
+    Queries are read from agent_judgements.queries_executed, grouped by fingerprint
+    (literals stripped) and run through EXPLAIN QUERY PLAN. For every full table scan
+    or temporary B-tree, a candidate index is derived from the query's equality,
+    range and ORDER BY columns (plus selected columns when the result is a covering
+    index). Each candidate is created inside a rolled-back transaction and kept only
+    if it changes the plan. Applied indexes go through DatabaseManager.apply_migration.
+    """
+
+    def __init__(self, db_manager, max_queries: int = 200, timing_runs: int = 5, min_executions: int = 5):
+        self.db = db_manager
+        self.max_queries = max_queries
+        self.timing_runs = timing_runs
+        # An index must fix queries executed at least this many times (in total) to be proposed.
+        self.min_executions = min_executions
+        self.columns = {table: set(cols) for table, cols in db_manager.schema_info.items()}
+
+    def collect_queries(self) -> List[Dict[str, Any]]:
+        """Distinct logged queries by fingerprint, most frequent first, with one sample each."""
+        rows = self.db.execute_query(
+            "SELECT queries_executed FROM agent_judgements WHERE queries_executed IS NOT NULL AND queries_executed != '[]'"
+        )
+        seen: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            try:
+                queries = json.loads(row["queries_executed"])
+            except (TypeError, ValueError):
+                continue
+            for sql in queries if isinstance(queries, list) else []:
+                if not isinstance(sql, str) or not sql.strip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                fingerprint = self.fingerprint(sql)
+                entry = seen.setdefault(fingerprint, {"fingerprint": fingerprint, "sample": sql.strip(), "count": 0})
+                entry["count"] += 1
+        return sorted(seen.values(), key=lambda q: -q["count"])[: self.max_queries]
+
+    @staticmethod
+    def fingerprint(sql: str) -> str:
+        sql = STRING_LITERAL.sub("?", sql)
+        sql = NUMBER_LITERAL.sub("?", sql)
+        return " ".join(sql.replace(";", " ").split())
+
+    def explain(self, sql: str, conn=None) -> List[str]:
+        if conn is None:
+            with self.db.get_read_connection() as read_conn:
+                return self.explain(sql, read_conn)
+        return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+
+    @staticmethod
+    def plan_issues(plan: List[str]) -> List[str]:
+        issues = []
+        for detail in plan:
+            if detail.startswith("SCAN ") and " USING " not in detail:
+                issues.append(detail)
+            elif "USE TEMP B-TREE" in detail:
+                issues.append(detail)
+        return issues
+
+    @staticmethod
+    def _scanned_tables(issues: List[str]) -> List[str]:
+        return [issue.split()[1] for issue in issues if issue.startswith("SCAN ")]
+
+    def advise(self) -> Dict[str, Any]:
+        """Analyze the logged queries and return findings plus plan-verified index proposals."""
+        queries = self.collect_queries()
+        findings: List[Dict[str, Any]] = []
+        # Keyed by (table, key columns); covering columns are merged across the queries sharing a key.
+        candidates: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+        errors = 0
+
+        for table, columns in BASELINE_INDEXES:
+            candidates[(table, columns)] = {"reasons": {"baseline investigation access path"}, "queries": [], "covering": set()}
+
+        for query in queries:
+            try:
+                plan = self.explain(query["sample"])
+            except Exception as e:
+                errors += 1
+                findings.append({**query, "error": str(e)})
+                continue
+            issues = self.plan_issues(plan)
+            if not issues:
+                continue
+            finding = {**query, "plan": plan, "issues": issues}
+            findings.append(finding)
+            aliases = self._aliases(query["sample"])
+            scanned = {aliases.get(name, name) for name in self._scanned_tables(issues)}
+            sorts = any("TEMP B-TREE" in issue for issue in issues)
+            for table, key, covering in self._candidates_for(query["sample"]):
+                if table in scanned or sorts:
+                    entry = candidates.setdefault((table, key), {"reasons": set(), "queries": [], "covering": set()})
+                    entry["reasons"].update(issues)
+                    entry["queries"].append(finding)
+                    if entry["covering"] is not None:
+                        entry["covering"] = None if covering is None else entry["covering"] | covering
+
+        proposals = self._select(self._verify(self._merge_prefixes(candidates)))
+        return {
+            "queries_analyzed": len(queries),
+            "queries_with_issues": sum(1 for f in findings if "issues" in f),
+            "unexplainable_queries": errors,
+            "findings": findings,
+            "proposals": proposals,
+        }
+
+    def apply(self, advice: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create the proposed indexes through managed migrations and report per-query latency before/after."""
+        advice = advice or self.advise()
+        timed: Dict[str, str] = {}
+        for proposal in advice["proposals"]:
+            for sample in proposal["sample_queries"]:
+                timed[self.fingerprint(sample)] = sample
+        before = {fp: self.time_query(sql) for fp, sql in timed.items()}
+
+        applied = []
+        for proposal in advice["proposals"]:
+            if self.db.apply_migration(f"index:{proposal['name']}", [proposal["sql"]]):
+                applied.append(proposal["name"])
+        if applied:
+            with self.db.get_connection() as conn:
+                conn.execute("ANALYZE")
+                conn.commit()
+
+        after = {fp: self.time_query(sql) for fp, sql in timed.items()}
+        latency = [
+            {"query": timed[fp], "before_ms": before[fp], "after_ms": after[fp],
+             "speedup": round(before[fp] / after[fp], 2) if after[fp] else None}
+            for fp in timed
+        ]
+        print(f"[IndexAdvisor] Applied {len(applied)} indexes; timed {len(latency)} queries.")
+        return {"applied": applied, "proposals": advice["proposals"], "latency": latency}
+
+    def time_query(self, sql: str) -> Optional[float]:
+        """Median wall time in ms over timing_runs executions (None if the query fails)."""
+        samples = []
+        with self.db.get_read_connection() as conn:
+            for _ in range(self.timing_runs):
+                started = time.perf_counter()
+                try:
+                    conn.execute(sql).fetchall()
+                except Exception:
+                    return None
+                samples.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(samples), 3)
+
+    # --- candidate generation -------------------------------------------------
+
+    def _candidates_for(self, sql: str) -> List[Tuple[str, Tuple[str, ...], Optional[set]]]:
+        """(table, key columns, other referenced columns or None for SELECT *) per table in the query."""
+        aliases = self._aliases(sql)
+        tables = set(aliases.values())
+        equality: Dict[str, List[str]] = {t: [] for t in tables}
+        joins: Dict[str, List[str]] = {t: [] for t in tables}
+        ranges: Dict[str, List[str]] = {t: [] for t in tables}
+        ordering: Dict[str, List[str]] = {t: [] for t in tables}
+
+        def add(bucket: Dict[str, List[str]], qualifier: Optional[str], column: str) -> None:
+            for table in self._owning_tables(qualifier, column, aliases):
+                if column not in bucket[table]:
+                    bucket[table].append(column)
+
+        # Filters on constants lead the key; join columns follow them.
+        for left_q, left_c, right_q, right_c in JOIN_PREDICATE.findall(sql):
+            add(joins, left_q, left_c)
+            add(joins, right_q, right_c)
+        filters = JOIN_PREDICATE.sub(" ", STRING_LITERAL.sub("?", sql))
+        for qualifier, column, operator in COLUMN_PREDICATE.findall(filters):
+            bucket = ranges if operator.upper() in RANGE_OPERATORS else equality if operator in ("=", "IN", "in") else None
+            if bucket is not None:
+                add(bucket, qualifier or None, column)
+        order = ORDER_BY.search(sql)
+        if order:
+            for term in order.group(1).split(","):
+                parts = term.strip().split()[0].split(".") if term.strip() else []
+                if parts:
+                    add(ordering, parts[0] if len(parts) == 2 else None, parts[-1])
+
+        candidates = []
+        for table in tables:
+            key = equality[table] + [c for c in joins[table] if c not in equality[table]]
+            if key[:1] == [self._primary_key(table)]:
+                continue  # already a primary-key lookup
+            tail = (ranges[table] or ordering[table])[:1]
+            key += [c for c in tail if c not in key]
+            if not key:
+                continue
+            referenced = self._referenced_columns(sql, table, aliases)
+            candidates.append((table, tuple(key), None if referenced is None else referenced - set(key)))
+        return candidates
+
+    @staticmethod
+    def _merge_prefixes(candidates: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]]) -> Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]]:
+        """Fold candidates whose key is a prefix of a wider key on the same table into the wider one."""
+        merged = dict(candidates)
+        for (table, key) in sorted(candidates, key=lambda k: len(k[1])):
+            wider = [k for k in merged if k[0] == table and len(k[1]) > len(key) and k[1][: len(key)] == key]
+            if not wider:
+                continue
+            target = merged[max(wider, key=lambda k: len(merged[k]["queries"]))]
+            source = merged.pop((table, key))
+            target["reasons"] |= source["reasons"]
+            target["queries"] += source["queries"]
+            if target["covering"] is not None:
+                target["covering"] = None if source["covering"] is None else target["covering"] | source["covering"]
+        return merged
+
+    def _aliases(self, sql: str) -> Dict[str, str]:
+        aliases: Dict[str, str] = {}
+        for table, alias in TABLE_REF.findall(sql):
+            if table not in self.columns:
+                continue
+            aliases[table] = table
+            if alias and alias.lower() not in SQL_KEYWORDS:
+                aliases[alias] = table
+        return aliases
+
+    def _owning_tables(self, qualifier: Optional[str], column: str, aliases: Dict[str, str]) -> List[str]:
+        if qualifier:
+            table = aliases.get(qualifier)
+            return [table] if table and column in self.columns[table] else []
+        return [t for t in set(aliases.values()) if column in self.columns[t]]
+
+    def _referenced_columns(self, sql: str, table: str, aliases: Dict[str, str]) -> Optional[set]:
+        """Columns of `table` the query touches, or None if it selects * from it."""
+        names = [a for a, t in aliases.items() if t == table]
+        if re.search(r"SELECT\s+\*", sql, re.IGNORECASE) or any(re.search(rf"\b{n}\.\*", sql) for n in names):
+            return None
+        words = set(re.findall(r"\b\w+\b", STRING_LITERAL.sub("?", sql)))
+        return {c for c in self.columns[table] if c in words}
+
+    def _primary_key(self, table: str) -> Optional[str]:
+        for column, decl in self.db.schema_info.get(table, {}).items():
+            if "PRIMARY KEY" in decl:
+                return column
+        return None
+
+    # --- verification ---------------------------------------------------------
+
+    def _existing_indexes(self, conn) -> Dict[str, List[Tuple[str, ...]]]:
+        existing: Dict[str, List[Tuple[str, ...]]] = {}
+        for table in self.columns:
+            for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+                cols = tuple(r["name"] for r in conn.execute(f"PRAGMA index_info({index['name']})").fetchall())
+                existing.setdefault(table, []).append(cols)
+        return existing
+
+    def _verify(self, candidates: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep candidates that no existing index already serves and that fix at least one logged plan."""
+        proposals: List[Dict[str, Any]] = []
+        with self.db.get_connection() as conn:
+            existing = self._existing_indexes(conn)
+            for (table, key), candidate in candidates.items():
+                if any(index[: len(key)] == key for index in existing.get(table, [])):
+                    continue
+                covering = candidate["covering"]
+                columns = key
+                if covering is not None and 0 < len(covering) and len(key) + len(covering) <= MAX_COVERING_COLUMNS:
+                    columns = key + tuple(sorted(covering))
+                name = f"idx_{table}_{'_'.join(key)}" + ("_cov" if columns != key else "")
+                sql = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+                queries = candidate["queries"]
+                improved = []
+                conn.execute("BEGIN")
+                try:
+                    conn.execute(sql)
+                    for query in queries:
+                        before = query["issues"]
+                        after = self.plan_issues(self.explain(query["sample"], conn))
+                        if len(after) < len(before):
+                            improved.append(query)
+                finally:
+                    conn.rollback()
+                if queries and not improved:
+                    continue
+                proposals.append({
+                    "name": name,
+                    "table": table,
+                    "columns": list(columns),
+                    "sql": sql,
+                    "covering": columns != key,
+                    "reason": "; ".join(sorted(candidate["reasons"])),
+                    "baseline": not queries,
+                    "improved": improved,
+                })
+        return proposals
+
+    def _select(self, proposals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Greedy cover: repeatedly take the index that fixes the most not-yet-fixed query
+        executions, so one well-chosen index replaces many single-query variants.
+        """
+        chosen = [p for p in proposals if p["baseline"]]
+        fixed = {q["fingerprint"] for p in chosen for q in p["improved"]}
+        per_table: Dict[str, int] = {}
+        for p in chosen:
+            per_table[p["table"]] = per_table.get(p["table"], 0) + 1
+        remaining = [p for p in proposals if not p["baseline"]]
+        while remaining:
+            gain = lambda p: sum(q["count"] for q in p["improved"] if q["fingerprint"] not in fixed)
+            best = max(remaining, key=gain)
+            if gain(best) < self.min_executions:
+                break
+            remaining.remove(best)
+            if per_table.get(best["table"], 0) >= MAX_INDEXES_PER_TABLE:
+                continue
+            per_table[best["table"]] = per_table.get(best["table"], 0) + 1
+            fixed |= {q["fingerprint"] for q in best["improved"]}
+            chosen.append(best)
+
+        for p in chosen:
+            improved = p.pop("improved")
+            p.pop("baseline")
+            p["queries_improved"] = len(improved)
+            p["executions_improved"] = sum(q["count"] for q in improved)
+            p["sample_queries"] = [q["sample"] for q in improved[:5]]
+        return chosen
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.data.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Propose (and optionally apply) indexes for logged investigation queries.")
+    parser.add_argument("--db", default="data/alerts.db")
+    parser.add_argument("--apply", action="store_true", help="create the proposed indexes and report latency")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(DatabaseManager(args.db))
+    advice = advisor.advise()
+    result = advisor.apply(advice) if args.apply else advice
+    print(json.dumps({k: v for k, v in result.items() if k != "findings"}, indent=2))
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal, Union
 from enum import Enum
 
 class TransactionType(str, Enum):
@@ -25,4 +25,45 @@ class OutcomeType(str, Enum):
     UNDER_INVESTIGATION = "under_investigation"
     AUTO_CLOSED = "auto_closed"
 
+# --- Structured LLM outputs (sent to the model as JSON schemas and validated on return) ---
+
+class EvidenceItem(BaseModel):
+    name: str
+    value: Union[float, str, None]
+
+class PatternAnalysis(BaseModel):
+    patterns: List[str]
+    risk_indicators: List[str]
+    confidence: float = Field(ge=0.0, le=1.0)
+    evidence: List[EvidenceItem] = Field(description="Supporting details such as historical counts or percentages, one name/value pair each")
+
+    @field_validator("evidence", mode="before")
+    @classmethod
+    def _evidence_from_mapping(cls, value: Any) -> Any:
+        # Accept the {"name": value} shape older prompts asked for.
+        if isinstance(value, dict):
+            return [{"name": str(k), "value": v if isinstance(v, (int, float, str)) or v is None else str(v)}
+                    for k, v in value.items()]
+        return value
+
+    def to_analysis(self) -> Dict[str, Any]:
+        """Plain-dict form used in agent outputs, with evidence as a name -> value mapping."""
+        data = self.model_dump()
+        data["evidence"] = {item.name: item.value for item in self.evidence}
+        return data
+
+class PatternVerdict(PatternAnalysis):
+    alert_id: str
+
+class BatchPatternAnalysis(BaseModel):
+    verdicts: List[PatternVerdict]
+
+class StructuredRationale(BaseModel):
+    key_points: List[str]
+    risk_level: Literal["LOW", "MEDIUM", "HIGH"]
+    recommendation: Literal["CLOSE", "ESCALATE", "INVESTIGATE_FURTHER"]
+    confidence_factors: List[str]
+    investigation_summary: str
+    confidence: float = Field(ge=0.0, le=1.0)
+
 # Note: The WorkflowState class is now removed from this file.
\ No newline at end of file
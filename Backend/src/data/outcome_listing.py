@@ -0,0 +1,162 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.data.blob_codec import decode_json
+
+# Columns the list view may ask for; agent_outputs is a (compressed) blob and only
+# returned when explicitly requested.
+LIST_COLUMNS = {
+    "outcome_id": "o.outcome_id",
+    "alert_id": "o.alert_id",
+    "final_outcome": "o.final_outcome",
+    "is_suspicious": "o.is_suspicious",
+    "confidence_score": "o.confidence_score",
+    "investigation_summary": "o.investigation_summary",
+    "human_verified": "o.human_verified",
+    "timestamp": "o.timestamp",
+    "alert_type": "a.alert_type",
+}
+BLOB_COLUMNS = {"agent_outputs": "o.agent_outputs"}
+DEFAULT_COLUMNS = list(LIST_COLUMNS)
+
+MAX_PAGE_SIZE = 200
+# The total is counted up to this many rows; beyond it the hint is reported as a lower bound.
+COUNT_HINT_CAP = 10000
+
+# Keyset order (timestamp DESC, outcome_id DESC) and the human_verified tabs of the table
+# view are both served straight from an index, so a page costs O(page size).
+LIST_INDEX_MIGRATION = ("outcomes_keyset_v1", [
+    "CREATE INDEX IF NOT EXISTS idx_outcomes_ts_id ON investigation_outcomes (timestamp, outcome_id)",
+    "CREATE INDEX IF NOT EXISTS idx_outcomes_verified_ts_id ON investigation_outcomes (human_verified, timestamp, outcome_id)",
+])
+
+
+def encode_cursor(timestamp: str, outcome_id: str) -> str:
+    raw = json.dumps([timestamp, outcome_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor. Raises ValueError on anything that is not one of our cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, outcome_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(timestamp, str) or not isinstance(outcome_id, str):
+        raise ValueError("Invalid cursor.")
+    return timestamp, outcome_id
+
+def _bound(value: Optional[str], end_of_range: bool) -> Optional[str]:
+    """
+    Normalize a date or datetime filter to the stored isoformat text. A bare end date
+    is inclusive, so it becomes the start of the following day (used with '<').
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            return (day + timedelta(days=1) if end_of_range else day).isoformat()
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}")
+
+def _columns(fields: Optional[List[str]]) -> List[str]:
+    if not fields:
+        return DEFAULT_COLUMNS
+    unknown = [f for f in fields if f not in LIST_COLUMNS and f not in BLOB_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # The keyset columns are always needed to build the next cursor.
+    return list(dict.fromkeys(["outcome_id", "timestamp", *fields]))
+
+def list_investigation_outcomes(
+    db,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    outcome: Optional[str] = None,
+    is_suspicious: Optional[bool] = None,
+    human_verified: Optional[bool] = None,
+    alert_type: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    One page of investigation outcomes, newest first, using keyset pagination on
+    (timestamp, outcome_id). Returns items, the cursor of the next page (None on the
+    last page) and, for the first page only, a capped total-count hint.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    columns = _columns(fields)
+
+    where, params = [], []
+    if outcome:
+        where.append("o.final_outcome = ?")
+        params.append(outcome)
+    if is_suspicious is not None:
+        where.append("o.is_suspicious = ?")
+        params.append(int(is_suspicious))
+    if human_verified is not None:
+        # Legacy rows may carry NULL for "not verified".
+        where.append("o.human_verified = 1" if human_verified else "COALESCE(o.human_verified, 0) = 0")
+    if alert_type:
+        where.append("a.alert_type = ?")
+        params.append(alert_type)
+    start_ts, end_ts = _bound(start, False), _bound(end, True)
+    if start_ts:
+        where.append("o.timestamp >= ?")
+        params.append(start_ts)
+    if end_ts:
+        where.append("o.timestamp < ?")
+        params.append(end_ts)
+
+    filter_sql = " AND ".join(where)
+    page_where = list(where)
+    page_params = list(params)
+    if cursor:
+        page_where.append("(o.timestamp, o.outcome_id) < (?, ?)")
+        page_params.extend(decode_cursor(cursor))
+
+    select_list = ", ".join(f"{LIST_COLUMNS.get(c) or BLOB_COLUMNS[c]} AS {c}" for c in columns)
+    query = f"""
+        SELECT {select_list}
+        FROM investigation_outcomes o
+        LEFT JOIN alerts a ON a.alert_id = o.alert_id
+        {"WHERE " + " AND ".join(page_where) if page_where else ""}
+        ORDER BY o.timestamp DESC, o.outcome_id DESC
+        LIMIT ?
+    """
+    # Fetch one extra row to know whether another page exists.
+    rows = db.execute_query(query, tuple(page_params) + (limit + 1,))
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    for item in items:
+        if "agent_outputs" in item:
+            item["agent_outputs"] = decode_json(item["agent_outputs"], {})
+
+    page: Dict[str, Any] = {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1]["timestamp"], items[-1]["outcome_id"]) if has_more else None,
+        "limit": limit,
+    }
+    if not cursor:
+        page["total_hint"] = _count_hint(db, filter_sql, tuple(params), join_alerts=bool(alert_type))
+    return page
+
+def _count_hint(db, filter_sql: str, params: tuple, join_alerts: bool) -> Dict[str, Any]:
+    join = "JOIN alerts a ON a.alert_id = o.alert_id" if join_alerts else ""
+    rows = db.execute_query(
+        f"""
+        SELECT COUNT(*) AS n FROM (
+            SELECT 1 FROM investigation_outcomes o {join}
+            {"WHERE " + filter_sql if filter_sql else ""}
+            LIMIT ?
+        )
+        """,
+        params + (COUNT_HINT_CAP + 1,),
+    )
+    n = rows[0]["n"] if rows else 0
+    return {"count": min(n, COUNT_HINT_CAP), "exact": n <= COUNT_HINT_CAP}
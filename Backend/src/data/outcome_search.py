@@ -0,0 +1,162 @@
+# src/data/outcome_search.py
+
+import re
+from typing import Dict, Any, List, Iterable
+
+from src.data.blob_codec import decode_json
+
+# Full-text index over what an analyst would search for: the outcome summary, the
+# ExplanationAgent narrative and the risk factors / key points. Its rowid is the rowid
+# of the investigation_outcomes row, so re-indexing an outcome replaces its document.
+# It is maintained from Python because agent_outputs is stored compressed.
+CREATE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS outcomes_fts USING fts5(
+    summary, explanation, risk_factors,
+    tokenize = 'porter unicode61'
+)
+"""
+MIGRATION = ("outcomes_fts_v1", [CREATE_FTS])
+
+# bm25 column weights: a match in the risk factors says more than one in the narrative.
+BM25_WEIGHTS = (1.0, 0.75, 2.0)
+MAX_PAGE_SIZE = 100
+MAX_OFFSET = 1000
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v]
+    return [str(value)] if value else []
+
+def build_document(summary: str, agent_outputs: Dict[str, Any]) -> Dict[str, str]:
+    """The searchable text of one outcome."""
+    outputs = agent_outputs if isinstance(agent_outputs, dict) else {}
+    explanation_output = outputs.get("ExplanationAgent") or {}
+    explanation = explanation_output.get("explanation") or ""
+    rationale = explanation_output.get("rationale") or {}
+
+    factors: List[str] = []
+    for agent in ("RiskAssessmentAgent", "PatternRecognitionAgent", "PrecedentAgent"):
+        factors += _as_list((outputs.get(agent) or {}).get("risk_factors"))
+    factors += _as_list((outputs.get("RiskAssessmentAgent") or {}).get("key_indicators"))
+    if isinstance(rationale, dict):
+        factors += _as_list(rationale.get("key_points"))
+    return {
+        "summary": summary or "",
+        "explanation": explanation if isinstance(explanation, str) else str(explanation),
+        "risk_factors": "\n".join(dict.fromkeys(factors)),
+    }
+
+def index_outcomes(conn, alert_ids: Iterable[str]) -> None:
+    """
+    (Re)index the outcomes of these alerts from their stored rows. Runs on the caller's
+    connection so the index changes commit atomically with the outcome write.
+    """
+    alert_ids = list(dict.fromkeys(alert_ids))
+    if not alert_ids:
+        return
+    rows = conn.execute(
+        f"SELECT rowid, investigation_summary, agent_outputs FROM investigation_outcomes "
+        f"WHERE alert_id IN ({', '.join('?' for _ in alert_ids)})",
+        alert_ids,
+    ).fetchall()
+    documents = []
+    for rowid, summary, agent_outputs in rows:
+        doc = build_document(summary, decode_json(agent_outputs, {}))
+        documents.append((rowid, doc["summary"], doc["explanation"], doc["risk_factors"]))
+    conn.executemany("DELETE FROM outcomes_fts WHERE rowid = ?", [(d[0],) for d in documents])
+    conn.executemany(
+        "INSERT INTO outcomes_fts (rowid, summary, explanation, risk_factors) VALUES (?, ?, ?, ?)", documents
+    )
+
+def rebuild(db, batch_size: int = 500) -> int:
+    """Re-create every document from investigation_outcomes (backfill / repair). Returns rows indexed."""
+    total = 0
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM outcomes_fts")
+        last_rowid = -1
+        while True:
+            batch = conn.execute(
+                "SELECT rowid, alert_id FROM investigation_outcomes WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, batch_size),
+            ).fetchall()
+            if not batch:
+                break
+            index_outcomes(conn, [alert_id for _, alert_id in batch])
+            last_rowid = batch[-1][0]
+            total += len(batch)
+        conn.execute("INSERT INTO outcomes_fts (outcomes_fts) VALUES ('optimize')")
+        conn.commit()
+    print(f"[OutcomeSearch] Indexed {total} investigation outcomes.")
+    return total
+
+def to_match_query(text: str) -> str:
+    """
+    Free text -> FTS5 query: every word must match (as a quoted token, so punctuation
+    and FTS operators in user input cannot break the query); the last word also
+    matches as a prefix so results appear while typing.
+    """
+    tokens = TOKEN.findall(text or "")
+    if not tokens:
+        return ""
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search(db, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Ranked (bm25) page of matching outcomes with highlighted snippets."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    offset = max(0, min(int(offset), MAX_OFFSET))
+    match = to_match_query(query)
+    if not match:
+        return {"query": query, "items": [], "limit": limit, "offset": offset, "next_offset": None}
+
+    rows = db.execute_query(
+        f"""
+        SELECT o.outcome_id, o.alert_id, o.final_outcome, o.is_suspicious, o.confidence_score,
+               o.human_verified, o.timestamp,
+               bm25(outcomes_fts, {', '.join(str(w) for w in BM25_WEIGHTS)}) AS rank,
+               snippet(outcomes_fts, 0, '<mark>', '</mark>', '…', 16) AS summary_snippet,
+               snippet(outcomes_fts, 1, '<mark>', '</mark>', '…', 24) AS explanation_snippet,
+               snippet(outcomes_fts, 2, '<mark>', '</mark>', '…', 12) AS risk_factors_snippet
+        FROM outcomes_fts
+        JOIN investigation_outcomes o ON o.rowid = outcomes_fts.rowid
+        WHERE outcomes_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit + 1, offset),
+    )
+    has_more = len(rows) > limit and offset + limit <= MAX_OFFSET
+    items = rows[:limit]
+    for item in items:
+        snippets = {column: item.pop(f"{column}_snippet") for column in ("summary", "explanation", "risk_factors")}
+        # Only keep snippets of columns that actually contain a hit.
+        item["snippets"] = {column: text for column, text in snippets.items() if text and "<mark>" in text}
+    return {
+        "query": query,
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if has_more else None,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from src.data.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Rebuild or query the outcomes full-text index.")
+    parser.add_argument("--db", default="data/alerts.db")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("query", nargs="?")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    if args.rebuild:
+        rebuild(db)
+    if args.query:
+        print(json.dumps(search(db, args.query), indent=2, default=str))
+    db.close()
@@ -1,23 +1,43 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
+import asyncio
 import json
+from src.data.query_plans import PLAN_PARAMETERS, QueryPlanLibrary, alert_parameters, plan_key
+from src.data.query_templates import BoundQuery, bind
+from src.utils.prompt_templates import prompt_registry
 
 class IntelligentQueryGenerator:
-    def __init__(self, schema_info: Dict[str, Dict[str, str]], llm_helper):
+    def __init__(self, schema_info: Dict[str, Dict[str, str]], llm_helper,
+                 plan_library: Optional[QueryPlanLibrary] = None):
         self.schema_info = schema_info
         self.llm_helper = llm_helper
+        # With a plan library, contextual queries are generated once per situation and reused.
+        self.plan_library = plan_library
+        self._pending_plans: Dict[str, "asyncio.Task"] = {}
+        # The schema never changes at runtime, so it is rendered once into the static prompt prefix.
+        self.schema_prompt = self._build_schema_prompt()
+        prompt_registry.register(
+            "contextual_queries",
+            prefix=f"""
+You are an expert SQL analyst for banking fraud investigation. Based on the database schema below and the alert context that follows it, generate 3-5 targeted SQL queries that will help investigate this alert effectively.
 
-    async def generate_contextual_queries(self, alert_context: Dict[str, Any],
-                                        investigation_goal: str,
-                                        previous_context: Optional[Dict[str, Any]] = None) -> List[str]:
-        """Generate intelligent queries based on alert context and investigation needs.""" 
-        schema_prompt = self._build_schema_prompt()
-        context_prompt = self._build_context_prompt(alert_context, investigation_goal, previous_context)
-        prompt = f"""
-You are an expert SQL analyst for banking fraud investigation. Based on the database schema below and the current alert context, generate 3-5 targeted SQL queries that will help investigate this alert effectively.
+{self.schema_prompt}
 
-{schema_prompt}
+Focus on:
+1. Pattern detection queries
+2. Historical behavior analysis
+3. Cross-reference queries for anomalies
+4. Risk factor identification
+
+Return ONLY valid SQL queries, one per line, without explanations or markdown.
+""",
+            suffix="{context_prompt}",
+        )
+        prompt_registry.register(
+            "contextual_query_plan",
+            prefix=f"""
+You are an expert SQL analyst for banking fraud investigation. Based on the database schema below and the alert situation that follows it, write 3-5 reusable SQL queries that will help investigate alerts of this kind effectively.
 
-{context_prompt}
+{self.schema_prompt}
 
 Focus on:
 1. Pattern detection queries
@@ -25,9 +45,60 @@ Focus on:
 3. Cross-reference queries for anomalies
 4. Risk factor identification
 
+The queries are stored and re-run for every alert in the same situation, so never write the alert's values into the SQL.
+Refer to them only through these named parameters: {', '.join(':' + name for name in PLAN_PARAMETERS)}.
+For time windows compare the indexed *_epoch columns (unix seconds) with :alert_epoch, e.g. timestamp_epoch BETWEEN :alert_epoch - 86400 AND :alert_epoch.
+
 Return ONLY valid SQL queries, one per line, without explanations or markdown.
-        """ 
-        response = await self.llm_helper.generate_response(prompt)
+""",
+            suffix="{context_prompt}",
+        )
+
+    async def generate_contextual_queries(self, alert_context: Dict[str, Any],
+                                        investigation_goal: str,
+                                        previous_context: Optional[Dict[str, Any]] = None,
+                                        loop_depth: int = 0) -> List[Union[str, BoundQuery]]:
+        """Generate intelligent queries based on alert context and investigation needs.""" 
+        if self.plan_library is not None:
+            return await self._planned_queries(alert_context, investigation_goal, previous_context, loop_depth)
+        context_prompt = self._build_context_prompt(alert_context, investigation_goal, previous_context)
+        prompt = prompt_registry.render("contextual_queries", context_prompt=context_prompt)
+        response = await self.llm_helper.generate_response(prompt, usage_key="contextual_queries")
+        return self._parse_queries(response)
+
+    async def _planned_queries(self, alert_context: Dict[str, Any], investigation_goal: str,
+                               previous_context: Optional[Dict[str, Any]], loop_depth: int) -> List[BoundQuery]:
+        """The stored plan for this (alert type, goal, loop depth), asking the LLM only if there is none."""
+        alert_type = alert_context.get('alert_type', '')
+        key = plan_key(alert_type, investigation_goal, loop_depth)
+        plan = self.plan_library.get(key)
+        if plan is None:
+            # Alerts that arrive together in the same situation share one LLM call.
+            task = self._pending_plans.get(key)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self._create_plan(key, alert_context, investigation_goal, previous_context, loop_depth)
+                )
+                self._pending_plans[key] = task
+                task.add_done_callback(lambda _: self._pending_plans.pop(key, None))
+            plan = await task
+        return self.plan_library.bind(key, plan, alert_context)
+
+    async def _create_plan(self, key: str, alert_context: Dict[str, Any], investigation_goal: str,
+                           previous_context: Optional[Dict[str, Any]], loop_depth: int) -> List[str]:
+        prompt = prompt_registry.render(
+            "contextual_query_plan",
+            context_prompt=self._build_plan_prompt(alert_context, investigation_goal, previous_context, loop_depth),
+        )
+        response = await self.llm_helper.generate_response(prompt, usage_key="contextual_query_plan")
+        # Validation compiles every query, so it runs on a DB worker rather than the event loop.
+        return await self.plan_library.db.aio.run(
+            self.plan_library.store, key, alert_context.get('alert_type', ''), investigation_goal, loop_depth,
+            self._parse_queries(response),
+        )
+
+    @staticmethod
+    def _parse_queries(response: str) -> List[str]:
         queries = [q.strip() for q in response.split('\n') if q.strip() and q.strip().upper().startswith('SELECT')]
         return queries[:5]
 
@@ -62,33 +133,35 @@ INVESTIGATION GOAL: {investigation_goal}
             prompt += "Build upon these findings with more targeted queries.\n"
         return prompt
 
+    def _build_plan_prompt(self, alert_context: Dict[str, Any], investigation_goal: str,
+                           previous_context: Optional[Dict[str, Any]], loop_depth: int) -> str:
+        """Situation prompt for a reusable plan: the parameters are described, not inlined."""
+        examples = "\n".join(f":{name} (e.g. {value!r})" for name, value in alert_parameters(alert_context).items())
+        prompt = f"""
+ALERT SITUATION:
+Alert Type: {alert_context.get('alert_type')}
+Investigation Loop: {loop_depth}
+
+INVESTIGATION GOAL: {investigation_goal}
+
+AVAILABLE PARAMETERS (values shown are from one example alert):
+{examples}
+"""
+        if previous_context and loop_depth > 0:
+            prompt += "\nThis is a follow-up loop; earlier queries were inconclusive, so look further back and wider.\n"
+        return prompt
+
     def generate_specific_queries(self, alert_type: str, user_id: str,
                                 transaction_id: Optional[str] = None,
-                                account_id: Optional[str] = None) -> List[str]:
-        """Generate pre-built queries for specific alert types based on the schema.""" 
-        base_queries = {
-            "HighValue": [
-                f"SELECT AVG(amount) as avg_amount, MAX(amount) as max_amount, COUNT(*) as txn_count FROM transactions WHERE user_id = '{user_id}' AND timestamp > date('now', '-90 days')",
-                f"SELECT * FROM transactions WHERE user_id = '{user_id}' AND amount > 100000"
-            ],
-            "Velocity": [
-                f"SELECT COUNT(*) as txn_count, SUM(amount) as total_amount FROM transactions WHERE user_id = '{user_id}' AND timestamp > datetime('now', '-1 hour')",
-                f"SELECT COUNT(DISTINCT payee_id) as unique_payees FROM transactions WHERE user_id = '{user_id}' AND timestamp > datetime('now', '-1 hour')"
-            ],
-            "NewPayee": [
-                f"SELECT t.*, up.date_added_by_user FROM transactions t JOIN user_payees up ON t.payee_id = up.payee_id WHERE t.user_id = '{user_id}' AND datetime(up.date_added_by_user) >= datetime('now', '-48 hours')"
-            ],
-            "FailedLoginTransfer": [
-                f"SELECT COUNT(*) as failed_count FROM login_attempts WHERE user_id = '{user_id}' AND status = 'failed' AND timestamp > datetime('now', '-24 hours')"
-            ],
-            "Structuring": [
-                f"SELECT * FROM transactions WHERE user_id = '{user_id}' AND amount % 10000 = 0 AND timestamp > datetime('now', '-7 days')"
-            ],
-            "GeoMismatch": [
-                f"SELECT DISTINCT location FROM transactions WHERE user_id = '{user_id}' AND timestamp > datetime('now', '-30 days')"
-            ],
-            "CrossChannel": [
-                f"SELECT DISTINCT transaction_type FROM transactions WHERE user_id = '{user_id}' AND timestamp > datetime('now', '-1 hour')"
-            ]
+                                account_id: Optional[str] = None) -> List[BoundQuery]:
+        """Pre-built catalogue queries for specific alert types, bound to this alert's user."""
+        templates = {
+            "HighValue": ["high_value_stats_90d", "high_value_transactions"],
+            "Velocity": ["velocity_totals_1h", "velocity_payees_1h"],
+            "NewPayee": ["new_payee_transactions_48h"],
+            "FailedLoginTransfer": ["failed_logins_24h"],
+            "Structuring": ["round_amounts_7d"],
+            "GeoMismatch": ["locations_30d"],
+            "CrossChannel": ["channels_1h"],
         }
-        return base_queries.get(alert_type, [])
\ No newline at end of file
+        return [bind(name, user_id) for name in templates.get(alert_type, [])]
@@ -0,0 +1,180 @@
+# src/data/query_plans.py
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.data.query_sandbox import LITERAL_OR_COMMENT, QueryRejected
+from src.data.query_templates import BoundQuery, NAMED_PARAMETER
+
+# LLM-written investigation queries, stored once per (alert type, goal, loop depth)
+# with :name placeholders instead of the alert's values, and bound to every later
+# alert in the same situation.
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS query_plans (
+    plan_key TEXT PRIMARY KEY,
+    alert_type TEXT NOT NULL,
+    investigation_goal TEXT NOT NULL,
+    loop_depth INTEGER NOT NULL,
+    queries_json TEXT NOT NULL,
+    created_at TEXT NOT NULL
+)
+"""
+MIGRATION = ("query_plans_v1", [CREATE_TABLE])
+
+# Placeholders a plan may use, and where their values come from in the alert context.
+PLAN_PARAMETERS = {
+    "user_id": "user_id",
+    "account_id": "account_id",
+    "transaction_id": "transaction_id",
+    "alert_timestamp": "timestamp",
+    "alert_epoch": "timestamp_epoch",
+    "amount": "amount",
+    "location": "location",
+    "payee_id": "payee_id",
+    "device_id": "device_id",
+}
+# An id compared to a quoted literal means the query is tied to one alert.
+HARD_CODED_ID = re.compile(r"\b(user_id|account_id|transaction_id|payee_id|device_id|alert_id)\s*(=|IN\s*\()\s*'",
+                           re.IGNORECASE)
+
+
+def plan_key(alert_type: str, investigation_goal: str, loop_depth: int) -> str:
+    raw = json.dumps([alert_type or "", investigation_goal or "", int(loop_depth)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def alert_parameters(alert_context: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: alert_context.get(source) for name, source in PLAN_PARAMETERS.items()}
+
+def placeholders(sql: str) -> List[str]:
+    """:name placeholders outside string literals and comments, in order of appearance."""
+    code = LITERAL_OR_COMMENT.sub(" ", sql)
+    return list(dict.fromkeys(NAMED_PARAMETER.findall(code)))
+
+class QueryPlanLibrary:
+    """
+    Stored, validated query plans for the contextual investigation queries.
+
+    A plan is validated once, when the LLM produces it: each query must be a single
+    SELECT that uses only the known placeholders, hard-codes no ids, compiles against
+    the current schema and passes the sandbox plan check. Queries that fail are dropped;
+    a plan with no valid query is not stored, so the situation is asked again next
+    time. Plans are loaded from the database once and then served from memory.
+    """
+
+    def __init__(self, db_manager, sandbox):
+        self.db = db_manager
+        self.sandbox = sandbox
+        self._plans: Optional[Dict[str, List[str]]] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "queries_rejected": 0}
+        self._load()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        plans = self._load()
+        plan = plans.get(key)
+        self.stats["hits" if plan else "misses"] += 1
+        return plan
+
+    def validate(self, queries: List[str]) -> Tuple[List[str], List[Dict[str, str]]]:
+        valid, rejected = [], []
+        for sql in queries:
+            try:
+                names = placeholders(sql)
+                unknown = [n for n in names if n not in PLAN_PARAMETERS]
+                if unknown:
+                    raise QueryRejected(f"unknown placeholders: {', '.join(unknown)}")
+                if "?" in LITERAL_OR_COMMENT.sub(" ", sql):
+                    raise QueryRejected("positional ? parameters are not allowed; use :name placeholders")
+                if HARD_CODED_ID.search(sql):
+                    raise QueryRejected("query hard-codes an id instead of using a placeholder")
+                self.sandbox.check_plan(sql, {n: None for n in names})
+            except (QueryRejected, sqlite3.Error) as e:
+                rejected.append({"sql": sql, "reason": str(e)})
+                continue
+            valid.append(sql)
+        self.stats["queries_rejected"] += len(rejected)
+        return valid, rejected
+
+    def store(self, key: str, alert_type: str, investigation_goal: str, loop_depth: int,
+              queries: List[str]) -> List[str]:
+        """Validate and persist a plan; returns the queries kept."""
+        valid, rejected = self.validate(queries)
+        for r in rejected:
+            print(f"[QueryPlanLibrary] Dropped query from plan {key}: {r['reason']}")
+        if not valid:
+            return []
+        with self.db.get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_plans (plan_key, alert_type, investigation_goal, loop_depth, "
+                "queries_json, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, alert_type or "", investigation_goal or "", int(loop_depth), json.dumps(valid),
+                 datetime.now().isoformat()),
+            )
+            conn.commit()
+        with self._lock:
+            self._load()[key] = valid
+        self.stats["stored"] += 1
+        print(f"[QueryPlanLibrary] Stored plan {key} for {alert_type} (loop {loop_depth}) with {len(valid)} queries.")
+        return valid
+
+    @staticmethod
+    def bind(key: str, plan: List[str], alert_context: Dict[str, Any]) -> List[BoundQuery]:
+        values = alert_parameters(alert_context)
+        return [
+            BoundQuery(f"plan:{key}:{i}", sql, {name: values[name] for name in placeholders(sql)})
+            for i, sql in enumerate(plan)
+        ]
+
+    def forget(self, key: Optional[str] = None) -> int:
+        """Drop one plan (or all), so the next matching alert asks the LLM again."""
+        with self.db.get_connection() as conn:
+            if key is None:
+                removed = conn.execute("DELETE FROM query_plans").rowcount
+            else:
+                removed = conn.execute("DELETE FROM query_plans WHERE plan_key = ?", (key,)).rowcount
+            conn.commit()
+        with self._lock:
+            self._plans = None
+        return removed
+
+    def list_plans(self) -> List[Dict[str, Any]]:
+        rows = self.db.execute_query(
+            "SELECT plan_key, alert_type, investigation_goal, loop_depth, queries_json, created_at "
+            "FROM query_plans ORDER BY alert_type, loop_depth"
+        )
+        for row in rows:
+            row["queries"] = json.loads(row.pop("queries_json"))
+        return rows
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.stats, "plans": len(self._load())}
+
+    def _load(self) -> Dict[str, List[str]]:
+        if self._plans is None:
+            rows = self.db.execute_query("SELECT plan_key, queries_json FROM query_plans")
+            self._plans = {r["plan_key"]: json.loads(r["queries_json"]) for r in rows}
+        return self._plans
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.data.database import DatabaseManager
+    from src.data.query_sandbox import QuerySandbox
+
+    parser = argparse.ArgumentParser(description="List or clear the stored contextual query plans.")
+    parser.add_argument("--db", default="data/alerts.db")
+    parser.add_argument("--forget", metavar="PLAN_KEY", help="drop one plan ('all' drops every plan)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    library = QueryPlanLibrary(db, QuerySandbox(db))
+    if args.forget:
+        print(f"Removed {library.forget(None if args.forget == 'all' else args.forget)} plans.")
+    else:
+        print(json.dumps(library.list_plans(), indent=2))
+    db.close()
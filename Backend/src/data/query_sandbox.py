@@ -0,0 +1,190 @@
+# src/data/query_sandbox.py
+
+import json
+import re
+import sqlite3
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
+
+# Tables that grow with activity; a full scan of one of these is what the sandbox guards against.
+# Reference tables (users, accounts, devices, payees, ...) are small and may be scanned freely.
+LARGE_TABLES = {"transactions", "login_attempts", "alerts", "agent_judgements",
+                "investigation_outcomes", "full_investigation_results"}
+
+DEFAULT_SANDBOX_SETTINGS = {
+    'max_rows': 1000,           # rows returned per query
+    'max_bytes': 512 * 1024,    # serialized size of the rows returned per query
+    'timeout_ms': 2000,         # wall-clock deadline per query
+    'scan_row_limit': 200,      # tighter LIMIT for queries that must full-scan a large table
+}
+# How many SQLite VM instructions run between deadline checks.
+PROGRESS_STEPS = 10_000
+MAX_CACHED_PLANS = 256
+
+# String literals are matched first so comment markers and ';' inside them are left alone.
+LITERAL_OR_COMMENT = re.compile(r"('(?:[^']|'')*')|--[^\n]*|/\*.*?\*/", re.DOTALL)
+PLAN_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)\b", re.IGNORECASE)
+# EXPLAIN QUERY PLAN names aliased tables by their alias, so aliases are resolved from the SQL.
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?|,\s*(\w+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+NOT_ALIASES = {"where", "on", "using", "join", "inner", "left", "right", "full", "cross", "natural",
+               "group", "order", "limit", "union", "except", "intersect", "having", "window", "as"}
+
+class QueryRejected(ValueError):
+    pass
+
+class QuerySandbox:
+    """
+    Runs untrusted (LLM-generated) SELECTs against the read pool under a cost guard:
+
+    - exactly one SELECT/WITH statement, on a query_only connection;
+    - EXPLAIN QUERY PLAN check: two or more full scans of large tables (an unindexed
+      join or cross product) are rejected, a single one is rewritten to a tighter LIMIT;
+    - the statement is wrapped in an outer LIMIT, so no query can materialize more
+      than max_rows (+1 to detect truncation);
+    - a progress handler aborts the statement once timeout_ms has elapsed;
+    - rows are fetched incrementally and cut off at max_rows / max_bytes.
+
+    run() never raises for a bad query; it returns a report whose status is one of
+    ok, truncated, rejected, timeout or error, so callers can record it as evidence.
+    """
+
+    def __init__(self, db_manager, **settings: Any):
+        self.db = db_manager
+        self.settings = {**DEFAULT_SANDBOX_SETTINGS, **{k: v for k, v in settings.items() if v is not None}}
+        # Plan verdicts of parameterized (catalogue) statements: same text, same plan shape.
+        self._plans: Dict[str, "tuple[int, List[str]]"] = {}
+        self.stats = {"ok": 0, "truncated": 0, "rejected": 0, "timeout": 0, "error": 0, "rewritten": 0}
+
+    def run(self, sql: str, params: tuple = (), conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+        """Run one query; pass `conn` to run inside a read transaction the caller holds."""
+        report: Dict[str, Any] = {"status": "ok", "rows": [], "row_count": 0, "sql": sql}
+        try:
+            statement = self.check_statement(sql)
+        except QueryRejected as e:
+            return self._finish(report, "rejected", reason=str(e))
+
+        started = time.perf_counter()
+        with nullcontext(conn) if conn is not None else self.db.get_read_connection() as conn:
+            try:
+                limit, plan_notes = self._plan_limit(conn, statement, params)
+            except QueryRejected as e:
+                return self._finish(report, "rejected", reason=str(e), started=started)
+            except sqlite3.Error as e:
+                return self._finish(report, "error", reason=str(e), started=started)
+            if plan_notes:
+                report["plan"] = plan_notes
+                report["rewritten"] = True
+                self.stats["rewritten"] += 1
+            report["limit_applied"] = limit
+
+            deadline = time.monotonic() + self.settings['timeout_ms'] / 1000
+            conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_STEPS)
+            try:
+                cursor = conn.execute(f"SELECT * FROM ({statement}) LIMIT {limit + 1}", params)
+                rows, truncated_by, size = self._fetch(cursor, limit)
+            except sqlite3.OperationalError as e:
+                if "interrupted" in str(e).lower():
+                    return self._finish(report, "timeout",
+                                        reason=f"query exceeded {self.settings['timeout_ms']} ms and was aborted", started=started)
+                return self._finish(report, "error", reason=str(e), started=started)
+            except sqlite3.Error as e:
+                return self._finish(report, "error", reason=str(e), started=started)
+            finally:
+                conn.set_progress_handler(None, 0)
+
+        report["rows"] = rows
+        report["row_count"] = len(rows)
+        report["bytes"] = size
+        if truncated_by:
+            report["truncated_by"] = truncated_by
+            return self._finish(report, "truncated",
+                                reason=f"result cut off at {len(rows)} rows ({truncated_by} cap)", started=started)
+        return self._finish(report, "ok", started=started)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.stats, "settings": self.settings}
+
+    def check_plan(self, sql: str, params: Any = ()) -> List[str]:
+        """
+        Compile and plan-check a query without running it; raises QueryRejected or
+        sqlite3.Error. Returns the plan notes (e.g. a capped full scan).
+        """
+        statement = self.check_statement(sql)
+        with self.db.get_read_connection() as conn:
+            return self._plan_limit(conn, statement, params)[1]
+
+    @staticmethod
+    def check_statement(sql: str) -> str:
+        """The statement without comments and trailing semicolons, if it is a single SELECT."""
+        statement = LITERAL_OR_COMMENT.sub(lambda m: m.group(1) or " ", sql or "").strip().rstrip(";").strip()
+        if not statement:
+            raise QueryRejected("empty query")
+        first_word = statement.split(None, 1)[0].upper()
+        if first_word not in ("SELECT", "WITH"):
+            raise QueryRejected(f"only SELECT statements are allowed, got {first_word}")
+        if ";" in LITERAL_OR_COMMENT.sub("''", statement):
+            raise QueryRejected("multiple statements are not allowed")
+        return statement
+
+    def _plan_limit(self, conn, statement: str, params: tuple) -> "tuple[int, List[str]]":
+        """LIMIT to apply after inspecting the plan; rejects unindexed joins of large tables."""
+        if params and statement in self._plans:
+            return self._plans[statement]
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", params)]
+        tables = self._alias_map(statement)
+        scans = []
+        for detail in plan:
+            match = PLAN_SCAN.match(detail)
+            if not match:
+                continue
+            table = tables.get(match.group(1).lower(), match.group(1).lower())
+            # "SCAN t USING [COVERING] INDEX" walks an index, which is still bounded by the LIMIT.
+            if table in LARGE_TABLES and " USING " not in detail.upper():
+                scans.append(detail)
+        max_rows = int(self.settings['max_rows'])
+        if len(scans) >= 2:
+            raise QueryRejected(f"query plan joins large tables without an index: {'; '.join(scans)}")
+        verdict = (min(max_rows, int(self.settings['scan_row_limit'])), [f"full scan: {scans[0]}"]) if scans else (max_rows, [])
+        if params and len(self._plans) < MAX_CACHED_PLANS:
+            self._plans[statement] = verdict
+        return verdict
+
+    @staticmethod
+    def _alias_map(statement: str) -> Dict[str, str]:
+        aliases: Dict[str, str] = {}
+        for match in TABLE_REFERENCE.finditer(statement):
+            table, alias = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+            if alias and alias.lower() not in NOT_ALIASES:
+                aliases[alias.lower()] = table.lower()
+        return aliases
+
+    def _fetch(self, cursor, limit: int) -> "tuple[List[Dict[str, Any]], Optional[str], int]":
+        """Rows up to the caps, which cap was hit (if any) and the serialized size kept."""
+        rows: List[Dict[str, Any]] = []
+        size = 0
+        max_bytes = int(self.settings['max_bytes'])
+        while True:
+            batch = cursor.fetchmany(100)
+            if not batch:
+                return rows, None, size
+            for row in batch:
+                if len(rows) >= limit:
+                    return rows, "rows", size
+                record = dict(row)
+                record_size = len(json.dumps(record, default=str))
+                if size + record_size > max_bytes:
+                    return rows, "bytes", size
+                size += record_size
+                rows.append(record)
+
+    def _finish(self, report: Dict[str, Any], status: str, reason: Optional[str] = None,
+                started: Optional[float] = None) -> Dict[str, Any]:
+        report["status"] = status
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3) if started else 0.0
+        if reason:
+            report["reason"] = reason
+        self.stats[status] += 1
+        if status != "ok":
+            print(f"[QuerySandbox] {status}: {reason}")
+        return report
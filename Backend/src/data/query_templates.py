@@ -0,0 +1,229 @@
+# src/data/query_templates.py
+
+import re
+import statistics
+import threading
+from collections import deque
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Union
+
+# Catalogue of the fixed evidence queries. The SQL text of a template never changes, so
+# each one is prepared once per connection (sqlite3's statement cache) and reused for
+# every alert; per-alert values are bound as ? parameters.
+QUERY_TEMPLATES: Dict[str, str] = {
+    # generic evidence, run for every alert type except NewPayee
+    "user_payees": "SELECT * FROM user_payees WHERE user_id = ?",
+    "user_transactions": "SELECT * FROM transactions WHERE user_id = ? ORDER BY timestamp_epoch DESC",
+    "user_logins": "SELECT * FROM login_attempts WHERE user_id = ? ORDER BY timestamp_epoch DESC",
+    "account": "SELECT * FROM accounts WHERE account_id = ?",
+    "user_devices": "SELECT d.* FROM devices d JOIN user_devices ud ON d.device_id = ud.device_id WHERE ud.user_id = ?",
+    "new_payee_history": (
+        "SELECT t.transaction_id, t.timestamp, t.amount, t.payee_id, up.date_added_by_user "
+        "FROM transactions AS t JOIN user_payees AS up ON t.user_id = up.user_id AND t.payee_id = up.payee_id "
+        "WHERE t.user_id = ? AND t.amount >= ? "
+        "AND t.timestamp_epoch - up.date_added_epoch BETWEEN 0 AND ? * 86400 "
+        "ORDER BY t.timestamp_epoch DESC"
+    ),
+    # alert-type specific
+    "high_value_stats_90d": (
+        "SELECT AVG(amount) as avg_amount, MAX(amount) as max_amount, COUNT(*) as txn_count FROM transactions "
+        "WHERE user_id = ? AND timestamp_epoch > CAST(strftime('%s', 'now', '-90 days') AS INTEGER)"
+    ),
+    "high_value_transactions": "SELECT * FROM transactions WHERE user_id = ? AND amount > 100000",
+    "velocity_totals_1h": (
+        "SELECT COUNT(*) as txn_count, SUM(amount) as total_amount FROM transactions "
+        "WHERE user_id = ? AND timestamp_epoch > CAST(strftime('%s', 'now', '-1 hour') AS INTEGER)"
+    ),
+    "velocity_payees_1h": (
+        "SELECT COUNT(DISTINCT payee_id) as unique_payees FROM transactions "
+        "WHERE user_id = ? AND timestamp_epoch > CAST(strftime('%s', 'now', '-1 hour') AS INTEGER)"
+    ),
+    "new_payee_transactions_48h": (
+        "SELECT t.*, up.date_added_by_user FROM transactions t JOIN user_payees up ON t.payee_id = up.payee_id "
+        "WHERE t.user_id = ? AND up.date_added_epoch >= CAST(strftime('%s', 'now', '-48 hours') AS INTEGER)"
+    ),
+    "failed_logins_24h": (
+        "SELECT COUNT(*) as failed_count FROM login_attempts "
+        "WHERE user_id = ? AND status = 'failed' AND timestamp_epoch > CAST(strftime('%s', 'now', '-24 hours') AS INTEGER)"
+    ),
+    "round_amounts_7d": (
+        "SELECT * FROM transactions WHERE user_id = ? AND amount % 10000 = 0 "
+        "AND timestamp_epoch > CAST(strftime('%s', 'now', '-7 days') AS INTEGER)"
+    ),
+    "locations_30d": (
+        "SELECT DISTINCT location FROM transactions WHERE user_id = ? AND timestamp_epoch > CAST(strftime('%s', 'now', '-30 days') AS INTEGER)"
+    ),
+    "channels_1h": (
+        "SELECT DISTINCT transaction_type FROM transactions WHERE user_id = ? "
+        "AND timestamp_epoch > CAST(strftime('%s', 'now', '-1 hour') AS INTEGER)"
+    ),
+    # aggregate-first evidence: computed in the database over [:since, :until] (unix seconds),
+    # a lookback window ending at the alert's timestamp; raw rows only as a capped, most-recent sample.
+    "txn_summary_window": (
+        "SELECT COUNT(*) AS txn_count, ROUND(SUM(amount), 2) AS total_amount, ROUND(AVG(amount), 2) AS avg_amount, "
+        "MAX(amount) AS max_amount, COUNT(DISTINCT location) AS distinct_locations, "
+        "COUNT(DISTINCT payee_id) AS distinct_payees, COUNT(DISTINCT device_id) AS distinct_devices, "
+        "datetime(MIN(timestamp_epoch), 'unixepoch') AS first_txn_at, "
+        "datetime(MAX(timestamp_epoch), 'unixepoch') AS last_txn_at FROM transactions "
+        "WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until"
+    ),
+    "txn_sample_window": (
+        "SELECT * FROM transactions WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until "
+        "ORDER BY timestamp_epoch DESC LIMIT :sample_rows"
+    ),
+    "login_summary_window": (
+        "SELECT COUNT(*) AS login_count, SUM(status = 'failed') AS failed_count, "
+        "ROUND(100.0 * SUM(status = 'failed') / NULLIF(COUNT(*), 0), 1) AS failed_pct, "
+        "COUNT(DISTINCT device_id) AS distinct_devices, COUNT(DISTINCT ip_address) AS distinct_ips, "
+        "datetime(MAX(CASE WHEN status = 'failed' THEN timestamp_epoch END), 'unixepoch') AS last_failed_at "
+        "FROM login_attempts WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until"
+    ),
+    "login_sample_window": (
+        "SELECT * FROM login_attempts WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until "
+        "ORDER BY timestamp_epoch DESC LIMIT :sample_rows"
+    ),
+    "high_value_window": (
+        "SELECT COUNT(*) AS high_value_count, ROUND(SUM(amount), 2) AS high_value_total, MAX(amount) AS max_amount "
+        "FROM transactions WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until AND amount > :threshold"
+    ),
+    "geo_mismatch_window": (
+        "SELECT COUNT(*) AS txn_count, SUM(t.location != u.registered_location) AS mismatch_count, "
+        "ROUND(100.0 * SUM(t.location != u.registered_location) / NULLIF(COUNT(*), 0), 1) AS mismatch_pct, "
+        "SUM(t.location = :location) AS same_location_count, u.registered_location "
+        "FROM transactions t JOIN users u ON u.user_id = t.user_id "
+        "WHERE t.user_id = :user_id AND t.timestamp_epoch BETWEEN :since AND :until"
+    ),
+    "location_breakdown_window": (
+        "SELECT location, COUNT(*) AS txn_count, ROUND(SUM(amount), 2) AS total_amount, "
+        "ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 1) AS txn_pct FROM transactions "
+        "WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until "
+        "GROUP BY location ORDER BY txn_count DESC LIMIT :sample_rows"
+    ),
+    # Greedy clusters, as the pattern agent counts them: a window opens at the first
+    # transaction after the previous window closed; it is an event if it holds enough
+    # transactions. Each step is one index range seek, so no transaction rows leave the database.
+    "velocity_events_window": (
+        "WITH RECURSIVE windows(start) AS ("
+        "SELECT MIN(timestamp_epoch) FROM transactions "
+        "WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until "
+        "UNION ALL "
+        "SELECT (SELECT MIN(t.timestamp_epoch) FROM transactions t WHERE t.user_id = :user_id "
+        "AND t.timestamp_epoch > w.start + :window_seconds AND t.timestamp_epoch <= :until) "
+        "FROM windows w WHERE w.start IS NOT NULL) "
+        "SELECT COUNT(*) AS velocity_events FROM windows w WHERE w.start IS NOT NULL "
+        "AND (SELECT COUNT(*) FROM transactions t WHERE t.user_id = :user_id "
+        "AND t.timestamp_epoch BETWEEN w.start AND w.start + :window_seconds "
+        "AND t.timestamp_epoch <= :until) >= :min_txns"
+    ),
+    "new_payee_events_window": (
+        "SELECT COUNT(*) AS new_payee_events, COUNT(DISTINCT t.payee_id) AS new_payees, "
+        "ROUND(SUM(t.amount), 2) AS total_amount "
+        "FROM transactions AS t JOIN user_payees AS up ON t.user_id = up.user_id AND t.payee_id = up.payee_id "
+        "WHERE t.user_id = :user_id AND t.timestamp_epoch BETWEEN :since AND :until AND t.amount >= :threshold "
+        "AND t.timestamp_epoch - up.date_added_epoch BETWEEN 0 AND :window_seconds"
+    ),
+    "new_payee_sample_window": (
+        "SELECT t.transaction_id, t.timestamp, t.amount, t.payee_id, up.date_added_by_user "
+        "FROM transactions AS t JOIN user_payees AS up ON t.user_id = up.user_id AND t.payee_id = up.payee_id "
+        "WHERE t.user_id = :user_id AND t.timestamp_epoch BETWEEN :since AND :until AND t.amount >= :threshold "
+        "AND t.timestamp_epoch - up.date_added_epoch BETWEEN 0 AND :window_seconds "
+        "ORDER BY t.timestamp_epoch DESC LIMIT :sample_rows"
+    ),
+    "failed_login_transfer": (
+        "SELECT a.current_balance, :amount AS transfer_amount, "
+        "ROUND(100.0 * :amount / NULLIF(:amount + a.current_balance, 0), 1) AS transfer_pct, "
+        "(SELECT COUNT(*) FROM login_attempts l WHERE l.user_id = :user_id AND l.status = 'failed' "
+        "AND l.timestamp_epoch BETWEEN :until - 86400 AND :until) AS failed_logins_24h "
+        "FROM accounts a WHERE a.account_id = :account_id"
+    ),
+    "structuring_window": (
+        "SELECT COUNT(*) AS txn_count, ROUND(SUM(amount), 2) AS total_amount, "
+        "SUM(amount % 10000 = 0) AS round_amount_count, MAX(amount) AS max_amount FROM transactions "
+        "WHERE user_id = :user_id AND timestamp_epoch BETWEEN :until - :window_seconds AND :until"
+    ),
+    "channel_breakdown_window": (
+        "SELECT transaction_type, COUNT(*) AS txn_count, COUNT(DISTINCT location) AS distinct_locations, "
+        "SUM(timestamp_epoch >= :until - :window_seconds) AS recent_count FROM transactions "
+        "WHERE user_id = :user_id AND timestamp_epoch BETWEEN :since AND :until GROUP BY transaction_type"
+    ),
+}
+# Metrics name for queries that did not come from the catalogue (LLM-generated SQL).
+AD_HOC = "ad_hoc"
+LATENCY_SAMPLES = 500
+NAMED_PARAMETER = re.compile(r":(\w+)")
+
+class BoundQuery(NamedTuple):
+    """A catalogue template (or stored query plan) plus its ? or :name parameters."""
+    template: str
+    sql: str
+    params: Union[Tuple[Any, ...], Dict[str, Any]]
+
+    def render(self) -> str:
+        """The SQL with the parameters inlined, for logs, prompts and the index advisor."""
+        if isinstance(self.params, dict):
+            return NAMED_PARAMETER.sub(
+                lambda m: _literal(self.params[m.group(1)]) if m.group(1) in self.params else m.group(0), self.sql
+            )
+        parts = self.sql.split("?")
+        rendered = parts[0]
+        for value, part in zip(self.params, parts[1:]):
+            rendered += _literal(value) + part
+        return rendered
+
+    def __str__(self) -> str:
+        return self.render()
+
+def _literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def bind(template: str, *params: Any, **named: Any) -> BoundQuery:
+    sql = QUERY_TEMPLATES[template]
+    if named:
+        names = list(dict.fromkeys(NAMED_PARAMETER.findall(sql)))
+        missing = [name for name in names if name not in named]
+        if missing:
+            raise ValueError(f"Template {template} is missing parameters: {', '.join(missing)}")
+        return BoundQuery(template, sql, {name: named[name] for name in names})
+    if sql.count("?") != len(params):
+        raise ValueError(f"Template {template} takes {sql.count('?')} parameters, got {len(params)}")
+    return BoundQuery(template, sql, tuple(params))
+
+class TemplateMetrics:
+    """Per-template call counts, row counts, sandbox outcomes and latency percentiles."""
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, template: Optional[str], elapsed_ms: float, rows: int, status: str) -> None:
+        with self._lock:
+            entry = self._metrics.setdefault(template or AD_HOC, {
+                "calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0, "statuses": {},
+                "latencies": deque(maxlen=self._samples),
+            })
+            entry["calls"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+            entry["latencies"].append(elapsed_ms)
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            snapshot = {name: {**entry, "latencies": list(entry["latencies"]), "statuses": dict(entry["statuses"])}
+                        for name, entry in self._metrics.items()}
+        stats = {}
+        for name, entry in sorted(snapshot.items(), key=lambda item: -item[1]["total_ms"]):
+            latencies: List[float] = entry.pop("latencies")
+            stats[name] = {
+                **entry,
+                "total_ms": round(entry["total_ms"], 2),
+                "max_ms": round(entry["max_ms"], 2),
+                "avg_ms": round(entry["total_ms"] / entry["calls"], 2),
+                "p95_ms": round(statistics.quantiles(latencies, n=20, method="inclusive")[-1], 2) if len(latencies) >= 2 else round(latencies[0], 2),
+            }
+        return stats
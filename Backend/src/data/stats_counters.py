@@ -0,0 +1,143 @@
+# src/data/stats_counters.py
+
+import json
+from typing import Dict, Any, List
+
+# One row per (scope, label, flag) bucket:
+#   scope 'outcome'       -> label = final_outcome, flag = is_suspicious, value_sum = sum of confidence_score
+#   scope 'review_status' -> label = '',            flag = COALESCE(review_status, 0)
+# Triggers keep the rows exact on every insert/update/delete, so the dashboard reads a
+# handful of rows instead of running GROUP BY over the whole history.
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS stats_counters (
+    scope TEXT NOT NULL,
+    label TEXT NOT NULL,
+    flag INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    value_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, label, flag)
+) WITHOUT ROWID
+"""
+
+def _bump(scope: str, label: str, flag: str, delta: int, value: str = "0") -> str:
+    sign = "+" if delta > 0 else "-"
+    return f"""
+    INSERT INTO stats_counters (scope, label, flag, count, value_sum)
+    VALUES ('{scope}', {label}, {flag}, {delta}, {sign}({value}))
+    ON CONFLICT (scope, label, flag) DO UPDATE
+    SET count = count + excluded.count, value_sum = value_sum + excluded.value_sum;"""
+
+def _outcome(row: str, delta: int) -> str:
+    return _bump("outcome", f"{row}.final_outcome", f"CAST({row}.is_suspicious AS INTEGER)", delta,
+                 f"COALESCE({row}.confidence_score, 0)")
+
+def _review(row: str, delta: int) -> str:
+    return _bump("review_status", "''", f"COALESCE({row}.review_status, 0)", delta)
+
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_stats_outcome_insert AFTER INSERT ON investigation_outcomes BEGIN{_outcome('NEW', 1)} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_stats_outcome_delete AFTER DELETE ON investigation_outcomes BEGIN{_outcome('OLD', -1)} END",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_outcome_update
+    AFTER UPDATE OF final_outcome, is_suspicious, confidence_score ON investigation_outcomes
+    BEGIN{_outcome('OLD', -1)}{_outcome('NEW', 1)} END""",
+    f"CREATE TRIGGER IF NOT EXISTS trg_stats_alert_insert AFTER INSERT ON alerts BEGIN{_review('NEW', 1)} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_stats_alert_delete AFTER DELETE ON alerts BEGIN{_review('OLD', -1)} END",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_alert_review_status
+    AFTER UPDATE OF review_status ON alerts
+    WHEN COALESCE(OLD.review_status, 0) IS NOT COALESCE(NEW.review_status, 0)
+    BEGIN{_review('OLD', -1)}{_review('NEW', 1)} END""",
+]
+
+REBUILD = [
+    "DELETE FROM stats_counters",
+    """
+    INSERT INTO stats_counters (scope, label, flag, count, value_sum)
+    SELECT 'outcome', final_outcome, CAST(is_suspicious AS INTEGER), COUNT(*), COALESCE(SUM(confidence_score), 0)
+    FROM investigation_outcomes
+    GROUP BY final_outcome, CAST(is_suspicious AS INTEGER)
+    """,
+    """
+    INSERT INTO stats_counters (scope, label, flag, count, value_sum)
+    SELECT 'review_status', '', COALESCE(review_status, 0), COUNT(*), 0
+    FROM alerts
+    GROUP BY COALESCE(review_status, 0)
+    """,
+]
+
+# Table, triggers and the initial backfill go in together, so no write can slip in between.
+MIGRATION = ("stats_counters_v1", [CREATE_TABLE, *TRIGGERS, *REBUILD])
+
+
+def outcome_counts(db) -> List[Dict[str, Any]]:
+    """Same rows as GROUP BY final_outcome, is_suspicious over investigation_outcomes."""
+    return db.execute_query("""
+        SELECT label AS final_outcome, flag AS is_suspicious, count,
+               value_sum / count AS avg_confidence
+        FROM stats_counters
+        WHERE scope = 'outcome' AND count > 0
+        ORDER BY label, flag
+    """)
+
+def review_status_counts(db) -> List[Dict[str, Any]]:
+    """Same rows as GROUP BY COALESCE(review_status, 0) over alerts."""
+    return db.execute_query("""
+        SELECT flag AS review_status, count
+        FROM stats_counters
+        WHERE scope = 'review_status' AND count > 0
+        ORDER BY flag
+    """)
+
+def rebuild(db) -> None:
+    """Recompute every counter from the base tables (repair after out-of-band edits)."""
+    with db.get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in REBUILD:
+                conn.execute(statement)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    print("[StatsCounters] Rebuilt counters from base tables.")
+
+def check(db) -> Dict[str, Any]:
+    """Compare the counters against a full GROUP BY; returns the buckets that differ."""
+    expected = {
+        ("outcome", r["final_outcome"], int(r["is_suspicious"])): r["count"]
+        for r in db.execute_query(
+            "SELECT final_outcome, CAST(is_suspicious AS INTEGER) AS is_suspicious, COUNT(*) AS count "
+            "FROM investigation_outcomes GROUP BY 1, 2"
+        )
+    }
+    expected.update({
+        ("review_status", "", r["review_status"]): r["count"]
+        for r in db.execute_query(
+            "SELECT COALESCE(review_status, 0) AS review_status, COUNT(*) AS count FROM alerts GROUP BY 1"
+        )
+    })
+    actual = {
+        (r["scope"], r["label"], r["flag"]): r["count"]
+        for r in db.execute_query("SELECT scope, label, flag, count FROM stats_counters WHERE count != 0")
+    }
+    mismatches = [
+        {"scope": k[0], "label": k[1], "flag": k[2], "expected": expected.get(k, 0), "counter": actual.get(k, 0)}
+        for k in sorted(set(expected) | set(actual))
+        if expected.get(k, 0) != actual.get(k, 0)
+    ]
+    return {"consistent": not mismatches, "mismatches": mismatches}
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.data.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Check or rebuild the trigger-maintained statistics counters.")
+    parser.add_argument("--db", default="data/alerts.db")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all counters from the base tables")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    if args.rebuild:
+        rebuild(db)
+    print(json.dumps(check(db), indent=2))
+    db.close()
@@ -0,0 +1,72 @@
+# src/data/table_versions.py
+
+from typing import Dict, Any, List, Iterable
+
+# A per-table write sequence bumped by triggers inside the writing transaction, so every
+# writer (the app, the write-behind thread, CLI tools, another process) invalidates
+# readers that depend on the table. updated_at is unix seconds of the last write.
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+
+def version_triggers(table: str) -> List[str]:
+    """CREATE TRIGGER statements that bump table_versions on any insert/update/delete of `table`."""
+    bump = f"""
+    INSERT INTO table_versions (table_name, version, updated_at)
+    VALUES ('{table}', 1, CAST(strftime('%s', 'now') AS INTEGER))
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = version + 1, updated_at = excluded.updated_at;"""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{event.lower()} AFTER {event} ON {table} BEGIN{bump} END"
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+def seed(table: str) -> str:
+    return (
+        "INSERT OR IGNORE INTO table_versions (table_name, version, updated_at) "
+        f"VALUES ('{table}', 0, CAST(strftime('%s', 'now') AS INTEGER))"
+    )
+
+def migration(name: str, tables: Iterable[str]) -> tuple:
+    """A named migration that starts versioning `tables`."""
+    statements = [CREATE_TABLE]
+    for table in tables:
+        statements += [*version_triggers(table), seed(table)]
+    return name, statements
+
+# Tables read by the dashboard-polled endpoints.
+MIGRATION = migration("table_versions_v1", ["alerts", "investigation_outcomes", "agent_judgements"])
+# Source tables the ingestion evidence queries read; their versions fence a parallel snapshot.
+# alerts is not one of them: no evidence query reads it, and the writer's review_status
+# updates at the start and end of every investigation would make concurrent snapshots differ.
+EVIDENCE_TABLES = ["transactions", "login_attempts", "users", "accounts", "payees",
+                   "user_payees", "devices", "user_devices"]
+EVIDENCE_MIGRATION = migration("table_versions_evidence_v1", EVIDENCE_TABLES)
+
+
+def read_fence(conn, tables: Iterable[str]) -> Dict[str, int]:
+    """{table: version} as seen by `conn`'s current read transaction (missing ones read as 0)."""
+    tables = list(tables)
+    rows = conn.execute(
+        f"SELECT table_name, version FROM table_versions WHERE table_name IN ({', '.join('?' for _ in tables)})",
+        tuple(tables),
+    ).fetchall()
+    found = {r[0]: r[1] for r in rows}
+    return {t: found.get(t, 0) for t in tables}
+
+def get_versions(db, tables: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """{table: {"version", "updated_at"}} for the requested tables (missing ones read as 0)."""
+    tables = list(tables)
+    if not tables:
+        return {}
+    rows = db.execute_query(
+        f"SELECT table_name, version, updated_at FROM table_versions "
+        f"WHERE table_name IN ({', '.join('?' for _ in tables)})",
+        tuple(tables),
+    )
+    found = {r["table_name"]: {"version": r["version"], "updated_at": r["updated_at"]} for r in rows}
+    return {t: found.get(t, {"version": 0, "updated_at": 0}) for t in tables}
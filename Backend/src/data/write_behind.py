@@ -0,0 +1,190 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, List, Tuple
+
+from src.data.blob_codec import encode_blob
+from src.data.outcome_search import index_outcomes
+
+JUDGEMENT = "judgement"
+OUTCOME = "outcome"
+REVIEW_STATUS = "review_status"
+_BARRIER = "barrier"
+_STOP = "stop"
+
+INSERT_JUDGEMENT = """
+INSERT INTO agent_judgements
+(judgement_id, alert_id, agent_name, action, confidence, rationale_json, timestamp, loop_iteration, queries_executed)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Outcome upsert as two set-based statements: update rows that exist, insert the rest.
+# human_verified is preserved once set, agent_outputs only replaced when provided (stored compressed).
+# A model re-run of a verified alert keeps the analyst's label and summary: the precedent
+# index and threshold calibration read them as ground truth.
+UPDATE_OUTCOME = """
+UPDATE investigation_outcomes
+SET final_outcome = ?,
+    is_suspicious = CASE WHEN human_verified = 1 THEN is_suspicious ELSE ? END,
+    confidence_score = ?,
+    investigation_summary = CASE WHEN human_verified = 1 THEN investigation_summary ELSE ? END,
+    human_verified = COALESCE(human_verified, ?), timestamp = ?, agent_outputs = COALESCE(?, agent_outputs)
+WHERE alert_id = ?
+"""
+INSERT_OUTCOME = """
+INSERT INTO investigation_outcomes
+(outcome_id, alert_id, final_outcome, is_suspicious, confidence_score, investigation_summary, human_verified, timestamp, agent_outputs)
+SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?
+WHERE NOT EXISTS (SELECT 1 FROM investigation_outcomes WHERE alert_id = ?)
+"""
+UPDATE_REVIEW_STATUS = "UPDATE alerts SET review_status = ? WHERE alert_id = ?"
+
+
+class WriteBehindWriter:
+    """
+    Single writer thread that group-commits judgement, outcome and review-status writes.
+
+    Producers enqueue rows and get a Future that resolves once the row is committed.
+    The writer takes everything queued within flush_interval_ms of the first pending
+    write (up to max_batch rows) and applies it in one transaction with executemany,
+    so N concurrent investigations cost one commit instead of N. flush() waits for
+    everything queued so far; close() drains the queue before the process exits.
+    """
+
+    def __init__(self, db_manager, max_batch: int = 256, flush_interval_ms: int = 50):
+        self.db = db_manager
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval = max(0, int(flush_interval_ms)) / 1000
+        self._queue: "queue.Queue[Tuple[str, Any, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._closed = False
+        self.stats = {"batches": 0, "rows": 0, "failed_rows": 0, "max_batch_rows": 0, "commit_ms_total": 0.0}
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit_judgement(self, judgement: Dict[str, Any]) -> Future:
+        return self._submit(JUDGEMENT, judgement)
+
+    def submit_outcome(self, outcome: Dict[str, Any]) -> Future:
+        return self._submit(OUTCOME, outcome)
+
+    def submit_review_status(self, alert_id: str, status: int) -> Future:
+        return self._submit(REVIEW_STATUS, (alert_id, int(status)))
+
+    def flush(self, timeout: float = 30.0) -> None:
+        """Block until every write queued before this call is committed."""
+        if self._thread.is_alive():
+            self._submit(_BARRIER, None).result(timeout)
+
+    def close(self) -> None:
+        """Commit everything still queued and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put((_STOP, None, Future()))
+            self._thread.join()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "queued": self._queue.qsize(),
+            "avg_batch_rows": round(self.stats["rows"] / batches, 2) if batches else 0.0,
+            "avg_commit_ms": round(self.stats["commit_ms_total"] / batches, 3) if batches else 0.0,
+        }
+
+    def _submit(self, kind: str, payload: Any) -> Future:
+        if self._closed and kind != _BARRIER:
+            raise RuntimeError("Write-behind writer is closed.")
+        future: Future = Future()
+        self._queue.put((kind, payload, future))
+        return future
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch and batch[-1][0] not in (_BARRIER, _STOP):
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1][0] == _STOP
+            writes = [item for item in batch if item[0] not in (_BARRIER, _STOP)]
+            if writes:
+                self._commit(writes)
+            for kind, _, future in batch:
+                if kind in (_BARRIER, _STOP):
+                    future.set_result(None)
+
+    def _commit(self, writes: List[Tuple[str, Any, Future]]) -> None:
+        started = time.perf_counter()
+        try:
+            with self.db.get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._apply(conn, writes)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as e:
+            print(f"[WriteBehindWriter] Batch of {len(writes)} writes failed ({e}); retrying one by one.")
+            self._commit_individually(writes)
+            return
+        self._record(len(writes), started)
+        for _, _, future in writes:
+            future.set_result(None)
+
+    def _commit_individually(self, writes: List[Tuple[str, Any, Future]]) -> None:
+        """Isolate the bad row(s) so one failure does not drop the rest of the batch."""
+        for item in writes:
+            try:
+                with self.db.get_connection() as conn:
+                    self._apply(conn, [item])
+                    conn.commit()
+                item[2].set_result(None)
+            except Exception as e:
+                self.stats["failed_rows"] += 1
+                print(f"[WriteBehindWriter] Dropped {item[0]} write: {e}")
+                item[2].set_exception(e)
+
+    def _apply(self, conn, writes: List[Tuple[str, Any, Future]]) -> None:
+        judgements = [w[1] for w in writes if w[0] == JUDGEMENT]
+        # Last write wins when one batch holds several outcomes for the same alert.
+        outcomes = list({w[1]["alert_id"]: w[1] for w in writes if w[0] == OUTCOME}.values())
+        statuses = [w[1] for w in writes if w[0] == REVIEW_STATUS]
+
+        if judgements:
+            conn.executemany(INSERT_JUDGEMENT, [
+                (j['judgement_id'], j['alert_id'], j['agent_name'], j['action'], j['confidence'],
+                 j['rationale_json'], j['timestamp'], j['loop_iteration'], j['queries_executed'])
+                for j in judgements
+            ])
+        if outcomes:
+            conn.executemany(UPDATE_OUTCOME, [
+                (o["final_outcome"], int(bool(o["is_suspicious"])), float(o["confidence_score"]),
+                 o["investigation_summary"], int(bool(o.get("human_verified", False))), o["timestamp"],
+                 encode_blob(o.get("agent_outputs")), o["alert_id"])
+                for o in outcomes
+            ])
+            conn.executemany(INSERT_OUTCOME, [
+                (o["outcome_id"], o["alert_id"], o["final_outcome"], int(bool(o["is_suspicious"])),
+                 float(o["confidence_score"]), o["investigation_summary"], int(bool(o.get("human_verified", False))),
+                 o["timestamp"], encode_blob(o.get("agent_outputs")), o["alert_id"])
+                for o in outcomes
+            ])
+            # Full-text documents are refreshed in the same transaction as the outcomes.
+            index_outcomes(conn, [o["alert_id"] for o in outcomes])
+        if statuses:
+            conn.executemany(UPDATE_REVIEW_STATUS, [(status, alert_id) for alert_id, status in statuses])
+
+    def _record(self, rows: int, started: float) -> None:
+        self.stats["batches"] += 1
+        self.stats["rows"] += rows
+        self.stats["max_batch_rows"] = max(self.stats["max_batch_rows"], rows)
+        self.stats["commit_ms_total"] += (time.perf_counter() - started) * 1000
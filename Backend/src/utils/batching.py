@@ -0,0 +1,48 @@
+import asyncio
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+
+class MicroBatcher:
+    """
+    Groups concurrent requests that share a key into a single call.
+
+    Callers await submit(); requests are flushed when max_batch_size of them are
+    waiting for the same key, or max_wait_ms after the first one arrived. flush_fn
+    receives (key, [(item_id, payload), ...]) and returns {item_id: result}; items it
+    leaves out (or every item, if it raises) resolve to None so callers can fall back.
+    """
+
+    def __init__(self, flush_fn: Callable[[str, List[Tuple[str, Any]]], Awaitable[Dict[str, Any]]],
+                 max_batch_size: int = 4, max_wait_ms: int = 250):
+        self.flush_fn = flush_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, int(max_wait_ms)) / 1000
+        self._pending: Dict[str, List[Tuple[str, Any, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    async def submit(self, key: str, item_id: str, payload: Any) -> Optional[Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append((item_id, payload, future))
+        if len(self._pending[key]) >= self.max_batch_size:
+            self._start_flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._start_flush, key)
+        return await future
+
+    def _start_flush(self, key: str) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            asyncio.ensure_future(self._flush(key, batch))
+
+    async def _flush(self, key: str, batch: List[Tuple[str, Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.flush_fn(key, [(item_id, payload) for item_id, payload, _ in batch])
+        except Exception as e:
+            print(f"[MicroBatcher] Batch for '{key}' failed, falling back to single calls: {e}")
+            results = {}
+        for item_id, _, future in batch:
+            if not future.done():
+                future.set_result((results or {}).get(item_id))
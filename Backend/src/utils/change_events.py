@@ -0,0 +1,116 @@
+import asyncio
+import json
+from typing import Dict, Any, Optional, Set
+
+from src.data.table_versions import get_versions
+
+WATCHED_TABLES = ["alerts", "investigation_outcomes"]
+
+class ChangeBroadcaster:
+    """
+    One change-detection loop fanned out to every server-sent-events subscriber.
+
+    While anyone is subscribed, the loop reads the trigger-maintained table versions
+    every poll_interval_s (a single primary-key read). Only when a version moved does
+    it read the O(1) counters and publish compact events:
+      outcomes       {"version"}           -> clients refetch their first page (ETag-validated)
+      review_status  {"counts"}            -> the StatsCards payload itself
+      stats          {"stats"}             -> the /investigation_stats payload itself
+      resync         {}                    -> sent to a client that fell behind; refetch all
+    Query load therefore follows the write rate, not the number of open dashboards.
+    """
+
+    def __init__(self, db_manager, stats_fn, poll_interval_s: float = 1.0,
+                 heartbeat_s: float = 15.0, queue_size: int = 64):
+        self.db = db_manager
+        self.stats_fn = stats_fn
+        self.poll_interval = poll_interval_s
+        self.heartbeat = heartbeat_s
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._versions: Dict[str, int] = {}
+        self._last: Dict[str, Any] = {}
+        self._seq = 0
+        self.stats = {"polls": 0, "changes": 0, "events": 0, "resyncs": 0}
+
+    async def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._task or self._task.done():
+            await self._refresh(initial=True)
+            self._task = asyncio.create_task(self._run())
+        # New subscribers start from the current state instead of waiting for a change.
+        for topic in ("outcomes", "review_status", "stats"):
+            if topic in self._last:
+                queue.put_nowait(self._event(topic, self._last[topic]))
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    async def stream(self, request, queue: asyncio.Queue):
+        """SSE frames for one subscriber until the client disconnects."""
+        try:
+            yield f"retry: {int(self.poll_interval * 3000)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.stats, "subscribers": len(self._subscribers), "versions": self._versions}
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._refresh()
+            except Exception as e:
+                print(f"[ChangeBroadcaster] Change detection failed: {e}")
+        self._task = None
+
+    async def _refresh(self, initial: bool = False) -> None:
+        self.stats["polls"] += 1
+        versions = await self.db.aio.run(get_versions, self.db, WATCHED_TABLES)
+        current = {table: v["version"] for table, v in versions.items()}
+        changed = [t for t in WATCHED_TABLES if current[t] != self._versions.get(t)]
+        self._versions = current
+        if not changed:
+            return
+        if not initial:
+            self.stats["changes"] += 1
+
+        updates: Dict[str, Any] = {}
+        if "investigation_outcomes" in changed:
+            updates["outcomes"] = {"version": current["investigation_outcomes"]}
+            updates["stats"] = {"stats": await self.db.aio.run(self.stats_fn)}
+        if "alerts" in changed:
+            updates["review_status"] = {"counts": await self.db.aio.get_review_status_counts()}
+
+        for topic, payload in updates.items():
+            # An alerts write that did not touch review_status leaves the counts equal; skip it.
+            if payload == self._last.get(topic):
+                continue
+            self._last[topic] = payload
+            if not initial:
+                self._publish(self._event(topic, payload))
+
+    def _event(self, topic: str, payload: Dict[str, Any]) -> str:
+        self._seq += 1
+        return f"id: {self._seq}\nevent: {topic}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+    def _publish(self, frame: str) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+                self.stats["events"] += 1
+            except asyncio.QueueFull:
+                # A stalled client: discard its backlog and tell it to refetch everything once.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._event("resync", {}))
+                self.stats["resyncs"] += 1
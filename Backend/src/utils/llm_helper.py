@@ -1,7 +1,48 @@
 import openai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+import copy
 import os
 import json
+import time
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# JSON-schema keywords that strict structured outputs do not accept.
+UNSUPPORTED_SCHEMA_KEYS = ("title", "default", "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum")
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Pydantic schema adapted for strict mode: every property required, no extra properties."""
+    def visit(node: Any) -> None:
+        if isinstance(node, dict):
+            for key in UNSUPPORTED_SCHEMA_KEYS:
+                if not isinstance(node.get(key), dict):
+                    node.pop(key, None)
+            if node.get("type") == "object" and "properties" in node:
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"])
+            for value in node.values():
+                visit(value)
+        elif isinstance(node, list):
+            for value in node:
+                visit(value)
+    schema = copy.deepcopy(model.model_json_schema())
+    visit(schema)
+    return schema
+
+def extract_json_text(raw: str) -> Optional[str]:
+    """Strip ``` fences and return the outermost {...} span of a model response, if any."""
+    text = raw.strip()
+    if text.startswith("```"):
+        lines = text.splitlines()
+        if lines[0].startswith("```"): lines = lines[1:]
+        if lines and lines[-1].startswith("```"): lines = lines[:-1]
+        text = "\n".join(lines).strip()
+    start_index = text.find('{')
+    end_index = text.rfind('}')
+    if start_index == -1 or end_index == -1:
+        return None
+    return text[start_index : end_index + 1]
 
 class LLMHelper:
     def __init__(self, 
@@ -12,35 +53,153 @@ class LLMHelper:
         
         self.azure_endpoint = azure_endpoint or os.getenv('AZURE_OPENAI_ENDPOINT')
         self.api_key = api_key or os.getenv('AZURE_OPENAI_API_KEY')
-        self.api_version = api_version or os.getenv('AZURE_API_VERSION', '2024-02-15-preview')
+        self.api_version = api_version or os.getenv('AZURE_API_VERSION', '2024-08-01-preview')
         self.azure_deployment = azure_deployment
         
         if not self.azure_endpoint or not self.api_key:
             raise ValueError("Azure OpenAI endpoint and API key must be provided.")
 
-        self.client = openai.AzureOpenAI(
+        # Async client so concurrent investigations overlap their LLM round-trips.
+        self.client = openai.AsyncAzureOpenAI(
             azure_endpoint=self.azure_endpoint,
             api_key=self.api_key,
             api_version=self.api_version
         )
         self.model = self.azure_deployment
+        self.usage_stats: Dict[str, Dict[str, float]] = {}
+        self.structured_stats: Dict[str, Dict[str, int]] = {}
+        self.repair_retries = 1
+        # Structured outputs (json_schema) need API version 2024-08-01-preview or later;
+        # older deployments fall back to JSON mode plus validation.
+        self.json_schema_supported = True
         
-    async def generate_response(self, prompt: str, max_tokens: int = 1000) -> str:
-        """Generate a response using the Azure OpenAI API."""
+    async def generate_response(self, prompt: str, max_tokens: int = 1000, usage_key: Optional[str] = None) -> str:
+        """Generate a response using the Azure OpenAI API; token usage is recorded under usage_key."""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model, # This refers to the deployment name in Azure OpenAI
-                messages=[
-                    {"role": "system", "content": "You are an expert banking fraud analyst."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.1
-            )
-            return response.choices[0].message.content
+            return await self._complete(prompt, max_tokens, usage_key)
         except Exception as e:
             return f"Error generating response: {str(e)}"
 
+    async def generate_structured(self, prompt: str, response_model: Type[ModelT], max_tokens: int = 1000,
+                                  usage_key: Optional[str] = None) -> Optional[ModelT]:
+        """
+        Generate a response constrained to response_model's JSON schema and validate it.
+
+        If the output still fails validation, one cheap repair request is sent containing
+        only the invalid output and the validation errors. Returns None if that fails too.
+        """
+        key = usage_key or response_model.__name__
+        stats = self.structured_stats.setdefault(key, {"calls": 0, "valid_first_pass": 0, "repaired": 0, "failed": 0})
+        stats["calls"] += 1
+        try:
+            raw = await self._complete(prompt, max_tokens, key, response_model=response_model)
+        except Exception as e:
+            print(f"[LLMHelper] Structured call '{key}' failed: {e}")
+            stats["failed"] += 1
+            return None
+
+        result, error = self._validate(raw, response_model)
+        if result is not None:
+            stats["valid_first_pass"] += 1
+            return result
+
+        for _ in range(self.repair_retries):
+            repair_prompt = f"""The JSON below does not match the required schema.
+
+SCHEMA:
+{json.dumps(strict_json_schema(response_model), separators=(",", ":"))}
+
+VALIDATION ERRORS:
+{error}
+
+INVALID OUTPUT:
+{(raw or "")[:6000]}
+
+Return only the corrected JSON object, keeping every value that is already valid."""
+            try:
+                raw = await self._complete(repair_prompt, max_tokens, f"{key}:repair", response_model=response_model)
+            except Exception as e:
+                print(f"[LLMHelper] Repair call for '{key}' failed: {e}")
+                break
+            result, error = self._validate(raw, response_model)
+            if result is not None:
+                stats["repaired"] += 1
+                return result
+
+        print(f"[LLMHelper] ❗️ '{key}' output failed schema validation after repair: {error}")
+        stats["failed"] += 1
+        return None
+
+    async def _complete(self, prompt: str, max_tokens: int, usage_key: Optional[str],
+                        response_model: Optional[Type[BaseModel]] = None) -> str:
+        request: Dict[str, Any] = dict(
+            model=self.model, # This refers to the deployment name in Azure OpenAI
+            messages=[
+                {"role": "system", "content": "You are an expert banking fraud analyst."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=0.1
+        )
+        if response_model is not None:
+            request["response_format"] = self._response_format(response_model)
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**request)
+        except openai.BadRequestError as e:
+            if response_model is None or not self.json_schema_supported or "response_format" not in str(e):
+                raise
+            print(f"[LLMHelper] json_schema response_format rejected ({e}); falling back to JSON mode.")
+            self.json_schema_supported = False
+            request["response_format"] = self._response_format(response_model)
+            response = await self.client.chat.completions.create(**request)
+        self._record_usage(usage_key or "unlabelled", response, time.perf_counter() - started)
+        return response.choices[0].message.content
+
+    def _response_format(self, response_model: Type[BaseModel]) -> Dict[str, Any]:
+        if self.json_schema_supported:
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": response_model.__name__, "schema": strict_json_schema(response_model), "strict": True},
+            }
+        return {"type": "json_object"}
+
+    def _validate(self, raw: Optional[str], response_model: Type[ModelT]) -> Tuple[Optional[ModelT], str]:
+        json_text = extract_json_text(raw) if isinstance(raw, str) else None
+        if json_text is None:
+            return None, "Response did not contain a JSON object."
+        try:
+            return response_model.model_validate_json(json_text), ""
+        except ValidationError as e:
+            return None, str(e)
+
+    def get_structured_statistics(self) -> Dict[str, Dict[str, int]]:
+        """Per-template counts of structured calls valid on first pass, repaired, and failed."""
+        return {key: dict(stats) for key, stats in self.structured_stats.items()}
+
+    def _record_usage(self, usage_key: str, response: Any, elapsed_seconds: float) -> None:
+        """Accumulate prompt, cached-prompt and completion tokens plus latency per prompt template."""
+        stats = self.usage_stats.setdefault(usage_key, {
+            "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "latency_ms_total": 0.0,
+        })
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        stats["calls"] += 1
+        stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        stats["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+        stats["latency_ms_total"] += elapsed_seconds * 1000
+
+    def get_usage_statistics(self) -> Dict[str, Dict[str, float]]:
+        """Per-template token usage, including the share of prompt tokens served from the provider's prompt cache."""
+        report = {}
+        for key, stats in self.usage_stats.items():
+            report[key] = dict(stats)
+            report[key]["cached_ratio"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+            report[key]["avg_latency_ms"] = stats["latency_ms_total"] / stats["calls"] if stats["calls"] else 0.0
+        return report
+
     async def analyze_patterns(self, data: Dict[str, Any], alert_type: str) -> Dict[str, Any]:
         """Analyze patterns in data using LLM, returning a structured JSON response.""" 
         prompt = f"""
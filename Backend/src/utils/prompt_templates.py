@@ -0,0 +1,55 @@
+import hashlib
+from string import Formatter
+from typing import Dict, Any, List
+
+class PromptTemplate:
+    """
+    A prompt split into a static prefix and a per-call suffix.
+
+    The prefix holds everything that is identical between calls (schema, rules,
+    output format) and is emitted verbatim first, so provider-side prompt caching
+    can reuse it. Only the suffix is formatted with per-alert values.
+    """
+
+    def __init__(self, name: str, prefix: str, suffix: str):
+        self.name = name
+        self.prefix = prefix
+        self.suffix = suffix
+        self.fields: List[str] = sorted({field for _, field, _, _ in Formatter().parse(suffix) if field})
+        self.prefix_hash = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12]
+
+    def render(self, **values: Any) -> str:
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise ValueError(f"Prompt template '{self.name}' is missing values for: {', '.join(missing)}")
+        return self.prefix + self.suffix.format(**values)
+
+
+class PromptRegistry:
+    """Compiles prompt templates once and renders them by name."""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, prefix: str, suffix: str) -> PromptTemplate:
+        template = PromptTemplate(name, prefix, suffix)
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        if name not in self._templates:
+            raise KeyError(f"Unknown prompt template: {name}")
+        return self._templates[name]
+
+    def render(self, name: str, **values: Any) -> str:
+        return self.get(name).render(**values)
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {"prefix_chars": len(t.prefix), "prefix_hash": t.prefix_hash, "fields": t.fields}
+            for name, t in self._templates.items()
+        }
+
+
+# Shared registry; modules register their templates at import time.
+prompt_registry = PromptRegistry()
@@ -0,0 +1,59 @@
+import json
+import os
+from typing import Dict, Any, Optional
+
+THRESHOLD_KEYS = ('pattern_confidence_threshold', 'risk_threshold', 'auto_close_threshold')
+DEFAULT_THRESHOLDS = {
+    'pattern_confidence_threshold': 0.7,
+    'risk_threshold': 0.7,
+    'auto_close_threshold': 0.3,
+}
+
+class ThresholdStore:
+    """Decision thresholds per alert type, calibrated from analyst feedback.
+
+    Lookups fall back from the alert type's calibrated values to the calibrated
+    global values, then to the static values in config.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config.get('calibrated_thresholds_path', 'data/calibrated_thresholds.json')
+        self.defaults = {k: float(config.get(k, DEFAULT_THRESHOLDS[k])) for k in THRESHOLD_KEYS}
+        self.global_overrides: Dict[str, float] = {}
+        self.per_type: Dict[str, Dict[str, float]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Load the published calibration file, if any."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                published = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ThresholdStore] Ignoring unreadable calibration file {self.path}: {e}")
+            return
+        self.global_overrides = published.get('global', {}) or {}
+        self.per_type = published.get('alert_types', {}) or {}
+        print(f"[ThresholdStore] Loaded calibrated thresholds for {len(self.per_type)} alert types from {self.path}.")
+
+    def get(self, key: str, alert_type: Optional[str] = None) -> float:
+        if alert_type and key in self.per_type.get(alert_type, {}):
+            return float(self.per_type[alert_type][key])
+        if key in self.global_overrides:
+            return float(self.global_overrides[key])
+        return self.defaults[key]
+
+    def publish(self, calibration: Dict[str, Any]) -> None:
+        """Atomically write a calibration result and start using it."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(calibration, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.load()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'defaults': self.defaults, 'global': self.global_overrides, 'alert_types': self.per_type}
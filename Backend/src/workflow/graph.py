@@ -6,12 +6,18 @@ def create_investigation_workflow(agents: Dict[str, Any]) -> StateGraph:
     """Create the investigation workflow graph."""
     workflow = StateGraph(AlertInvestigationState)
 
+    workflow.add_node("precedent", agents['precedent'].execute)
     workflow.add_node("ingestion", agents['ingestion'].execute)
     workflow.add_node("pattern", agents['pattern'].execute)
     workflow.add_node("explanation", agents['explanation'].execute)
     workflow.add_node("risk", agents['risk'].execute)
 
-    workflow.add_edge(START, "ingestion")
+    workflow.add_edge(START, "precedent")
+    workflow.add_conditional_edges(
+        "precedent",
+        should_short_circuit_on_precedent,
+        {"finalize": END, "investigate": "ingestion"}
+    )
     workflow.add_edge("ingestion", "pattern")
 
     workflow.add_conditional_edges(
@@ -30,12 +36,19 @@ def create_investigation_workflow(agents: Dict[str, Any]) -> StateGraph:
     
     return workflow.compile()
 
+def should_short_circuit_on_precedent(state: AlertInvestigationState) -> str:
+    """Skip the LLM pipeline when a verified precedent already decided the alert."""
+    if state.agent_outputs.get('PrecedentAgent', {}).get('matched'):
+        return "finalize"
+    return "investigate"
+
 def should_continue_from_pattern(state: AlertInvestigationState) -> str:
     """Determine the next step after pattern analysis based on confidence.""" 
     patterns = state.agent_outputs.get('PatternRecognitionAgent', {})
     confidence = patterns.get('overall_confidence', 0)
+    threshold = patterns.get('confidence_threshold', 0.7)
     
-    if confidence >= 0.7 or state.loop_count >= state.max_loops:
+    if confidence >= threshold or state.loop_count >= state.max_loops:
         return "continue"
     return "loop_back"
 
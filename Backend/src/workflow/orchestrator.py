@@ -1,19 +1,24 @@
 # src/workflow/orchestrator.py
 import asyncio
+import time
 from src.workflow.graph import create_investigation_workflow
 from src.workflow.state import AlertInvestigationState
 from src.agents.ingestion_agent import IngestionAgent
 from src.agents.pattern_agent import PatternRecognitionAgent
 from src.agents.explanation_agent import ExplanationAgent
 from src.agents.risk_agent import RiskAssessmentAgent
+from src.agents.precedent_agent import PrecedentAgent
+from src.agents.feedback_agent import FeedbackAgent
 from src.data.database import DatabaseManager
+from src.data.case_index import SimilarCaseIndex
 from src.utils.llm_helper import LLMHelper
+from src.utils.thresholds import ThresholdStore
 from typing import Dict, Any, List
 
 class AlertInvestigationOrchestrator:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.db = DatabaseManager(config['database_path'])
+        self.db = DatabaseManager(config['database_path'], config)
         
         self.llm_helper = LLMHelper(
             azure_endpoint=config.get('AZURE_OPENAI_ENDPOINT'),
@@ -21,27 +26,40 @@ class AlertInvestigationOrchestrator:
             api_version=config.get('AZURE_API_VERSION'),
             azure_deployment=config.get('AZURE_OPENAI_DEPLOYMENT_NAME')
         )
+        self.llm_helper.repair_retries = int(config.get('llm_repair_retries', 1))
+
+        self.thresholds = ThresholdStore(config)
+        self.case_index = SimilarCaseIndex(
+            self.db,
+            max_distance=config.get('similar_case_max_distance', 0.25),
+            require_same_user=config.get('similar_case_require_same_user', True),
+        )
 
         self.agents = {
+            'precedent': PrecedentAgent(self.db, self.llm_helper, config, self.case_index),
             'ingestion': IngestionAgent(self.db, self.llm_helper, config),
-            'pattern': PatternRecognitionAgent(self.db, self.llm_helper, config),
+            'pattern': PatternRecognitionAgent(self.db, self.llm_helper, config, self.thresholds),
             'explanation': ExplanationAgent(self.db, self.llm_helper, config),
-            'risk': RiskAssessmentAgent(self.db, self.llm_helper, config)
+            'risk': RiskAssessmentAgent(self.db, self.llm_helper, config, self.thresholds),
+            'feedback': FeedbackAgent(self.db, self.llm_helper, config, self.thresholds)
         }
         self.workflow = create_investigation_workflow(self.agents)
 
     async def investigate_alert(self, alert_id: str) -> Dict[str, Any]:
-        if not self.db.alert_exists(alert_id):
+        if not await self.db.aio.alert_exists(alert_id):
             raise ValueError(f"Alert not found: {alert_id}")
         """Investigate a single alert and log the full result."""
         print(f"\n--- Starting investigation for alert {alert_id} ---")
         initial_state = AlertInvestigationState(
             alert_id=alert_id,
-            current_agent="ingestion",
+            current_agent="precedent",
             max_loops=self.config.get("max_loops", 3),
         )
+        pattern_agent = self.agents['pattern']
+        pattern_agent.active_investigations += 1
         try:
             # Run the Pregel workflow
+            started = time.perf_counter()
             result = await self.workflow.ainvoke(initial_state)
 
             # Extract all the top-level fields
@@ -55,6 +73,11 @@ class AlertInvestigationOrchestrator:
             queries_executed      = result.get("queries_executed", [])
             agent_outputs         = result.get("agent_outputs", {})
 
+            self.case_index.record_investigation(
+                time.perf_counter() - started,
+                short_circuited=bool(agent_outputs.get("PrecedentAgent", {}).get("matched")),
+            )
+
             # Build the payload we return
             payload = {
                 "alert_id": alert_id,
@@ -86,33 +109,38 @@ class AlertInvestigationOrchestrator:
                 "outcome": "ERROR",
                 "is_suspicious": None
             }
+        finally:
+            pattern_agent.active_investigations -= 1
 
 
     async def process_pending_alerts(self, limit: int = 2) -> List[Dict[str, Any]]:
         """Process multiple pending alerts."""
         print("\n[Orchestrator] Checking for new alerts to process...")
-        pending_alerts = self.db.get_pending_alerts(limit)
+        pending_alerts = await self.db.aio.get_pending_alerts(limit)
         if not pending_alerts:
             print("[Orchestrator] No new alerts found.")
             return []
         
         print(f"[Orchestrator] Found {len(pending_alerts)} new alerts. Starting batch processing...")
         results = []
-        for alert in pending_alerts:
-            result = await self.investigate_alert(alert['alert_id'])
-            results.append(result)
-            await asyncio.sleep(0.1)
+        batch_size = int(self.config.get('pattern_batch_size', 1))
+        if batch_size > 1:
+            # Run concurrently so alerts of the same type can share batched pattern prompts.
+            pending_alerts = sorted(pending_alerts, key=lambda a: a.get('alert_type') or '')
+            for i in range(0, len(pending_alerts), batch_size):
+                chunk = pending_alerts[i:i + batch_size]
+                results.extend(await asyncio.gather(*(self.investigate_alert(a['alert_id']) for a in chunk)))
+        else:
+            for alert in pending_alerts:
+                result = await self.investigate_alert(alert['alert_id'])
+                results.append(result)
+                await asyncio.sleep(0.1)
         print(f"[Orchestrator] Batch processing complete. Processed {len(results)} alerts.")
         return results
 
     def get_investigation_statistics(self) -> Dict[str, Any]:
         """Get statistics about past investigations."""
-        query = """
-        SELECT final_outcome, is_suspicious, COUNT(*) as count, AVG(confidence_score) as avg_confidence
-        FROM investigation_outcomes
-        GROUP BY final_outcome, is_suspicious
-        """
-        results = self.db.execute_query(query)
+        results = self.db.get_outcome_counts()
         
         # --- FIX: Update the under_investigation count to include HUMAN_REVIEW ---
         under_investigation_count = sum(
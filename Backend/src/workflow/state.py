@@ -14,7 +14,8 @@ class AlertInvestigationState(BaseModel):
     agent_outputs: Dict[str, Any] = {}
     risk_factors: List[str] = []
     queries_executed: List[str] = []
-    evidence_collected: Dict[str, Any] = {}
+    # An EvidenceSet from ingestion (or a plain dict); Any so it is passed through without being copied.
+    evidence_collected: Any = {}
     
     # Investigation status and outcome
     confidence_score: float = 0.0
@@ -1,5 +1,5 @@
 // src/components/AlertTable.js
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import {
   Card,
   CardContent,
@@ -41,6 +41,7 @@ import VerifiedIcon from "@mui/icons-material/Verified";
 import DateRangeIcon from "@mui/icons-material/DateRange";
 import TodayIcon from "@mui/icons-material/Today";
 import ClearIcon from "@mui/icons-material/Clear";
+import { subscribe } from "../dashboardEvents";
 
 // Import dummy data
 import investigationOutcomes from "../assets/dummydata/investigation_outcomes.json";
@@ -139,9 +140,15 @@ const transformApiData = (apiData) => {
   }));
 };
 
+const PAGE_SIZE = 50;
+const KNOWN_OUTCOMES = ["ESCALATE", "AUTO_CLOSE", "HUMAN_REVIEW"];
+
 const AlertTable = ({ onViewAlert }) => {
   const [alerts, setAlerts] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totals, setTotals] = useState({ 0: 0, 1: 0 }); // per tab, from the server's count hint
   const [outcomeFilter, setOutcomeFilter] = useState("ALL");
   const [activeTab, setActiveTab] = useState(0); // 0 = Under Review, 1 = Reviewed
 
@@ -156,85 +163,68 @@ const AlertTable = ({ onViewAlert }) => {
     return today.toISOString().split('T')[0];
   };
 
-  // Helper function to check if a date is today
-  const isToday = (date) => {
+  // Local calendar date, matching the server's local timestamps
+  const getLocalDateString = () => {
     const today = new Date();
-    const alertDate = new Date(date);
-    return alertDate.toDateString() === today.toDateString();
+    const pad = (n) => String(n).padStart(2, "0");
+    return `${today.getFullYear()}-${pad(today.getMonth() + 1)}-${pad(today.getDate())}`;
   };
 
-  // Helper function to check if a date is within range
-  const isDateInRange = (date, start, end) => {
-    const alertDate = new Date(date);
-    alertDate.setHours(0, 0, 0, 0); // Reset time for accurate date comparison
-    
-    const startOfDay = start ? new Date(start + 'T00:00:00') : null;
-    const endOfDay = end ? new Date(end + 'T23:59:59') : null;
-
-    if (startOfDay && endOfDay) {
-      return alertDate >= startOfDay && alertDate <= endOfDay;
-    } else if (startOfDay) {
-      return alertDate >= startOfDay;
-    } else if (endOfDay) {
-      return alertDate <= endOfDay;
+  // Filters are applied server-side; this builds the query string for one tab
+  const buildQuery = (tab, extra = {}) => {
+    const params = new URLSearchParams({ human_verified: tab === 1 ? "true" : "false", ...extra });
+    if (outcomeFilter !== "ALL") {
+      params.set("outcome", outcomeFilter);
     }
-    return true;
-  };
-
-  // Filter alerts by date
-  const filterAlertsByDate = (alertsData) => {
     if (dateFilter === "TODAY") {
-      return alertsData.filter(alert => isToday(alert.timestamp));
-    } else if (dateFilter === "CUSTOM" && (startDate || endDate)) {
-      return alertsData.filter(alert => isDateInRange(alert.timestamp, startDate, endDate));
+      params.set("start", getLocalDateString());
+      params.set("end", getLocalDateString());
+    } else if (dateFilter === "CUSTOM") {
+      if (startDate) params.set("start", startDate);
+      if (endDate) params.set("end", endDate);
     }
-    return alertsData;
+    return params.toString();
   };
 
-  // Separate alerts based on human verification
-  const underReviewAlerts = filterAlertsByDate(alerts.filter(alert => !alert.human_verified));
-  const reviewedAlerts = filterAlertsByDate(alerts.filter(alert => alert.human_verified));
-
-  // Get current alerts based on active tab
-  const getCurrentAlerts = () => {
-    const currentAlerts = activeTab === 0 ? underReviewAlerts : reviewedAlerts;
-    return filterAlerts(currentAlerts, outcomeFilter);
-  };
-
-  // Get unique outcomes for filter based on current tab
-  const getUniqueOutcomes = () => {
-    const currentAlerts = activeTab === 0 ? underReviewAlerts : reviewedAlerts;
-    const outcomes = [...new Set(currentAlerts.map(alert => alert.outcome))];
-    return outcomes;
-  };
+  const fetchPage = async (query) => {
+    const response = await fetch(`${API_BASE_URL}/investigation_outcomes?${query}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
 
-  // Filter alerts based on outcome
-  const filterAlerts = (alertsData, filter) => {
-    if (filter === "ALL") {
-      return alertsData;
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
     }
-    return alertsData.filter(alert => alert.outcome === filter);
+    return response.json();
   };
 
-  // Fetch investigation outcomes
-  const fetchInvestigationOutcomes = async () => {
-    setLoading(true);
+  // Fetch the first page of the active tab, plus the count hint of the other tab.
+  // With merge, rows already loaded past the first page (Load more) are kept: the fresh
+  // first page replaces its rows by outcome_id and the cursor stays where it was.
+  const fetchInvestigationOutcomes = async (silent = false, merge = false) => {
+    if (!silent) setLoading(true);
+    const otherTab = activeTab === 0 ? 1 : 0;
+    const keepLoaded = merge && alerts.length > PAGE_SIZE;
 
     try {
-      const response = await fetch(`${API_BASE_URL}/investigation_outcomes`, {
-        method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
+      const [page, otherPage] = await Promise.all([
+        fetchPage(buildQuery(activeTab, { limit: PAGE_SIZE })),
+        fetchPage(buildQuery(otherTab, { limit: 1, fields: "outcome_id" })),
+      ]);
+      const firstPage = transformApiData(page.items);
+      if (keepLoaded) {
+        const fresh = new Set(firstPage.map((alert) => alert.outcome_id));
+        setAlerts((prev) => [...firstPage, ...prev.filter((alert) => !fresh.has(alert.outcome_id))]);
+      } else {
+        setAlerts(firstPage);
+        setNextCursor(page.next_cursor);
       }
-
-      const data = await response.json();
-      const transformedData = transformApiData(data);
-      setAlerts(transformedData);
+      setTotals({
+        [activeTab]: page.total_hint?.count ?? page.items.length,
+        [otherTab]: otherPage.total_hint?.count ?? 0,
+      });
     } catch (error) {
       console.error('Error fetching investigation outcomes:', error);
     } finally {
@@ -242,9 +232,39 @@ const AlertTable = ({ onViewAlert }) => {
     }
   };
 
-  // Load data on component mount
+  const fetchMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+
+    try {
+      const page = await fetchPage(buildQuery(activeTab, { limit: PAGE_SIZE, cursor: nextCursor }));
+      setAlerts((prev) => [...prev, ...transformApiData(page.items)]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Error fetching more investigation outcomes:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Reload from the first page whenever the tab or a filter changes
   useEffect(() => {
     fetchInvestigationOutcomes();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [activeTab, outcomeFilter, dateFilter, startDate, endDate]);
+
+  // Outcomes changed on the server: quietly reload the first page (ETag-validated) and
+  // merge it into what is loaded. The mount fetch above already covers the replayed
+  // payloads, so those are skipped.
+  const refreshRef = useRef(null);
+  refreshRef.current = () => fetchInvestigationOutcomes(true, true);
+  useEffect(() => {
+    const unsubscribeOutcomes = subscribe("outcomes", () => refreshRef.current(), { replay: false });
+    const unsubscribeResync = subscribe("resync", () => refreshRef.current(), { replay: false });
+    return () => {
+      unsubscribeOutcomes();
+      unsubscribeResync();
+    };
   }, []);
 
   // Reset filters when tab changes
@@ -305,8 +325,9 @@ const AlertTable = ({ onViewAlert }) => {
     }
   };
 
-  const currentAlerts = getCurrentAlerts();
-  const uniqueOutcomes = getUniqueOutcomes();
+  const currentAlerts = alerts;
+  const uniqueOutcomes = KNOWN_OUTCOMES;
+  const currentTotal = totals[activeTab];
 
   const renderTableContent = () => (
     <TableContainer component={Paper} sx={{ overflow: "hidden" }}>
@@ -483,8 +504,8 @@ const AlertTable = ({ onViewAlert }) => {
                 }}
               >
                 {activeTab === 0
-                  ? `Alerts awaiting human review (${currentAlerts.length} alerts)`
-                  : `Human-verified alerts (${currentAlerts.length} alerts)`
+                  ? `Alerts awaiting human review (${currentTotal} alerts)`
+                  : `Human-verified alerts (${currentTotal} alerts)`
                 }
                 {dateFilter === "TODAY" && " - Today"}
                 {dateFilter === "CUSTOM" && (startDate || endDate) && " - Custom Range"}
@@ -661,7 +682,7 @@ const AlertTable = ({ onViewAlert }) => {
               icon={<PendingIcon />}
               iconPosition="start"
               label={
-                <Badge badgeContent={underReviewAlerts.length} color="warning" max={999}>
+                <Badge badgeContent={totals[0]} color="warning" max={999}>
                   Under Review
                 </Badge>
               }
@@ -670,7 +691,7 @@ const AlertTable = ({ onViewAlert }) => {
               icon={<VerifiedIcon />}
               iconPosition="start"
               label={
-                <Badge badgeContent={reviewedAlerts.length} color="success" max={999}>
+                <Badge badgeContent={totals[1]} color="success" max={999}>
                   Reviewed
                 </Badge>
               }
@@ -679,6 +700,21 @@ const AlertTable = ({ onViewAlert }) => {
         </Box>
 
         {renderTableContent()}
+
+        {/* Keyset pagination: the next page continues after the last row shown */}
+        {nextCursor && !loading && (
+          <Box display="flex" justifyContent="center" sx={{ mt: 2 }}>
+            <Button
+              variant="outlined"
+              onClick={fetchMore}
+              disabled={loadingMore}
+              startIcon={loadingMore ? <CircularProgress size={16} /> : null}
+              sx={{ fontWeight: 600 }}
+            >
+              {loadingMore ? "Loading..." : `Load more (${currentAlerts.length} of ${currentTotal})`}
+            </Button>
+          </Box>
+        )}
       </CardContent>
     </Card>
   );
@@ -32,6 +32,7 @@ import AlertDashboard from "./AlertDashboard";
 import AlertTable from "./AlertTable";
 import AlertDetailModal from "./AlertDetailModal";
 import StatsCards from "./StatsCards";
+import { subscribe } from "../dashboardEvents";
 
 // Import icons for processing stages
 import DatasetIcon from "@mui/icons-material/Dataset";
@@ -785,9 +786,15 @@ const Dashboard = () => {
     }
   };
 
-  // Fetch stats on component mount
+  // Fetch stats on component mount; afterwards they are pushed over the /events channel
   useEffect(() => {
     fetchInvestigationStats();
+    const unsubscribeStats = subscribe("stats", (payload) => setStats(payload.stats));
+    const unsubscribeResync = subscribe("resync", () => fetchInvestigationStats());
+    return () => {
+      unsubscribeStats();
+      unsubscribeResync();
+    };
   }, []);
 
   const handleProcessAlerts = async () => {
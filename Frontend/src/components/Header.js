@@ -10,36 +10,19 @@ import {
 import NotificationsActiveIcon from "@mui/icons-material/NotificationsActive";
 import SignalCellularConnectedNoInternet0BarIcon from "@mui/icons-material/SignalCellularConnectedNoInternet0Bar";
 import ustLogoRev from "../assets/ust-logo-rev.png";
+import { subscribeConnection } from "../dashboardEvents";
 
 const Header = () => {
   const [isSystemOnline, setIsSystemOnline] = useState(false);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    const fetchSystemStatus = async () => {
-      try {
-        const response = await fetch("http://127.0.0.1:8000/health");
-        if (!response.ok) throw new Error("API response not OK");
-
-        const data = await response.json();
-        if (data.status === "healthy") {
-          setIsSystemOnline(true);
-        } else {
-          setIsSystemOnline(false);
-        }
-      } catch (error) {
-        console.error("Failed to fetch system status:", error);
-        setIsSystemOnline(false);
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    fetchSystemStatus();
-
-    // Optional: poll every 30 seconds
-    const interval = setInterval(fetchSystemStatus, 30000);
-    return () => clearInterval(interval);
+    // The shared /events stream doubles as the liveness signal: open means the API is up
+    const unsubscribe = subscribeConnection((online) => {
+      setIsSystemOnline(online);
+      setLoading(false);
+    });
+    return unsubscribe;
   }, []);
 
   return (
@@ -18,6 +18,7 @@ import AnalyticsIcon from "@mui/icons-material/Analytics";
 import PendingIcon from "@mui/icons-material/Pending";
 import ProcessingIcon from "@mui/icons-material/AutoMode";
 import ReviewsIcon from "@mui/icons-material/RateReview";
+import { subscribe } from "../dashboardEvents";
 
 const StatsCards = ({ onProcessAlerts, loading, alertCount, avgProcessingTime, stats }) => {
   const [reviewStats, setReviewStats] = useState([]);
@@ -37,39 +38,16 @@ const StatsCards = ({ onProcessAlerts, loading, alertCount, avgProcessingTime, s
     }
   };
 
-  // Initial load of stats
+  // Initial load of stats, then live updates pushed over the shared /events channel
   useEffect(() => {
     fetchReviewStats();
-  }, []);
-
-  // Watch for loading state changes - when processing completes, reload stats
-  useEffect(() => {
-    let timeoutId;
-
-    if (!loading) {
-      // When processing is done, wait a moment then reload stats
-      timeoutId = setTimeout(() => {
-        fetchReviewStats();
-      }, 1000); // 1 second delay to ensure backend is updated
-    }
-
+    const unsubscribeCounts = subscribe("review_status", (payload) => setReviewStats(payload.counts));
+    const unsubscribeResync = subscribe("resync", () => fetchReviewStats());
     return () => {
-      if (timeoutId) {
-        clearTimeout(timeoutId);
-      }
+      unsubscribeCounts();
+      unsubscribeResync();
     };
-  }, [loading]);
-
-  // Optional: Auto-refresh stats every 30 seconds for real-time updates
-  useEffect(() => {
-    const intervalId = setInterval(() => {
-      if (!loading) { // Only refresh if not currently processing
-        fetchReviewStats();
-      }
-    }, 30000); // 30 seconds
-
-    return () => clearInterval(intervalId);
-  }, [loading]);
+  }, []);
 
   // Get counts by review status
   const getCountByStatus = (status) => {
@@ -91,11 +69,8 @@ const StatsCards = ({ onProcessAlerts, loading, alertCount, avgProcessingTime, s
   // Enhanced process alerts handler with stats refresh
   const handleProcessAlerts = async () => {
     try {
+      // Updated counts arrive as review_status events while alerts are processed
       await onProcessAlerts();
-      // After processing completes, refresh stats immediately
-      setTimeout(() => {
-        fetchReviewStats();
-      }, 500);
     } catch (error) {
       console.error('Error processing alerts:', error);
     }
@@ -0,0 +1,70 @@
+// src/dashboardEvents.js
+// One shared EventSource per browser tab for the backend's /events channel.
+// Components subscribe to topics ("outcomes", "review_status", "stats", "resync")
+// and to connection state instead of running their own polling loops.
+
+const EVENTS_URL = "http://127.0.0.1:8000/events";
+const TOPICS = ["outcomes", "review_status", "stats", "resync"];
+
+let source = null;
+let connected = false;
+const topicListeners = {};
+const connectionListeners = new Set();
+const lastPayloads = {};
+
+const notifyConnection = (value) => {
+  connected = value;
+  connectionListeners.forEach((listener) => listener(value));
+};
+
+const ensureSource = () => {
+  if (source) return;
+  source = new EventSource(EVENTS_URL);
+  source.onopen = () => notifyConnection(true);
+  // EventSource reconnects by itself; the server replays the current state on reconnect.
+  source.onerror = () => notifyConnection(false);
+  TOPICS.forEach((topic) => {
+    source.addEventListener(topic, (event) => {
+      const payload = JSON.parse(event.data);
+      lastPayloads[topic] = payload;
+      (topicListeners[topic] || new Set()).forEach((listener) => listener(payload));
+    });
+  });
+};
+
+const closeIfUnused = () => {
+  const listenerCount = connectionListeners.size +
+    Object.values(topicListeners).reduce((total, set) => total + set.size, 0);
+  if (source && listenerCount === 0) {
+    source.close();
+    source = null;
+    connected = false;
+  }
+};
+
+// Subscribe to one topic; the latest payload (if any) is delivered immediately unless
+// replay is false. Returns an unsubscribe function for useEffect cleanup.
+export const subscribe = (topic, listener, { replay = true } = {}) => {
+  ensureSource();
+  topicListeners[topic] = topicListeners[topic] || new Set();
+  topicListeners[topic].add(listener);
+  if (replay && lastPayloads[topic] !== undefined) {
+    listener(lastPayloads[topic]);
+  }
+  return () => {
+    topicListeners[topic].delete(listener);
+    closeIfUnused();
+  };
+};
+
+export const subscribeConnection = (listener) => {
+  ensureSource();
+  connectionListeners.add(listener);
+  if (source.readyState !== EventSource.CONNECTING) {
+    listener(connected);
+  }
+  return () => {
+    connectionListeners.delete(listener);
+    closeIfUnused();
+  };
+};